@@ -17,17 +17,98 @@ class Settings(BaseSettings):
     
     # Redis (Upstash or local)
     redis_url: Optional[str] = None
+    redis_socket_timeout: float = 1.0  # seconds
+    cache_breaker_failure_threshold: int = 3  # consecutive failures before failover
+    cache_breaker_probe_interval: float = 5.0  # seconds between recovery probes
     cache_ttl_seconds: int = 86400  # 24 hours
+    cache_soft_ttl_seconds: int = 21600  # 6 hours, then served stale while refreshing
+    cache_refresh_lock_seconds: int = 120
+    # TTLs by session lifecycle, see app/services/ttl_policy.py
+    cache_ttl_historical_seconds: int = 90 * 86400  # finished sessions, never revalidated
+    cache_ttl_recent_seconds: int = 21600  # ended within cache_recent_window_seconds
+    cache_ttl_live_seconds: int = 60  # in progress or not started yet
+    cache_recent_window_seconds: int = 3 * 86400
+    cache_schedule_refresh_seconds: int = 86400  # current season schedules
+    telemetry_cache_encoding: str = "compact"  # "compact" or "json"
+    
+    # Session telemetry bundles (all drivers on one distance grid)
+    telemetry_bundles_enabled: bool = True
+    telemetry_bundle_all_laps: bool = False  # every lap, not just each driver's fastest
+    telemetry_bundle_cache_size: int = 8  # bundles kept in memory per worker
+    telemetry_driver_threads: int = 4  # per-driver halves of comparisons run alongside
+    shared_bundles_enabled: bool = False  # map bundles from shared memory across workers
+    shared_bundle_dir: str = "/tmp/pitlane-shm"  # registry of shared segments
+    shared_bundle_max_segments: int = 16  # per host
+    
+    # In-memory cache fallback bounds
+    memory_cache_max_entries: int = 10000
+    memory_cache_max_bytes: int = 128 * 1024 * 1024  # 128 MB
+    memory_cache_sweep_interval: int = 60  # seconds
+    
+    # Persistent SQLite cache used instead of the in-memory fallback if set
+    disk_cache_dir: Optional[str] = None
+    disk_cache_max_bytes: int = 1024 * 1024 * 1024  # 1 GB
+    
+    # In-process L1 cache in front of Redis
+    cache_l1_enabled: bool = True
+    cache_l1_max_entries: int = 512
+    cache_l1_max_bytes: int = 32 * 1024 * 1024  # 32 MB
+    cache_l1_ttl_seconds: int = 30
+    cache_l1_pubsub: bool = False  # cross-worker invalidation via Redis pub/sub
+    
+    # Compression of large values stored in Redis
+    cache_compression_enabled: bool = True
+    cache_compression_threshold: int = 1024  # bytes
+    cache_compression_level: int = 3
+    cache_zstd_dict_path: Optional[str] = None  # trained dictionary for telemetry
     
     # Supabase
     supabase_url: Optional[str] = None
     supabase_service_key: Optional[str] = None
     supabase_jwt_secret: Optional[str] = None
+    jwt_cache_max_entries: int = 10000  # verified tokens cached per worker
+    
+    # Artifact storage: "supabase" or "local"
+    storage_backend: str = "supabase"
+    storage_local_dir: str = "/tmp/laplens_artifacts"
+    storage_local_mmap: bool = False  # store uncompressed, read via mmap
+    
+    # Supabase Storage HTTP client
+    storage_max_connections: int = 20  # keep-alive pool size
+    storage_max_concurrency: int = 8  # requests in flight per worker
+    storage_timeout: float = 10.0  # seconds
+    storage_connect_timeout: float = 3.0  # seconds
+    
+    # Write-behind queue for artifact uploads
+    storage_write_batch_size: int = 8
+    storage_write_queue_max: int = 1000  # pending writes before new ones are rejected
+    storage_flush_timeout: float = 10.0  # seconds to drain the queue on shutdown
+    
+    # Admission control for cold FastF1 computations
+    admission_capacity: int = 8  # cost units computing at once per worker
+    admission_max_queue: int = 32  # computations waiting before new ones are shed
+    admission_target_wait: float = 5.0  # seconds; longer waits are shed with a 503
+    compute_timeout: Optional[float] = 120.0  # seconds before a request's computation is abandoned
+    
+    # Session affinity across worker processes on one host
+    affinity_enabled: bool = False
+    affinity_socket_dir: str = "/tmp/pitlane-affinity"  # one Unix socket per worker
+    
+    # Background jobs (/jobs); stored in the shared cache (Redis or disk) when configured
+    jobs_backend: Optional[str] = None  # "shared" or "memory" (single worker only)
+    job_workers: int = 2  # jobs computed at once per worker
+    job_queue_max: int = 100
+    job_ttl_seconds: int = 3600  # how long finished jobs are kept
+    job_lease_seconds: int = 30  # unfinished jobs not refreshed for this long were abandoned
     
     # Rate limiting
     rate_limit_requests: int = 100  # requests per window
     rate_limit_window: int = 60  # seconds
     rate_limit_authenticated_requests: int = 200
+    rate_limit_local_clients: int = 10000  # per-worker token buckets (LRU)
+    
+    # Internal metrics endpoint (/internal/metrics); requires X-Metrics-Token, disabled if unset
+    metrics_token: Optional[str] = None
     
     # FastF1 cache directory
     fastf1_cache_dir: str = "/tmp/fastf1_cache"
@@ -5,8 +5,9 @@ FastAPI backend for F1 telemetry analytics
 
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.routers import (
     health,
@@ -19,11 +20,20 @@ from app.routers import (
     positions,
     track_evolution,
     saved_analyses,
+    metrics,
+    jobs,
 )
+from app.services.admission import Overloaded
+from app.services.affinity import affinity
 from app.services.cache_service import cache_service
 from app.services.fastf1_service import fastf1_service
+from app.services.jobs import job_manager
+from app.services.shared_bundles import shared_bundles
+from app.services.storage_service import storage_service
+from app.services.write_behind import storage_writer
 from app.middleware.rate_limit import RateLimitMiddleware
 from app.config import settings
+from app.utils.cancellation import DISCONNECTED, OperationCancelled
 
 
 @asynccontextmanager
@@ -38,11 +48,22 @@ async def lifespan(app: FastAPI):
     # Initialize Redis connection
     await cache_service.connect()
     
+    # Join the other workers for session affinity
+    if settings.affinity_enabled:
+        await affinity.start()
+    
     yield
     
     # Shutdown
     print("🏁 LapLens API shutting down...")
+    await affinity.stop()
+    if settings.shared_bundles_enabled and shared_bundles.available:
+        shared_bundles.release()
+    await job_manager.stop()
+    await storage_writer.stop(timeout=settings.storage_flush_timeout)
     await cache_service.disconnect()
+    await storage_service.close()
+    fastf1_service.shutdown()
 
 
 app = FastAPI(
@@ -54,6 +75,27 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Shed computations are a retryable 503, not a failure"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry", "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(OperationCancelled)
+async def cancelled_handler(request: Request, exc: OperationCancelled):
+    """499 (nginx's client closed request) if nobody is listening, else a timeout"""
+    if exc.reason == DISCONNECTED:
+        return JSONResponse(status_code=499, content={"detail": "Client closed request"})
+    return JSONResponse(
+        status_code=504,
+        content={"detail": "Computation timed out, try POST /jobs instead", "reason": exc.reason},
+    )
+
+
 # Configure CORS
 origins = [
     "http://localhost:5173",
@@ -86,6 +128,8 @@ app.include_router(strategy.router, prefix="/strategy", tags=["Strategy"])
 app.include_router(positions.router, prefix="/positions", tags=["Positions"])
 app.include_router(track_evolution.router, prefix="/track-evolution", tags=["Track Evolution"])
 app.include_router(saved_analyses.router, prefix="/saved-analyses", tags=["Saved Analyses"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+app.include_router(metrics.router, prefix="/internal", tags=["Internal"])
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ from app.middleware.auth import (
     AuthUser,
     get_current_user,
     require_auth,
+    get_user_from_request,
     get_user_id_from_request,
 )
 from app.middleware.rate_limit import RateLimitMiddleware
@@ -12,6 +13,7 @@ __all__ = [
     "AuthUser",
     "get_current_user",
     "require_auth",
+    "get_user_from_request",
     "get_user_id_from_request",
     "RateLimitMiddleware",
 ]
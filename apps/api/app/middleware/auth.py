@@ -1,8 +1,16 @@
 """
 JWT authentication middleware for Supabase tokens
+
+Verified claims are kept in a bounded LRU keyed by token hash until the
+token expires, and the user resolved for a request is stored on
+`request.state.user`, so a token is verified at most once per request
+and usually once per worker.
 """
 
-from typing import Optional
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 from fastapi import Request, HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
@@ -21,45 +29,132 @@ class AuthUser:
         self.email = email
 
 
-async def get_current_user(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
-) -> Optional[AuthUser]:
+class ClaimsCache:
     """
-    Get the current authenticated user from JWT token.
-    Returns None if no token or invalid token.
+    LRU of verified JWT claims keyed by token hash.
+    
+    Entries are only served until the token's `exp`; tokens without an
+    expiry are never cached.
     """
-    if not credentials:
-        return None
     
-    token = credentials.credentials
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
     
-    try:
-        # Supabase JWT secret
-        secret = settings.supabase_jwt_secret
-        if not secret:
-            # Try to use the service key as fallback for decoding
-            # In production, you should always have the JWT secret set
-            print("Warning: SUPABASE_JWT_SECRET not set")
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+    
+    def get(self, token: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
             return None
-        
+        claims, expires = entry
+        if expires <= (time.time() if now is None else now):
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+    
+    def set(self, token: str, claims: Dict[str, Any]) -> None:
+        expires = claims.get("exp")
+        if not isinstance(expires, (int, float)) or self.max_entries <= 0:
+            return
+        key = self._key(token)
+        self._entries[key] = (claims, float(expires))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+claims_cache = ClaimsCache(settings.jwt_cache_max_entries)
+
+
+def verify_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    Verify a Supabase JWT and return its claims.
+    Returns None if the token is invalid or no JWT secret is configured.
+    """
+    claims = claims_cache.get(token)
+    if claims is not None:
+        return claims
+    
+    # Supabase JWT secret
+    secret = settings.supabase_jwt_secret
+    if not secret:
+        return None
+    
+    try:
         # Decode the JWT
-        payload = jwt.decode(
+        claims = jwt.decode(
             token,
             secret,
             algorithms=["HS256"],
             audience="authenticated",
         )
-        
-        user_id = payload.get("sub")
-        email = payload.get("email")
-        
-        if not user_id:
-            return None
-        
-        return AuthUser(user_id=user_id, email=email)
     except JWTError as e:
         print(f"JWT validation error: {e}")
         return None
+    
+    claims_cache.set(token, claims)
+    return claims
+
+
+def _user_from_token(token: str) -> Optional[AuthUser]:
+    claims = verify_token(token)
+    if not claims or not claims.get("sub"):
+        return None
+    return AuthUser(user_id=claims["sub"], email=claims.get("email"))
+
+
+def get_user_from_request(request: Request) -> Optional[AuthUser]:
+    """
+    Get the authenticated user for a request, verifying its bearer token
+    only the first time it is asked for.
+    """
+    state = request.state
+    if hasattr(state, "user"):
+        return state.user
+    
+    auth_header = request.headers.get("Authorization", "")
+    user = _user_from_token(auth_header[7:]) if auth_header.startswith("Bearer ") else None
+    state.user = user
+    return user
+
+
+async def get_current_user(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+) -> Optional[AuthUser]:
+    """
+    Get the current authenticated user from JWT token.
+    Returns None if no token or invalid token.
+    """
+    if not credentials:
+        return None
+    
+    if not settings.supabase_jwt_secret:
+        # In production, you should always have the JWT secret set
+        print("Warning: SUPABASE_JWT_SECRET not set")
+        return None
+    
+    # Usually already resolved by the rate limiting middleware
+    state = request.state
+    if not hasattr(state, "user"):
+        state.user = _user_from_token(credentials.credentials)
+    return state.user
 
 
 async def require_auth(
@@ -81,24 +176,5 @@ def get_user_id_from_request(request: Request) -> Optional[str]:
     """
     Extract user ID from request headers (for rate limiting).
     """
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return None
-    
-    token = auth_header[7:]
-    
-    try:
-        secret = settings.supabase_jwt_secret
-        if not secret:
-            return None
-        
-        payload = jwt.decode(
-            token,
-            secret,
-            algorithms=["HS256"],
-            audience="authenticated",
-        )
-        
-        return payload.get("sub")
-    except JWTError:
-        return None
+    user = get_user_from_request(request)
+    return user.user_id if user else None
@@ -2,42 +2,64 @@
 Rate limiting middleware using Redis
 """
 
+import math
 import time
 from typing import Optional, Tuple
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.config import settings
 from app.services.cache_service import cache_service
-from app.middleware.auth import get_user_id_from_request
+from app.services.token_bucket import TokenBucketLimiter
+from app.middleware.auth import AuthUser, get_user_from_request
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+# Health checks and docs are never rate limited
+EXEMPT_PATHS = frozenset(["/health", "/docs", "/redoc", "/openapi.json"])
+
+
+class RateLimitMiddleware:
     """
     Redis-based rate limiting middleware.
     
     Uses sliding window counter pattern:
     - Anonymous users: 100 requests per minute
     - Authenticated users: 200 requests per minute
+    
+    Each worker keeps a token bucket per client in front of Redis, so a
+    flood is rejected locally and only plausible requests cost a Redis
+    round trip (one script call).
+    
+    Implemented as plain ASGI: the rate limit headers are added to the
+    response start message and the body is passed through untouched, so
+    large responses stream without an extra task or buffering.
     """
     
-    async def dispatch(self, request: Request, call_next):
-        # Skip rate limiting for health checks and docs
-        if request.url.path in ["/health", "/docs", "/redoc", "/openapi.json"]:
-            return await call_next(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._local = TokenBucketLimiter(settings.rate_limit_local_clients)
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        
+        request = Request(scope)
         
-        # Get client identifier
-        client_id = self._get_client_id(request)
-        is_authenticated = get_user_id_from_request(request) is not None
+        # Get client identifier (the user is kept on request.state for
+        # the auth dependencies)
+        user = get_user_from_request(request)
+        client_id = self._get_client_id(request, user)
         
         # Check rate limit
         allowed, limit_info = await self._check_rate_limit(
             client_id,
-            is_authenticated
+            user is not None
         )
         
         if not allowed:
-            return Response(
+            response = Response(
                 content='{"error": "Rate limit exceeded"}',
                 status_code=429,
                 media_type="application/json",
@@ -48,23 +70,26 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                     "Retry-After": str(limit_info[2] - int(time.time())),
                 },
             )
+            await response(scope, receive, send)
+            return
         
-        # Process request
-        response = await call_next(request)
-        
-        # Add rate limit headers
-        response.headers["X-RateLimit-Limit"] = str(limit_info[0])
-        response.headers["X-RateLimit-Remaining"] = str(limit_info[1])
-        response.headers["X-RateLimit-Reset"] = str(limit_info[2])
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Add rate limit headers
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(limit_info[0])
+                headers["X-RateLimit-Remaining"] = str(limit_info[1])
+                headers["X-RateLimit-Reset"] = str(limit_info[2])
+            await send(message)
         
-        return response
+        # Process request
+        await self.app(scope, receive, send_with_headers)
     
-    def _get_client_id(self, request: Request) -> str:
+    def _get_client_id(self, request: Request, user: Optional[AuthUser]) -> str:
         """Get unique client identifier for rate limiting"""
-        # Try to get user ID from JWT
-        user_id = get_user_id_from_request(request)
-        if user_id:
-            return f"user:{user_id}"
+        # Prefer the user ID from the JWT
+        if user:
+            return f"user:{user.user_id}"
         
         # Fall back to IP address
         forwarded = request.headers.get("X-Forwarded-For")
@@ -93,25 +118,21 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             else settings.rate_limit_requests
         )
         window = settings.rate_limit_window
+        now = time.time()
+        
+        # Clients already over the limit in this worker never reach Redis
+        wait = self._local.acquire(client_id, limit, window, now)
+        if wait:
+            return (False, (limit, 0, math.ceil(now + wait)))
+        
+        # Check and count against the shared limit in one round trip
+        # (fails open if the cache is unavailable)
+        allowed, count = await cache_service.sliding_window_hit(
+            f"ratelimit:{client_id}", limit, window, now
+        )
         
-        # Generate cache key
-        current_window = int(time.time() / window)
-        cache_key = f"ratelimit:{client_id}:{current_window}"
+        # Calculate remaining and reset time
+        remaining = max(0, limit - math.ceil(count))
+        reset_time = (int(now // window) + 1) * window
         
-        try:
-            # Increment counter
-            count = await cache_service.incr(cache_key)
-            
-            # Set expiry on first request
-            if count == 1:
-                await cache_service.expire(cache_key, window)
-            
-            # Calculate remaining and reset time
-            remaining = max(0, limit - count)
-            reset_time = (current_window + 1) * window
-            
-            return (count <= limit, (limit, remaining, reset_time))
-        except Exception as e:
-            print(f"Rate limit check error: {e}")
-            # On error, allow the request but log it
-            return (True, (limit, limit, int(time.time()) + window))
+        return (allowed, (limit, remaining, reset_time))
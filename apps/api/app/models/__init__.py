@@ -18,6 +18,7 @@ from app.models.schemas import (
     PositionData,
     TrackEvolutionPoint,
     TrackEvolution,
+    SessionOverview,
     SavedAnalysisCreate,
     SavedAnalysis,
     HealthResponse,
@@ -28,6 +29,7 @@ from app.models.schemas import (
     DriverRacePace,
     RacePaceComparison,
     RacePaceRequest,
+    JobStatus,
 )
 
 __all__ = [
@@ -48,6 +50,7 @@ __all__ = [
     "PositionData",
     "TrackEvolutionPoint",
     "TrackEvolution",
+    "SessionOverview",
     "SavedAnalysisCreate",
     "SavedAnalysis",
     "HealthResponse",
@@ -59,4 +62,5 @@ __all__ = [
     "DriverRacePace",
     "RacePaceComparison",
     "RacePaceRequest",
+    "JobStatus",
 ]
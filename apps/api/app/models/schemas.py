@@ -184,6 +184,19 @@ class TrackEvolution(BaseModel):
         populate_by_name = True
 
 
+# ============ Session Overview Models ============
+
+class SessionOverview(BaseModel):
+    """Drivers, strategy, positions and track evolution for one session"""
+    drivers: List[Driver]
+    strategy: StrategyData
+    positions: List[PositionData]
+    track_evolution: TrackEvolution = Field(alias="trackEvolution")
+    
+    class Config:
+        populate_by_name = True
+
+
 # ============ Saved Analysis Models ============
 
 class SavedAnalysisCreate(BaseModel):
@@ -306,3 +319,20 @@ class RacePaceRequest(BaseModel):
     
     class Config:
         populate_by_name = True
+
+
+# ============ Job Models ============
+
+class JobStatus(BaseModel):
+    """Status of a background analysis job, with its result once done"""
+    id: str
+    kind: str
+    status: str  # queued, running, succeeded, failed
+    progress: float = 0.0
+    created_at: datetime = Field(alias="createdAt")
+    updated_at: datetime = Field(alias="updatedAt")
+    error: Optional[str] = None
+    result: Optional[Any] = None
+    
+    class Config:
+        populate_by_name = True
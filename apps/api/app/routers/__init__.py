@@ -11,6 +11,8 @@ from app.routers import (
     positions,
     track_evolution,
     saved_analyses,
+    metrics,
+    jobs,
 )
 
 __all__ = [
@@ -24,4 +26,6 @@ __all__ = [
     "positions",
     "track_evolution",
     "saved_analyses",
+    "metrics",
+    "jobs",
 ]
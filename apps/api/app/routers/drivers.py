@@ -6,7 +6,8 @@ from typing import List
 from fastapi import APIRouter, Query, HTTPException
 
 from app.models import Driver
-from app.services import fastf1_service, cache_service
+from app.services import fastf1_service, cache_service, cache_keys, ttl_policy
+from app.services.admission import COSTS, Overloaded, admission
 
 
 router = APIRouter()
@@ -20,14 +21,19 @@ async def get_drivers(
 ):
     """Get drivers for a session"""
     # Check cache
-    cache_key = f"pitlane:drivers:{season}:{event}:{session}"
+    event_key, session_key = await cache_keys.session_parts(season, event, session)
+    cache_key = cache_service.drivers_key(season, event_key, session_key)
     cached = await cache_service.get_json(cache_key)
     if cached:
         return [Driver(**d) for d in cached]
     
     # Fetch from FastF1
     try:
-        drivers = fastf1_service.get_drivers(season, event, session)
+        drivers = await admission.run_heavy(
+            COSTS["session"], fastf1_service.get_drivers, season, event, session
+        )
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -36,10 +42,11 @@ async def get_drivers(
     
     # Cache the result
     if drivers:
+        ttl = await ttl_policy.for_session(season, event, session)
         await cache_service.set_json(
             cache_key,
             [d.model_dump(by_alias=True) for d in drivers],
-            ttl=86400  # 24 hours
+            ttl=ttl.ttl
         )
     
     return drivers
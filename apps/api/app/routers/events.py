@@ -6,7 +6,8 @@ from typing import List
 from fastapi import APIRouter, Query
 
 from app.models import Event
-from app.services import fastf1_service, cache_service
+from app.services import fastf1_service, cache_service, ttl_policy
+from app.services.admission import COSTS, admission
 
 
 router = APIRouter()
@@ -15,21 +16,19 @@ router = APIRouter()
 @router.get("", response_model=List[Event])
 async def get_events(season: int = Query(..., ge=2018, le=2030)):
     """Get events for a season"""
-    # Check cache
-    cache_key = f"pitlane:events:{season}"
-    cached = await cache_service.get_json(cache_key)
-    if cached:
-        return [Event(**e) for e in cached]
+    cache_key = cache_service.events_key(season)
+    ttl = ttl_policy.for_schedule(season)
     
-    # Fetch from FastF1
-    events = fastf1_service.get_events(season)
+    async def load_events():
+        events = await admission.run_heavy(COSTS["schedule"], fastf1_service.get_events, season)
+        return [e.model_dump(by_alias=True) for e in events]
     
-    # Cache the result
-    if events:
-        await cache_service.set_json(
-            cache_key,
-            [e.model_dump(by_alias=True) for e in events],
-            ttl=86400  # 24 hours
-        )
+    # Served from cache, refreshed in the background once stale
+    events = await cache_service.get_or_revalidate_json(
+        cache_key,
+        load_events,
+        ttl=ttl.ttl,
+        soft_ttl=ttl.soft_ttl,
+    )
     
-    return events
+    return [Event(**e) for e in events]
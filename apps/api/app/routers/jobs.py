@@ -0,0 +1,133 @@
+"""
+Background job endpoints for heavy analyses
+"""
+
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, HTTPException, Response
+
+from app.models import JobStatus, RacePaceRequest, TelemetryCompareRequest
+from app.routers.telemetry import (
+    cached_comparison,
+    comparison_cache_key,
+    comparison_data,
+    race_pace_cache_key,
+    race_pace_data,
+)
+from app.services import cache_service
+from app.services.cache_keys import cache_keys, canonical_pair, normalize_driver
+from app.services.jobs import SUCCEEDED, Job, job_manager
+from app.utils.progress import Progress, reporting
+
+
+router = APIRouter()
+
+
+async def _run_race_pace(params, progress: Progress) -> str:
+    request = RacePaceRequest(**params)
+    # The FastF1 stages report their progress as they finish
+    with reporting(progress):
+        await race_pace_data(request)
+    return await race_pace_cache_key(request)
+
+
+async def _run_telemetry(params, progress: Progress) -> str:
+    request = TelemetryCompareRequest(**params)
+    with reporting(progress):
+        await comparison_data(request)
+    cache_key, _ = await comparison_cache_key(request)
+    return cache_key
+
+
+async def _read_telemetry(cache_key: str, params):
+    request = TelemetryCompareRequest(**params)
+    *_, swapped = canonical_pair(request.driver_a, request.driver_b, request.lap_a, request.lap_b)
+    return await cached_comparison(cache_key, swapped)
+
+
+job_manager.register("race-pace", _run_race_pace)
+job_manager.register("telemetry", _run_telemetry, _read_telemetry)
+
+
+async def _status(job: Job) -> JobStatus:
+    result = await job_manager.result(job)
+    if job.status == SUCCEEDED and result is None:
+        raise HTTPException(status_code=404, detail="Job result expired, submit the job again")
+    return JobStatus(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        progress=job.progress,
+        created_at=datetime.fromtimestamp(job.created_at, timezone.utc),
+        updated_at=datetime.fromtimestamp(job.updated_at, timezone.utc),
+        error=job.error,
+        result=result,
+    )
+
+
+async def _accepted(job: Job, response: Response) -> JobStatus:
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return await _status(job)
+
+
+@router.post("/race-pace", response_model=JobStatus, status_code=202)
+async def submit_race_pace(request: RacePaceRequest, response: Response):
+    """
+    Compute race pace data in the background.
+
+    Returns the job immediately; poll `GET /jobs/{id}` for progress and
+    the result. Identical requests share one job.
+    """
+    event_key, session_key = await cache_keys.session_parts(
+        request.season, request.event, request.session
+    )
+    drivers = ",".join(sorted(normalize_driver(d) for d in request.drivers))
+    job = await job_manager.submit(
+        "race-pace",
+        request.model_dump(by_alias=True),
+        f"{request.season}:{event_key}:{session_key}:{drivers}",
+    )
+    return await _accepted(job, response)
+
+
+@router.post("/telemetry", response_model=JobStatus, status_code=202)
+async def submit_telemetry(request: TelemetryCompareRequest, response: Response):
+    """
+    Compute a telemetry comparison in the background.
+
+    Returns the job immediately; poll `GET /jobs/{id}` for progress and
+    the result (in the same shape as `POST /telemetry/compare`).
+    """
+    event_key, session_key = await cache_keys.session_parts(
+        request.season, request.event, request.session
+    )
+    job = await job_manager.submit(
+        "telemetry",
+        request.model_dump(by_alias=True),
+        # Drivers in request order: the result is oriented like the request
+        cache_service.telemetry_key(
+            request.season,
+            event_key,
+            session_key,
+            normalize_driver(request.driver_a),
+            normalize_driver(request.driver_b),
+            request.lap_a,
+            request.lap_b,
+        ),
+    )
+    return await _accepted(job, response)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Get a job's status, progress and, once it has succeeded, its result"""
+    job = await job_manager.get(job_id)
+    if job is None:
+        detail = "Job not found or expired"
+        if not job_manager.store.shared:
+            detail += (
+                "; without REDIS_URL or DISK_CACHE_DIR jobs are only visible"
+                " to the worker that accepted them"
+            )
+        raise HTTPException(status_code=404, detail=detail)
+    return await _status(job)
@@ -0,0 +1,50 @@
+"""
+Internal metrics endpoint
+"""
+
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Header, HTTPException
+
+from app.config import settings
+from app.services import cache_service
+from app.services.admission import admission
+from app.services.affinity import affinity
+from app.services.fastf1_service import telemetry_stages
+from app.services.jobs import job_manager
+from app.services.shared_bundles import shared_bundles
+from app.services.write_behind import storage_writer
+
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics(
+    x_metrics_token: Optional[str] = Header(default=None)
+) -> Dict[str, Any]:
+    """
+    Get per-worker cache metrics.
+    
+    Hits, misses, errors, latency and value-size histograms per key
+    namespace, plus compression, memory tier and circuit breaker state,
+    the depth and lag of the storage write-behind queue, admission
+    control for FastF1 computations, telemetry comparison stage timings,
+    the background job queue, session affinity forwarding and
+    shared-memory bundles.
+    Requires the `X-Metrics-Token` header to match METRICS_TOKEN; with
+    no token configured the endpoint is disabled.
+    """
+    if not settings.metrics_token:
+        raise HTTPException(status_code=403, detail="Metrics token not configured")
+    if x_metrics_token != settings.metrics_token:
+        raise HTTPException(status_code=403, detail="Invalid metrics token")
+    
+    return {
+        "cache": cache_service.metrics_snapshot(),
+        "storage_writes": storage_writer.stats(),
+        "admission": admission.stats(),
+        "telemetry_stages": telemetry_stages.snapshot(),
+        "jobs": job_manager.stats(),
+        "affinity": affinity.stats(),
+        "shared_bundles": shared_bundles.stats(),
+    }
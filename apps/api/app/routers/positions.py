@@ -6,7 +6,8 @@ from typing import List
 from fastapi import APIRouter, Query, HTTPException
 
 from app.models import PositionData
-from app.services import fastf1_service, cache_service
+from app.services import fastf1_service, cache_service, cache_keys, ttl_policy
+from app.services.admission import COSTS, Overloaded, admission
 
 
 router = APIRouter()
@@ -24,14 +25,19 @@ async def get_positions(
     Returns position changes lap by lap.
     """
     # Check cache
-    cache_key = cache_service.positions_key(season, event, session)
+    event_key, session_key = await cache_keys.session_parts(season, event, session)
+    cache_key = cache_service.positions_key(season, event_key, session_key)
     cached = await cache_service.get_json(cache_key)
     if cached:
         return [PositionData(**p) for p in cached]
     
     # Fetch from FastF1
     try:
-        positions = fastf1_service.get_positions(season, event, session)
+        positions = await admission.run_heavy(
+            COSTS["session"], fastf1_service.get_positions, season, event, session
+        )
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -40,9 +46,11 @@ async def get_positions(
     
     # Cache the result
     if positions:
+        ttl = await ttl_policy.for_session(season, event, session)
         await cache_service.set_json(
             cache_key,
-            [p.model_dump(by_alias=True) for p in positions]
+            [p.model_dump(by_alias=True) for p in positions],
+            ttl=ttl.ttl
         )
     
     return positions
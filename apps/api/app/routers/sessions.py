@@ -3,10 +3,11 @@ Sessions endpoint
 """
 
 from typing import List
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, HTTPException
 
-from app.models import Session
-from app.services import fastf1_service, cache_service
+from app.models import Session, SessionOverview
+from app.services import fastf1_service, cache_service, cache_keys, ttl_policy
+from app.services.admission import COSTS, admission
 
 
 router = APIRouter()
@@ -18,21 +19,97 @@ async def get_sessions(
     event: str = Query(..., min_length=1)
 ):
     """Get sessions for an event"""
-    # Check cache
-    cache_key = f"pitlane:sessions:{season}:{event}"
-    cached = await cache_service.get_json(cache_key)
-    if cached:
-        return [Session(**s) for s in cached]
-    
-    # Fetch from FastF1
-    sessions = fastf1_service.get_sessions(season, event)
-    
-    # Cache the result
-    if sessions:
-        await cache_service.set_json(
-            cache_key,
-            [s.model_dump(by_alias=True) for s in sessions],
-            ttl=86400  # 24 hours
+    event_key = await cache_keys.canonical_event(season, event)
+    cache_key = cache_service.sessions_key(season, event_key)
+    ttl = await ttl_policy.for_event(season, event)
+    
+    async def load_sessions():
+        sessions = await admission.run_heavy(
+            COSTS["schedule"], fastf1_service.get_sessions, season, event
         )
+        return [s.model_dump(by_alias=True) for s in sessions]
+    
+    # Served from cache, refreshed in the background once stale
+    sessions = await cache_service.get_or_revalidate_json(
+        cache_key,
+        load_sessions,
+        ttl=ttl.ttl,
+        soft_ttl=ttl.soft_ttl,
+    )
+    
+    return [Session(**s) for s in sessions]
+
+
+@router.get("/overview", response_model=SessionOverview)
+async def get_session_overview(
+    season: int = Query(..., ge=2018, le=2030),
+    event: str = Query(..., min_length=1),
+    session: str = Query(..., min_length=1)
+):
+    """
+    Get drivers, strategy, positions and track evolution for a session.
+    
+    All four cached artifacts are read in one cache round trip, and any
+    that had to be computed are written back in one round trip.
+    """
+    event_key, session_key = await cache_keys.session_parts(season, event, session)
+    keys = {
+        "drivers": cache_service.drivers_key(season, event_key, session_key),
+        "strategy": cache_service.strategy_key(season, event_key, session_key),
+        "positions": cache_service.positions_key(season, event_key, session_key),
+        "trackEvolution": cache_service.track_evolution_key(season, event_key, session_key),
+    }
+    loaders = {
+        "drivers": lambda: [
+            d.model_dump(by_alias=True)
+            for d in fastf1_service.get_drivers(season, event, session)
+        ],
+        "strategy": lambda: fastf1_service.get_strategy(
+            season, event, session
+        ).model_dump(by_alias=True),
+        "positions": lambda: [
+            p.model_dump(by_alias=True)
+            for p in fastf1_service.get_positions(season, event, session)
+        ],
+        "trackEvolution": lambda: fastf1_service.get_track_evolution(
+            season, event, session
+        ).model_dump(by_alias=True),
+    }
+    
+    # Check cache
+    cached = await cache_service.get_many_json(list(keys.values()))
+    missing = [name for name, cache_key in keys.items() if not cached.get(cache_key)]
+    
+    def load_missing():
+        values = {}
+        for name in missing:
+            try:
+                values[name] = loaders[name]()
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to fetch {name}: {str(e)}"
+                )
+        return values
+    
+    # Fetch from FastF1, admitted as one computation
+    loaded = (
+        await admission.run_heavy(COSTS["overview"], load_missing)
+        if missing
+        else {}
+    )
+    
+    overview = {}
+    computed = {}
+    for name, cache_key in keys.items():
+        value = cached.get(cache_key) or loaded.get(name)
+        if name in loaded and value:
+            computed[cache_key] = value
+        overview[name] = value
+    
+    # Cache the computed artifacts
+    if computed:
+        ttl = await ttl_policy.for_session(season, event, session)
+        await cache_service.set_many_json(computed, ttl.ttl)
     
-    return sessions
+    return SessionOverview(**overview)
@@ -5,7 +5,8 @@ Strategy endpoint
 from fastapi import APIRouter, Query, HTTPException
 
 from app.models import StrategyData
-from app.services import fastf1_service, cache_service
+from app.services import fastf1_service, cache_service, cache_keys, ttl_policy
+from app.services.admission import COSTS, Overloaded, admission
 
 
 router = APIRouter()
@@ -22,23 +23,30 @@ async def get_strategy(
     
     Returns stint information and pit stops for all drivers.
     """
-    # Check cache
-    cache_key = cache_service.strategy_key(season, event, session)
-    cached = await cache_service.get_json(cache_key)
-    if cached:
-        return StrategyData(**cached)
+    event_key, session_key = await cache_keys.session_parts(season, event, session)
+    cache_key = cache_service.strategy_key(season, event_key, session_key)
+    ttl = await ttl_policy.for_session(season, event, session)
     
-    # Fetch from FastF1
+    async def load_strategy():
+        strategy = await admission.run_heavy(
+            COSTS["session"], fastf1_service.get_strategy, season, event, session
+        )
+        return strategy.model_dump(by_alias=True)
+    
+    # Served from cache, refreshed in the background once stale
     try:
-        strategy = fastf1_service.get_strategy(season, event, session)
+        strategy = await cache_service.get_or_revalidate_json(
+            cache_key,
+            load_strategy,
+            ttl=ttl.ttl,
+            soft_ttl=ttl.soft_ttl,
+        )
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch strategy: {str(e)}"
         )
     
-    # Cache the result
-    strategy_dict = strategy.model_dump(by_alias=True)
-    await cache_service.set_json(cache_key, strategy_dict)
-    
-    return strategy
+    return StrategyData(**strategy)
@@ -2,69 +2,219 @@
 Telemetry comparison endpoint
 """
 
-from fastapi import APIRouter, HTTPException
+from typing import Any, Dict, Optional, Tuple
 
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+
+from app.config import settings
 from app.models import TelemetryComparison, TelemetryCompareRequest, RacePaceComparison, RacePaceRequest
-from app.services import fastf1_service, cache_service
+from app.services import fastf1_service, cache_service, ttl_policy
 from app.services.storage_service import storage_service
+from app.services.admission import COSTS, Overloaded, admission
+from app.services.affinity import affinity
+from app.services.telemetry_bundle import telemetry_bundles
+from app.services.write_behind import storage_writer
+from app.services.cache_keys import (
+    cache_keys,
+    canonical_pair,
+    normalize_driver,
+    swap_comparison,
+)
+from app.utils.cancellation import OperationCancelled, detached, request_cancellation
+from app.utils.telemetry_codec import encode_comparison, decode_comparison, is_compact
 
 
 router = APIRouter()
 
 
-@router.post("/compare", response_model=TelemetryComparison)
-async def compare_telemetry(request: TelemetryCompareRequest):
+def _respond(comparison_dict: Dict[str, Any], encoding: str):
+    """Build the response in the requested encoding"""
+    if encoding == "compact":
+        return JSONResponse(encode_comparison(comparison_dict))
+    return TelemetryComparison(**comparison_dict)
+
+
+async def _cache_comparison(
+    cache_key: str,
+    comparison_dict: Dict[str, Any],
+    ttl: Optional[int] = None,
+) -> None:
+    """Cache a comparison, using the compact encoding if configured"""
+    if settings.telemetry_cache_encoding == "compact":
+        await cache_service.set_json(cache_key, encode_comparison(comparison_dict), ttl)
+    else:
+        await cache_service.set_json(cache_key, comparison_dict, ttl)
+
+
+async def comparison_cache_key(request: TelemetryCompareRequest) -> Tuple[str, bool]:
     """
-    Compare telemetry between two drivers.
+    Get the cache key of a comparison and whether the request's drivers
+    are swapped relative to it (the key is for the canonical pair)
+    """
+    event_key, session_key = await cache_keys.session_parts(
+        request.season, request.event, request.session
+    )
+    driver_a, driver_b, lap_a, lap_b, swapped = canonical_pair(
+        request.driver_a, request.driver_b, request.lap_a, request.lap_b
+    )
+    cache_key = cache_service.telemetry_key(
+        request.season, event_key, session_key, driver_a, driver_b, lap_a, lap_b
+    )
+    return cache_key, swapped
+
+
+async def cached_comparison(cache_key: str, swapped: bool) -> Optional[Dict[str, Any]]:
+    """Get a cached comparison in the request's driver order, or None on a miss"""
+    cached = await cache_service.get_json(cache_key)
+    if not cached:
+        return None
+    if is_compact(cached):
+        cached = decode_comparison(cached)
+    return swap_comparison(cached) if swapped else cached
+
+
+async def race_pace_cache_key(request: RacePaceRequest) -> str:
+    """Get the cache key of a race pace computation"""
+    event_key, session_key = await cache_keys.session_parts(
+        request.season, request.event, request.session
+    )
+    drivers_str = "_".join(sorted(normalize_driver(d) for d in request.drivers))
+    return f"race_pace:{request.season}:{event_key}:{session_key}:{drivers_str}"
+
+
+async def _compare_from_bundle(
+    request: TelemetryCompareRequest,
+    event_key: str,
+    session_key: str,
+    driver_a: str,
+    driver_b: str,
+    lap_a: Optional[int],
+    lap_b: Optional[int],
+    ttl: int,
+) -> Optional[Dict[str, Any]]:
+    """Derive a comparison from the session bundle, or None if it can't be"""
+    all_laps = settings.telemetry_bundle_all_laps
+    if not all_laps and (lap_a or lap_b):
+        # Fastest-lap bundles can't serve specific laps
+        return None
     
-    Returns downsampled telemetry data for speed, throttle, brake, and gear traces,
-    plus the lap time delta.
+    async def build():
+        # Shared by every request for the session, so not cancelled with this one
+        with detached():
+            return await admission.run_heavy(
+                COSTS["bundle"],
+                fastf1_service.get_session_bundle,
+                request.season,
+                request.event,
+                request.session,
+                all_laps,
+            )
+    
+    try:
+        bundle = await telemetry_bundles.get(
+            f"{request.season}:{event_key}:{session_key}:{'all' if all_laps else 'fastest'}",
+            storage_service.bundle_key(request.season, event_key, session_key, all_laps),
+            build,
+            ttl,
+        )
+    except (Overloaded, OperationCancelled):
+        raise
+    except Exception as e:
+        print(f"Telemetry bundle unavailable, comparing directly: {e}")
+        return None
+    return bundle.comparison(driver_a, driver_b, lap_a or None, lap_b or None)
+
+
+async def comparison_data(request: TelemetryCompareRequest) -> Dict[str, Any]:
     """
+    Get a serialized comparison in the request's driver order, from the
+    cache, the session bundle, storage or FastF1 (in that order).
+    
+    Fastest-lap comparisons are derived from the session's telemetry
+    bundle (see `app.services.telemetry_bundle`), so one stored artifact
+    serves every driver pairing.
+    """
+    # Canonical key components: resolved event, normalized session and
+    # drivers in a fixed order (a swapped request reuses the same artifact)
+    event_key, session_key = await cache_keys.session_parts(
+        request.season, request.event, request.session
+    )
+    driver_a, driver_b, lap_a, lap_b, swapped = canonical_pair(
+        request.driver_a, request.driver_b, request.lap_a, request.lap_b
+    )
+    
+    def respond(comparison_dict: Dict[str, Any]) -> Dict[str, Any]:
+        return swap_comparison(comparison_dict) if swapped else comparison_dict
+    
     # Generate cache key
     cache_key = cache_service.telemetry_key(
         request.season,
-        request.event,
-        request.session,
-        request.driver_a,
-        request.driver_b,
-        request.lap_a,
-        request.lap_b,
+        event_key,
+        session_key,
+        driver_a,
+        driver_b,
+        lap_a,
+        lap_b,
     )
     
     # Check Redis cache first
-    cached = await cache_service.get_json(cache_key)
+    cached = await cached_comparison(cache_key, swapped)
     if cached:
-        return TelemetryComparison(**cached)
+        return cached
+    
+    # Computed on the worker that owns the session, if that isn't this one
+    forwarded = await affinity.forward(
+        "telemetry",
+        f"{request.season}:{event_key}:{session_key}",
+        request.model_dump(by_alias=True),
+    )
+    if forwarded is not None:
+        return forwarded
+    
+    ttl = await ttl_policy.for_session(request.season, request.event, request.session)
+    
+    if settings.telemetry_bundles_enabled:
+        comparison_dict = await _compare_from_bundle(
+            request, event_key, session_key, driver_a, driver_b, lap_a, lap_b, ttl.ttl
+        )
+        if comparison_dict:
+            await _cache_comparison(cache_key, comparison_dict, ttl.ttl)
+            return respond(comparison_dict)
+    
+    storage_key = storage_service.telemetry_key(
+        request.season,
+        event_key,
+        session_key,
+        driver_a,
+        driver_b,
+        lap_a,
+        lap_b,
+    )
     
     # Check storage for heavy artifacts
     if storage_service.is_enabled:
-        storage_key = storage_service.telemetry_key(
-            request.season,
-            request.event,
-            request.session,
-            request.driver_a,
-            request.driver_b,
-            request.lap_a,
-            request.lap_b,
-        )
-        
         stored_data = await storage_service.download_json(storage_key)
         if stored_data:
             # Cache in Redis for faster subsequent access
-            await cache_service.set_json(cache_key, stored_data)
-            return TelemetryComparison(**stored_data)
+            await _cache_comparison(cache_key, stored_data, ttl.ttl)
+            return respond(stored_data)
     
     # Fetch from FastF1
     try:
-        comparison = fastf1_service.get_telemetry_comparison(
+        comparison = await admission.run_heavy(
+            COSTS["telemetry"],
+            fastf1_service.get_telemetry_comparison,
             request.season,
             request.event,
             request.session,
-            request.driver_a,
-            request.driver_b,
-            request.lap_a,
-            request.lap_b,
+            driver_a,
+            driver_b,
+            lap_a,
+            lap_b,
         )
+    except (Overloaded, OperationCancelled):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -74,55 +224,108 @@ async def compare_telemetry(request: TelemetryCompareRequest):
     # Serialize for caching
     comparison_dict = comparison.model_dump(by_alias=True)
     
-    # Store in Supabase Storage if enabled
+    # Persist to Supabase Storage in the background if enabled
     if storage_service.is_enabled:
-        storage_key = storage_service.telemetry_key(
-            request.season,
-            request.event,
-            request.session,
-            request.driver_a,
-            request.driver_b,
-            request.lap_a,
-            request.lap_b,
-        )
-        await storage_service.upload_json(storage_key, comparison_dict)
+        storage_writer.enqueue(storage_key, comparison_dict)
     
     # Cache in Redis
-    await cache_service.set_json(cache_key, comparison_dict)
+    await _cache_comparison(cache_key, comparison_dict, ttl.ttl)
     
-    return comparison
-@router.post("/race-pace", response_model=RacePaceComparison)
-async def get_race_pace(request: RacePaceRequest):
+    return respond(comparison_dict)
+
+
+@router.post("/compare", response_model=TelemetryComparison)
+async def compare_telemetry(
+    request: TelemetryCompareRequest,
+    http_request: Request,
+    encoding: str = Query("json", pattern="^(json|compact)$"),
+):
     """
-    Get race pace data for multiple drivers.
+    Compare telemetry between two drivers.
     
-    Returns lap times, stint information, and degradation rates
-    for analyzing race pace and tire strategy.
+    Returns downsampled telemetry data for speed, throttle, brake, and gear traces,
+    plus the lap time delta.
+    
+    With `?encoding=compact` the traces are returned as packed typed arrays
+    (see `app.utils.telemetry_codec`) instead of per-point objects.
+    
+    Cold comparisons can also be computed in the background with
+    `POST /jobs/telemetry`. A computation is abandoned if the client
+    disconnects or it runs past the compute timeout.
     """
-    # Generate cache key
-    drivers_str = "_".join(sorted(request.drivers))
-    cache_key = f"race_pace:{request.season}:{request.event}:{request.session}:{drivers_str}"
+    async with request_cancellation(http_request, settings.compute_timeout):
+        comparison_dict = await comparison_data(request)
+    return _respond(comparison_dict, encoding)
+
+
+async def race_pace_data(request: RacePaceRequest) -> Dict[str, Any]:
+    """Get serialized race pace data from the cache or FastF1"""
+    event_key, session_key = await cache_keys.session_parts(
+        request.season, request.event, request.session
+    )
+    cache_key = await race_pace_cache_key(request)
     
     # Check Redis cache first
     cached = await cache_service.get_json(cache_key)
     if cached:
-        return RacePaceComparison(**cached)
+        return cached
+    
+    forwarded = await affinity.forward(
+        "race-pace",
+        f"{request.season}:{event_key}:{session_key}",
+        request.model_dump(by_alias=True),
+    )
+    if forwarded is not None:
+        return forwarded
     
     # Fetch from FastF1
     try:
-        pace_data = fastf1_service.get_race_pace(
+        pace_data = await admission.run_heavy(
+            COSTS["race_pace"],
+            fastf1_service.get_race_pace,
             request.season,
             request.event,
             request.session,
             request.drivers,
         )
+    except (Overloaded, OperationCancelled):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch race pace data: {str(e)}"
         )
     
-    # Cache in Redis (longer TTL since race data doesn't change)
-    await cache_service.set_json(cache_key, pace_data, ttl=86400)  # 24 hours
+    # Cache in Redis (pinned once the session is historical)
+    ttl = await ttl_policy.for_session(request.season, request.event, request.session)
+    await cache_service.set_json(cache_key, pace_data, ttl=ttl.ttl)
+    
+    return pace_data
+
+
+@router.post("/race-pace", response_model=RacePaceComparison)
+async def get_race_pace(request: RacePaceRequest, http_request: Request):
+    """
+    Get race pace data for multiple drivers.
     
-    return pace_data
\ No newline at end of file
+    Returns lap times, stint information, and degradation rates
+    for analyzing race pace and tire strategy.
+    
+    Cold full-race loads can also be computed in the background with
+    `POST /jobs/race-pace`. A computation is abandoned if the client
+    disconnects or it runs past the compute timeout.
+    """
+    async with request_cancellation(http_request, settings.compute_timeout):
+        return await race_pace_data(request)
+
+
+async def _serve_telemetry(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await comparison_data(TelemetryCompareRequest(**params))
+
+
+async def _serve_race_pace(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await race_pace_data(RacePaceRequest(**params))
+
+
+affinity.register("telemetry", _serve_telemetry)
+affinity.register("race-pace", _serve_race_pace)
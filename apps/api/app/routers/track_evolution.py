@@ -5,7 +5,8 @@ Track evolution endpoint
 from fastapi import APIRouter, Query, HTTPException
 
 from app.models import TrackEvolution
-from app.services import fastf1_service, cache_service
+from app.services import fastf1_service, cache_service, cache_keys, ttl_policy
+from app.services.admission import COSTS, Overloaded, admission
 
 
 router = APIRouter()
@@ -23,14 +24,19 @@ async def get_track_evolution(
     Returns best lap time progression and an improvement rate indicator.
     """
     # Check cache
-    cache_key = cache_service.track_evolution_key(season, event, session)
+    event_key, session_key = await cache_keys.session_parts(season, event, session)
+    cache_key = cache_service.track_evolution_key(season, event_key, session_key)
     cached = await cache_service.get_json(cache_key)
     if cached:
         return TrackEvolution(**cached)
     
     # Fetch from FastF1
     try:
-        evolution = fastf1_service.get_track_evolution(season, event, session)
+        evolution = await admission.run_heavy(
+            COSTS["session"], fastf1_service.get_track_evolution, season, event, session
+        )
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -39,6 +45,7 @@ async def get_track_evolution(
     
     # Cache the result
     evolution_dict = evolution.model_dump(by_alias=True)
-    await cache_service.set_json(cache_key, evolution_dict)
+    ttl = await ttl_policy.for_session(season, event, session)
+    await cache_service.set_json(cache_key, evolution_dict, ttl=ttl.ttl)
     
     return evolution
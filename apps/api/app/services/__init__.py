@@ -1,13 +1,17 @@
 """Services package"""
 
 from app.services.cache_service import cache_service
+from app.services.cache_keys import cache_keys
+from app.services.ttl_policy import ttl_policy
 from app.services.fastf1_service import fastf1_service
 from app.services.storage_service import storage_service
 from app.services.supabase_service import supabase_service
 
 __all__ = [
     "cache_service",
+    "cache_keys",
     "fastf1_service",
     "storage_service",
     "supabase_service",
+    "ttl_policy",
 ]
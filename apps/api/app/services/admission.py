@@ -0,0 +1,186 @@
+"""
+Admission control for expensive computations
+
+Cold FastF1 loads cost orders of magnitude more than cache hits, so they
+are admitted against a shared budget of capacity units instead of being
+started as fast as requests arrive. Each kind of computation has a cost
+in units; a computation runs once its units are free, and waits in a
+bounded FIFO queue otherwise.
+
+Waiting is bounded too: a request that would wait longer than the target
+(predicted from recent service times, or actually waited) is shed with
+`Overloaded`, which the API turns into a 503 with Retry-After. Cache
+hits never pass through here, so they keep flowing during a burst.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Tuple, TypeVar
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.metrics import Histogram
+from app.utils.cancellation import checkpoint
+
+
+T = TypeVar("T")
+
+# Capacity units per computation
+COSTS = {
+    "schedule": 1,  # event and session lists
+    "session": 2,  # drivers, strategy, positions, track evolution
+    "overview": 4,  # all four session artifacts
+    "race_pace": 4,
+    "telemetry": 4,  # one driver pair
+    "bundle": 8,  # every driver's laps for a session
+}
+
+# Upper bounds in seconds spent waiting for admission
+WAIT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Overloaded(Exception):
+    """Raised when a computation is shed instead of queued"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Weighted semaphore with a bounded, deadline-limited FIFO queue.
+
+    Waiters are admitted strictly in order, so a large computation at the
+    head of the queue isn't starved by a stream of small ones.
+    """
+
+    def __init__(self, capacity: int = 8, max_queue: int = 32, target_wait: float = 5.0):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.target_wait = target_wait
+        self._in_use = 0
+        self._waiters: Deque[Tuple[int, asyncio.Future]] = deque()
+        # Smoothed seconds of work per capacity unit, for wait estimates
+        self._unit_seconds = 0.0
+        self._wait = Histogram(WAIT_BUCKETS)
+        self._stats = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_wait": 0}
+
+    def _queued_units(self) -> int:
+        return sum(cost for cost, _ in self._waiters)
+
+    def _estimated_wait(self, cost: int) -> float:
+        """Seconds until `cost` more units would be free, from recent service times"""
+        backlog = self._in_use + self._queued_units() + cost - self.capacity
+        return max(backlog, 0) * self._unit_seconds
+
+    def _retry_after(self, cost: int) -> int:
+        return max(1, math.ceil(min(self._estimated_wait(cost), 60.0)))
+
+    def _shed(self, reason: str, stat: str, cost: int) -> Overloaded:
+        self._stats[stat] += 1
+        return Overloaded(reason, self._retry_after(cost))
+
+    def _grant(self) -> None:
+        """Admit waiters from the head of the queue while their units fit"""
+        while self._waiters:
+            cost, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if self._in_use + cost > self.capacity:
+                return
+            self._waiters.popleft()
+            self._in_use += cost
+            future.set_result(None)
+
+    async def acquire(self, cost: int) -> None:
+        """Take `cost` units, waiting in the queue if needed. Raises Overloaded."""
+        start = time.monotonic()
+        if not self._waiters and self._in_use + cost <= self.capacity:
+            self._in_use += cost
+        else:
+            if len(self._waiters) >= self.max_queue:
+                raise self._shed("admission queue full", "shed_queue_full", cost)
+            if self._estimated_wait(cost) > self.target_wait:
+                raise self._shed("estimated wait over target", "shed_wait", cost)
+
+            waiter = (cost, asyncio.get_running_loop().create_future())
+            self._waiters.append(waiter)
+            self._stats["queued"] += 1
+            try:
+                await asyncio.wait_for(waiter[1], timeout=self.target_wait)
+            except asyncio.TimeoutError:
+                self._remove(waiter)
+                raise self._shed("waited past target", "shed_wait", cost)
+            except asyncio.CancelledError:
+                if waiter[1].done() and not waiter[1].cancelled():
+                    # Admitted just as we were cancelled
+                    self.release(cost)
+                else:
+                    self._remove(waiter)
+                raise
+
+        self._stats["admitted"] += 1
+        self._wait.observe(time.monotonic() - start)
+
+    def _remove(self, waiter: Tuple[int, asyncio.Future]) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        # It may have been holding up the head of the queue
+        self._grant()
+
+    def release(self, cost: int) -> None:
+        """Return `cost` units and admit waiters that now fit"""
+        self._in_use -= cost
+        self._grant()
+
+    @asynccontextmanager
+    async def admit(self, cost: int) -> AsyncIterator[None]:
+        """Hold `cost` units for the duration of the block"""
+        cost = min(max(cost, 1), self.capacity)
+        await self.acquire(cost)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(cost)
+            seconds = (time.monotonic() - start) / cost
+            self._unit_seconds = (
+                seconds if not self._unit_seconds
+                else 0.8 * self._unit_seconds + 0.2 * seconds
+            )
+
+    async def run_heavy(self, cost: int, fn: Callable[..., T], *args: Any) -> T:
+        """Run blocking `fn(*args)` in the threadpool once `cost` units are admitted"""
+        async with self.admit(cost):
+            # Don't start work for a request that went away while queued
+            checkpoint()
+            return await run_in_threadpool(fn, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get units in use, queue depth, wait times and shed counts"""
+        return {
+            "capacity": self.capacity,
+            "in_use": self._in_use,
+            "queue_depth": len(self._waiters),
+            "queued_units": self._queued_units(),
+            "unit_seconds": round(self._unit_seconds, 4),
+            "wait_seconds": self._wait.snapshot(),
+            **self._stats,
+        }
+
+
+# Global admission controller for FastF1 computations
+admission = AdmissionController(
+    capacity=settings.admission_capacity,
+    max_queue=settings.admission_max_queue,
+    target_wait=settings.admission_target_wait,
+)
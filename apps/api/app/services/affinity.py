@@ -0,0 +1,271 @@
+"""
+Session affinity across worker processes
+
+With several uvicorn workers on a host, each would otherwise load the
+same popular sessions (and hold their telemetry bundles) separately.
+Instead, every session is owned by one worker, chosen by rendezvous
+hashing of (season, event, session) over the live workers, and the other
+workers forward that session's computations to the owner over a Unix
+socket. When a worker starts or exits only the sessions it owned move.
+
+Workers find each other through their sockets in AFFINITY_SOCKET_DIR, so
+this only spans one host. Messages are length-prefixed JSON. If the owner
+can't be reached the computation runs locally, as without affinity.
+
+Cancellation carries across: when the forwarding request is cancelled
+(see `app.utils.cancellation`) it closes the connection, and the owner
+cancels the computation's token once it sees the connection close.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.admission import Overloaded
+from app.utils.cancellation import (
+    DISCONNECTED,
+    TIMED_OUT,
+    CancelToken,
+    OperationCancelled,
+    cancellable,
+    current_token,
+)
+
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+# Seconds a directory listing of live workers is reused
+MEMBERS_TTL = 1.0
+
+# Seconds between checks of the forwarding request's cancellation token
+CANCEL_POLL_INTERVAL = 0.25
+
+_HEADER = struct.Struct(">I")
+
+# Set while serving a forwarded call, which must never be forwarded again
+_serving: ContextVar[bool] = ContextVar("affinity_serving", default=False)
+
+
+def rendezvous_owner(key: str, members: List[str]) -> Optional[str]:
+    """The member with the highest hash score for `key`"""
+    if not members:
+        return None
+    return max(
+        members,
+        key=lambda member: hashlib.sha256(f"{member}:{key}".encode()).digest(),
+    )
+
+
+async def _send(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    body = json.dumps(message, separators=(",", ":")).encode()
+    writer.write(_HEADER.pack(len(body)) + body)
+    await writer.drain()
+
+
+async def _receive(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    return json.loads(await reader.readexactly(length))
+
+
+async def _receive_unless_cancelled(
+    reader: asyncio.StreamReader,
+    token: Optional[CancelToken],
+) -> Dict[str, Any]:
+    """Receive a message, raising OperationCancelled if `token` is cancelled first"""
+    receive = asyncio.ensure_future(_receive(reader))
+    try:
+        while True:
+            done, _ = await asyncio.wait({receive}, timeout=CANCEL_POLL_INTERVAL)
+            if done:
+                return receive.result()
+            if token is not None:
+                token.check()
+    finally:
+        receive.cancel()
+
+
+async def _cancel_on_close(reader: asyncio.StreamReader, token: CancelToken) -> None:
+    # The forwarder sends nothing after its request, so a read only
+    # returns once it has closed the connection
+    try:
+        await reader.read(1)
+    except ConnectionError:
+        pass
+    token.cancel(DISCONNECTED)
+
+
+class AffinityRouter:
+    """Forwards session-bound computations to the worker that owns the session"""
+
+    def __init__(self, socket_dir: str, member_id: Optional[str] = None):
+        self.socket_dir = socket_dir
+        self._member_id = member_id
+        self._handlers: Dict[str, Handler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._members: List[str] = []
+        self._members_at = 0.0
+        self._stats = {"forwarded": 0, "served": 0, "fallbacks": 0}
+
+    @property
+    def member_id(self) -> str:
+        # Looked up late: worker processes are started after import
+        return self._member_id or str(os.getpid())
+
+    @property
+    def started(self) -> bool:
+        return self._server is not None
+
+    def register(self, kind: str, handler: Handler) -> None:
+        """Handle forwarded `kind` calls as `await handler(params)`"""
+        self._handlers[kind] = handler
+
+    def _path(self, member: str) -> str:
+        return os.path.join(self.socket_dir, f"worker-{member}.sock")
+
+    async def start(self) -> None:
+        """Listen for forwarded calls and join the set of workers"""
+        os.makedirs(self.socket_dir, exist_ok=True)
+        path = self._path(self.member_id)
+        if os.path.exists(path):
+            os.unlink(path)
+        self._server = await asyncio.start_unix_server(self._serve, path=path)
+        self._members_at = 0.0
+        print(f"Affinity: worker {self.member_id} listening on {path}")
+
+    async def stop(self) -> None:
+        """Leave the set of workers so its sessions move to the others"""
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        try:
+            os.unlink(self._path(self.member_id))
+        except FileNotFoundError:
+            pass
+
+    def members(self) -> List[str]:
+        """Ids of the workers with a socket in the directory"""
+        now = time.monotonic()
+        if now - self._members_at > MEMBERS_TTL:
+            try:
+                names = os.listdir(self.socket_dir)
+            except FileNotFoundError:
+                names = []
+            self._members = sorted(
+                name[len("worker-"):-len(".sock")]
+                for name in names
+                if name.startswith("worker-") and name.endswith(".sock")
+            )
+            self._members_at = now
+        return self._members
+
+    def owner(self, session_key: str) -> Optional[str]:
+        return rendezvous_owner(session_key, self.members())
+
+    async def forward(
+        self,
+        kind: str,
+        session_key: str,
+        params: Dict[str, Any],
+    ) -> Optional[Any]:
+        """
+        Run a computation on the worker that owns `session_key`.
+
+        Returns None if this worker should compute it itself: it owns the
+        session, affinity isn't running, or the owner is unreachable.
+        """
+        if not self.started or _serving.get():
+            return None
+        owner = self.owner(session_key)
+        if owner is None or owner == self.member_id:
+            return None
+
+        try:
+            reader, writer = await asyncio.open_unix_connection(self._path(owner))
+        except (ConnectionRefusedError, FileNotFoundError):
+            # Left behind by a worker that died; its sessions move on
+            try:
+                os.unlink(self._path(owner))
+            except FileNotFoundError:
+                pass
+            self._members_at = 0.0
+            self._stats["fallbacks"] += 1
+            return None
+
+        self._stats["forwarded"] += 1
+        try:
+            await _send(writer, {"kind": kind, "params": params})
+            response = await asyncio.wait_for(
+                _receive_unless_cancelled(reader, current_token()),
+                timeout=settings.compute_timeout,
+            )
+        except asyncio.TimeoutError:
+            # Still computing on the owner, which caches the result
+            raise OperationCancelled(TIMED_OUT)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            print(f"Affinity: worker {owner} dropped {kind}, computing locally: {e}")
+            self._stats["fallbacks"] += 1
+            return None
+        finally:
+            # Also tells the owner to stop if this request was cancelled
+            writer.close()
+
+        if "cancelled" in response:
+            raise OperationCancelled(response["cancelled"])
+        if "overloaded" in response:
+            raise Overloaded(response["overloaded"], response["retry_after"])
+        if "error" in response:
+            raise HTTPException(status_code=response["status"], detail=response["error"])
+        return response["result"]
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        _serving.set(True)
+        watcher = None
+        try:
+            request = await _receive(reader)
+            self._stats["served"] += 1
+            # Cancelled at the deadline or when the forwarder hangs up
+            token = CancelToken(settings.compute_timeout)
+            watcher = asyncio.create_task(_cancel_on_close(reader, token))
+            try:
+                handler = self._handlers[request["kind"]]
+                with cancellable(token):
+                    response = {"result": await handler(request["params"])}
+            except OperationCancelled as e:
+                response = {"cancelled": e.reason}
+            except Overloaded as e:
+                response = {"overloaded": e.reason, "retry_after": e.retry_after}
+            except HTTPException as e:
+                response = {"error": e.detail, "status": e.status_code}
+            except Exception as e:
+                response = {"error": f"Forwarded {request.get('kind')} failed: {e}", "status": 500}
+            await _send(writer, response)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # The forwarding worker gave up; anything computed is cached
+            pass
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get this worker's id, the live workers and forwarding counters"""
+        return {
+            "enabled": self.started,
+            "member": self.member_id,
+            "members": len(self.members()) if self.started else 0,
+            **self._stats,
+        }
+
+
+# Global affinity router; started in the app lifespan when AFFINITY_ENABLED
+affinity = AffinityRouter(settings.affinity_socket_dir)
@@ -0,0 +1,181 @@
+"""
+Transparent compression of large cache values
+
+Values above a size threshold are zstd-compressed and prefixed with a
+one-byte header. Values below the threshold are stored as plain UTF-8
+without a header, so entries written before compression was enabled
+(and Redis integer counters) keep working unchanged.
+"""
+
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is in requirements.txt
+    zstandard = None
+
+
+HEADER_ZSTD = 0x01
+HEADER_ZSTD_DICT = 0x02
+HEADER_ZLIB = 0x03
+
+_HEADERS = (HEADER_ZSTD, HEADER_ZSTD_DICT, HEADER_ZLIB)
+
+
+class CompressionError(Exception):
+    """Raised when a stored value cannot be decompressed"""
+
+
+class CacheCompressor:
+    """
+    zstd compressor for cache values with per-namespace statistics.
+
+    An optional trained dictionary is used for the namespaces listed in
+    `dictionary_namespaces` (telemetry payloads share most of their keys
+    and structure, so a dictionary improves the ratio noticeably). If
+    zstandard is not installed, zlib is used instead. A `threshold` of
+    None disables compression; stored compressed values are still read.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[int] = 1024,
+        level: int = 3,
+        dictionary: Optional[bytes] = None,
+        dictionary_namespaces: Iterable[str] = ("telemetry",),
+    ):
+        self.threshold = threshold
+        self.level = level
+        self.dictionary_namespaces = set(dictionary_namespaces)
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+        self._dict: Optional["zstandard.ZstdCompressionDict"] = None
+        self._compressor = None
+        self._decompressor = None
+        self._dict_compressor = None
+        self._dict_decompressor = None
+
+        if zstandard is not None:
+            self._compressor = zstandard.ZstdCompressor(level=level)
+            self._decompressor = zstandard.ZstdDecompressor()
+            if dictionary:
+                self._dict = zstandard.ZstdCompressionDict(dictionary)
+                self._dict_compressor = zstandard.ZstdCompressor(
+                    level=level, dict_data=self._dict
+                )
+                self._dict_decompressor = zstandard.ZstdDecompressor(
+                    dict_data=self._dict
+                )
+
+    @classmethod
+    def from_file(cls, path: Optional[str], **kwargs) -> "CacheCompressor":
+        """Create a compressor, loading a trained dictionary from `path` if it exists"""
+        dictionary = None
+        if path:
+            try:
+                with open(path, "rb") as f:
+                    dictionary = f.read()
+            except OSError as e:
+                print(f"⚠️ Could not load zstd dictionary {path}: {e}")
+        return cls(dictionary=dictionary, **kwargs)
+
+    @staticmethod
+    def train_dictionary(samples: List[Union[str, bytes]], dict_size: int = 112640) -> bytes:
+        """Train a zstd dictionary from sample cache values"""
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to train a dictionary")
+        data = [s.encode("utf-8") if isinstance(s, str) else s for s in samples]
+        return zstandard.train_dictionary(dict_size, data).as_bytes()
+
+    def _namespace_stats(self, namespace: str) -> Dict[str, float]:
+        if namespace not in self._stats:
+            self._stats[namespace] = {
+                "writes": 0,
+                "compressed_writes": 0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+                "compress_seconds": 0.0,
+                "reads": 0,
+                "compressed_reads": 0,
+                "decompress_seconds": 0.0,
+            }
+        return self._stats[namespace]
+
+    def encode(self, namespace: str, value: str) -> bytes:
+        """Encode a value for storage, compressing it if above the threshold"""
+        raw = value.encode("utf-8")
+        stats = self._namespace_stats(namespace)
+        stats["writes"] += 1
+        stats["bytes_in"] += len(raw)
+
+        if self.threshold is None or len(raw) < self.threshold:
+            stats["bytes_out"] += len(raw)
+            return raw
+
+        start = time.thread_time()
+        if self._dict_compressor is not None and namespace in self.dictionary_namespaces:
+            body = bytes([HEADER_ZSTD_DICT]) + self._dict_compressor.compress(raw)
+        elif self._compressor is not None:
+            body = bytes([HEADER_ZSTD]) + self._compressor.compress(raw)
+        else:
+            body = bytes([HEADER_ZLIB]) + zlib.compress(raw, min(self.level, 9))
+        stats["compress_seconds"] += time.thread_time() - start
+
+        # Keep the plain value if compression didn't help
+        if len(body) >= len(raw):
+            stats["bytes_out"] += len(raw)
+            return raw
+
+        stats["compressed_writes"] += 1
+        stats["bytes_out"] += len(body)
+        return body
+
+    def decode(self, namespace: str, raw: Union[bytes, str]) -> str:
+        """Decode a stored value, decompressing it if it carries a header"""
+        if isinstance(raw, str):
+            return raw
+
+        stats = self._namespace_stats(namespace)
+        stats["reads"] += 1
+
+        if not raw or raw[0] not in _HEADERS:
+            return raw.decode("utf-8")
+
+        start = time.thread_time()
+        header, body = raw[0], raw[1:]
+        try:
+            if header == HEADER_ZLIB:
+                data = zlib.decompress(body)
+            elif zstandard is None:
+                raise CompressionError("zstandard is not installed")
+            elif header == HEADER_ZSTD_DICT:
+                if self._dict_decompressor is None:
+                    raise CompressionError("value requires a zstd dictionary")
+                data = self._dict_decompressor.decompress(body)
+            else:
+                data = self._decompressor.decompress(body)
+        except CompressionError:
+            raise
+        except Exception as e:
+            raise CompressionError(str(e)) from e
+        finally:
+            stats["decompress_seconds"] += time.thread_time() - start
+
+        stats["compressed_reads"] += 1
+        return data.decode("utf-8")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Get compression ratio and CPU cost per namespace"""
+        result = {}
+        for namespace, stats in self._stats.items():
+            result[namespace] = {
+                **stats,
+                "ratio": (
+                    round(stats["bytes_in"] / stats["bytes_out"], 3)
+                    if stats["bytes_out"]
+                    else 1.0
+                ),
+            }
+        return result
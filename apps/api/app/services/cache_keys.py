@@ -0,0 +1,190 @@
+"""
+Canonical cache key components
+
+The API accepts free-form event strings, so "Monaco", "monaco",
+"Monaco Grand Prix" and round 8 would otherwise be cached separately.
+Events are resolved to their round number through a cached FastF1 lookup,
+session names and driver codes are normalized, and driver pairs are put
+in a fixed order so A-vs-B and B-vs-A share one artifact.
+"""
+
+import re
+from typing import Any, Dict, Optional, Tuple
+
+import fastf1
+from fastapi.concurrency import run_in_threadpool
+
+from app.services.cache_service import cache_service, InMemoryCache
+
+
+SESSION_ALIASES = {
+    "fp1": "FP1",
+    "practice 1": "FP1",
+    "fp2": "FP2",
+    "practice 2": "FP2",
+    "fp3": "FP3",
+    "practice 3": "FP3",
+    "q": "Q",
+    "qualifying": "Q",
+    "sq": "SQ",
+    "sprint qualifying": "SQ",
+    "sprint shootout": "SQ",
+    "ss": "SQ",
+    "s": "S",
+    "sprint": "S",
+    "r": "R",
+    "race": "R",
+}
+
+# Event → round and session start lookups are cached for a day in the
+# shared cache and for an hour in each worker
+EVENT_ROUND_TTL = 86400
+EVENT_ROUND_LOCAL_TTL = 3600
+# Failed lookups may be transient (a schedule fetch error), so they are
+# only remembered briefly and only by the worker that saw them
+EVENT_ROUND_FAILURE_TTL = 60
+
+_GRAND_PRIX_SUFFIX = re.compile(r"\s+(grand prix|gp)$")
+
+
+def normalize_event_name(event: str) -> str:
+    """Lower-case an event name, collapse whitespace and drop a "Grand Prix" suffix"""
+    name = " ".join(str(event).lower().split())
+    return _GRAND_PRIX_SUFFIX.sub("", name)
+
+
+def normalize_session(session: str) -> str:
+    """Map session names and aliases to FastF1 identifiers (FP1, Q, R, ...)"""
+    key = " ".join(str(session).lower().split())
+    return SESSION_ALIASES.get(key, str(session).strip().upper())
+
+
+def normalize_driver(driver: str) -> str:
+    """Normalize a driver code"""
+    return str(driver).strip().upper()
+
+
+def canonical_pair(
+    driver_a: str,
+    driver_b: str,
+    lap_a: Optional[int] = None,
+    lap_b: Optional[int] = None,
+) -> Tuple[str, str, Optional[int], Optional[int], bool]:
+    """
+    Put a driver/lap pair in canonical order.
+
+    Returns (driver_a, driver_b, lap_a, lap_b, swapped), where `swapped`
+    means the caller asked for the pair in the opposite order and the
+    result must be passed through `swap_comparison` before returning it.
+    """
+    side_a = (normalize_driver(driver_a), lap_a)
+    side_b = (normalize_driver(driver_b), lap_b)
+    swapped = (side_b[0], side_b[1] or 0) < (side_a[0], side_a[1] or 0)
+    if swapped:
+        side_a, side_b = side_b, side_a
+    return side_a[0], side_b[0], side_a[1], side_b[1], swapped
+
+
+def swap_comparison(comparison: Dict[str, Any]) -> Dict[str, Any]:
+    """Swap the sides of a serialized TelemetryComparison and negate its delta"""
+    swapped = dict(comparison)
+    swapped["driverA"] = comparison["driverB"]
+    swapped["driverB"] = comparison["driverA"]
+    swapped["sectorsA"] = comparison.get("sectorsB")
+    swapped["sectorsB"] = comparison.get("sectorsA")
+    swapped["delta"] = [
+        {**point, "delta": -point["delta"]}
+        for point in comparison.get("delta", [])
+    ]
+    return swapped
+
+
+class CacheKeyResolver:
+    """Resolves request parameters to canonical cache key components"""
+
+    def __init__(self):
+        self._local = InMemoryCache(max_entries=1024)
+
+    @staticmethod
+    def _resolve_round(season: int, event: str) -> Optional[int]:
+        """Resolve an event name to its round number via FastF1"""
+        try:
+            event_obj = fastf1.get_event(season, event)
+            round_number = int(event_obj["RoundNumber"])
+            return round_number or None
+        except Exception as e:
+            print(f"Could not resolve event {season} {event!r}: {e}")
+            return None
+
+    @staticmethod
+    def _resolve_session_start(season: int, event: str, session: str) -> Optional[float]:
+        """Get a session's scheduled start as a UTC timestamp via FastF1"""
+        try:
+            event_obj = fastf1.get_event(season, int(event) if event.isdigit() else event)
+            start = event_obj.get_session_date(session, utc=True)
+            if start is None or start != start:  # NaT
+                return None
+            if start.tzinfo is None:
+                start = start.tz_localize("UTC")
+            return start.timestamp()
+        except Exception as e:
+            print(f"Could not resolve session start {season} {event!r} {session}: {e}")
+            return None
+
+    async def _lookup(self, lookup_key: str, resolve, *args) -> str:
+        """Run a schedule lookup through the worker-local and shared caches"""
+        value = await self._local.get(lookup_key)
+        if value is None:
+            value = await cache_service.get(lookup_key)
+            if value is None:
+                resolved = await run_in_threadpool(resolve, *args)
+                if not resolved:
+                    await self._local.set(lookup_key, "0", ex=EVENT_ROUND_FAILURE_TTL)
+                    return "0"
+                value = str(resolved)
+                await cache_service.set(lookup_key, value, ttl=EVENT_ROUND_TTL)
+            await self._local.set(lookup_key, value, ex=EVENT_ROUND_LOCAL_TTL)
+        return value
+
+    async def canonical_event(self, season: int, event: str) -> str:
+        """
+        Get the canonical key component for an event.
+
+        Returns "r<round>" when the event resolves to a round, otherwise the
+        normalized event name.
+        """
+        normalized = normalize_event_name(event)
+        if normalized.isdigit():
+            return f"r{int(normalized)}"
+
+        round_number = await self._lookup(
+            f"pitlane:event_round:{season}:{normalized}",
+            self._resolve_round,
+            season,
+            event,
+        )
+        if int(round_number):
+            return f"r{int(round_number)}"
+        return normalized
+
+    async def session_start(self, season: int, event: str, session: str) -> Optional[float]:
+        """Get a session's scheduled start as a UTC timestamp, or None if unknown"""
+        event_key, session_key = await self.session_parts(season, event, session)
+        # Look the event up by round number once it is known
+        round_number = event_key[1:] if re.fullmatch(r"r\d+", event_key) else event
+        start = await self._lookup(
+            f"pitlane:session_start:{season}:{event_key}:{session_key}",
+            self._resolve_session_start,
+            season,
+            round_number,
+            session_key,
+        )
+        return float(start) or None
+
+    async def session_parts(self, season: int, event: str, session: str) -> Tuple[str, str]:
+        """Get canonical (event, session) key components"""
+        return await self.canonical_event(season, event), normalize_session(session)
+
+
+# Global key resolver instance
+cache_keys = CacheKeyResolver()
@@ -4,34 +4,115 @@ Falls back to in-memory cache for local development
 """
 
 import json
+import os
+import time
+import asyncio
 import hashlib
-from typing import Optional, Any, Dict
-from datetime import datetime
+import uuid
+from collections import OrderedDict
+from typing import Optional, Any, Awaitable, Callable, Dict, List, Tuple
 import redis.asyncio as redis
 
 from app.config import settings
+from app.services.cache_compression import CacheCompressor, CompressionError
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.disk_cache import DiskCache
+from app.services.metrics import CacheMetrics
 
 
 class InMemoryCache:
-    """Simple in-memory cache fallback for local dev"""
+    """
+    In-memory LRU cache fallback for local dev and Redis-less deployments.
     
-    def __init__(self):
-        self._cache: Dict[str, tuple[Any, float]] = {}
+    Entries live in an OrderedDict in least-recently-used order, so reads
+    and writes stay O(1). The cache is bounded by an entry count and an
+    approximate byte budget; expired keys are removed lazily on read and
+    periodically by a background sweeper.
+    """
+    
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self._cache: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+    
+    @staticmethod
+    def _entry_size(key: str, value: Any) -> int:
+        """Approximate memory footprint of an entry in bytes"""
+        return len(key) + len(value if isinstance(value, str) else str(value))
+    
+    def _remove(self, key: str) -> None:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+    
+    def _evict(self) -> None:
+        """Evict least recently used entries until within budget"""
+        while self._cache and (
+            (self.max_entries and len(self._cache) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            _, (_, _, size) = self._cache.popitem(last=False)
+            self._bytes -= size
+            self._stats["evictions"] += 1
     
     async def get(self, key: str) -> Optional[str]:
-        if key in self._cache:
-            value, expires = self._cache[key]
-            if expires > datetime.now().timestamp():
-                return value
-            del self._cache[key]
-        return None
+        entry = self._cache.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return None
+        value, expires, _ = entry
+        if expires <= time.time():
+            self._remove(key)
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None
+        self._cache.move_to_end(key)
+        self._stats["hits"] += 1
+        return value
     
-    async def set(self, key: str, value: str, ex: int = 3600) -> None:
-        expires = datetime.now().timestamp() + ex
-        self._cache[key] = (value, expires)
+    async def set(
+        self,
+        key: str,
+        value: str,
+        ex: int = 3600,
+        nx: bool = False,
+    ) -> Optional[bool]:
+        if nx:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] > time.time():
+                return None
+        self._remove(key)
+        size = self._entry_size(key, value)
+        self._cache[key] = (value, time.time() + ex, size)
+        self._bytes += size
+        self._evict()
+        return True
     
     async def delete(self, key: str) -> None:
-        self._cache.pop(key, None)
+        self._remove(key)
+    
+    async def clear(self) -> None:
+        self._cache.clear()
+        self._bytes = 0
+    
+    async def mget(self, keys: List[str]) -> List[Optional[str]]:
+        return [await self.get(key) for key in keys]
+    
+    async def set_many(self, mapping: Dict[str, str], ex: int = 3600) -> None:
+        for key, value in mapping.items():
+            await self.set(key, value, ex=ex)
     
     async def exists(self, key: str) -> bool:
         return await self.get(key) is not None
@@ -41,8 +122,8 @@ class InMemoryCache:
         new_val = int(current or 0) + 1
         # Keep existing TTL or set default
         if key in self._cache:
-            _, expires = self._cache[key]
-            ttl = int(expires - datetime.now().timestamp())
+            _, expires, _ = self._cache[key]
+            ttl = int(expires - time.time())
             await self.set(key, str(new_val), ex=max(ttl, 1))
         else:
             await self.set(key, str(new_val), ex=60)
@@ -50,47 +131,258 @@ class InMemoryCache:
     
     async def expire(self, key: str, seconds: int) -> None:
         if key in self._cache:
-            value, _ = self._cache[key]
-            expires = datetime.now().timestamp() + seconds
-            self._cache[key] = (value, expires)
+            value, _, size = self._cache[key]
+            self._cache[key] = (value, time.time() + seconds, size)
     
     async def ttl(self, key: str) -> int:
         if key in self._cache:
-            _, expires = self._cache[key]
-            return max(0, int(expires - datetime.now().timestamp()))
+            _, expires, _ = self._cache[key]
+            return max(0, int(expires - time.time()))
         return -1
+    
+    def sweep_expired(self) -> int:
+        """Remove all expired entries. Returns the number removed."""
+        now = time.time()
+        expired = [k for k, (_, expires, _) in self._cache.items() if expires <= now]
+        for key in expired:
+            self._remove(key)
+        self._stats["expirations"] += len(expired)
+        return len(expired)
+    
+    async def _sweep_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep_expired()
+    
+    def start_sweeper(self, interval: float) -> None:
+        """Start the periodic background sweep of expired keys"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+    
+    async def stop_sweeper(self) -> None:
+        """Stop the background sweeper"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get size, budget and hit/eviction statistics"""
+        return {
+            "entries": len(self._cache),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            **self._stats,
+        }
+
+
+def key_namespace(key: str) -> str:
+    """Get the namespace of a cache key (telemetry, strategy, ratelimit, ...)"""
+    parts = key.split(":", 2)
+    if parts[0] == "pitlane" and len(parts) > 1:
+        return parts[1]
+    return parts[0]
+
+
+# Pub/sub channel used to invalidate L1 entries across workers
+L1_INVALIDATION_CHANNEL = "pitlane:l1:invalidate"
+# Seconds between attempts to resubscribe after losing the channel
+INVALIDATION_RETRY_MIN = 1.0
+INVALIDATION_RETRY_MAX = 30.0
+
+# Keys that are mutated in place (counters, job state) and must never be
+# served from L1
+L1_EXCLUDED_PREFIXES = ("ratelimit:", "lock:", "pitlane:job:")
+
+# Marker for stale-while-revalidate envelopes, see get_or_revalidate_json
+SWR_MARKER = "__swr__"
+
+# Deletes a lock only if it still holds our token
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+EXTEND_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Sliding-window counter: the previous window's count, weighted by how
+# much of it still overlaps the sliding window, plus the current count.
+# Rejected hits aren't counted, so a client is let back in as soon as the
+# estimate drops below the limit.
+#   KEYS: current window counter, previous window counter
+#   ARGV: limit, window seconds, elapsed fraction of the current window
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call("get", KEYS[1]) or "0")
+local previous = tonumber(redis.call("get", KEYS[2]) or "0")
+local estimate = previous * (1 - tonumber(ARGV[3])) + current
+if estimate >= tonumber(ARGV[1]) then
+    return {0, tostring(estimate)}
+end
+if redis.call("incr", KEYS[1]) == 1 then
+    redis.call("expire", KEYS[1], 2 * tonumber(ARGV[2]))
+end
+return {1, tostring(estimate + 1)}
+"""
+
+
+async def sliding_window_hit_local(
+    client,
+    current: str,
+    previous: str,
+    limit: int,
+    window: int,
+    elapsed: float,
+) -> Tuple[bool, float]:
+    """SLIDING_WINDOW_SCRIPT for the local tiers, which have no scripting"""
+    current_count = int(await client.get(current) or 0)
+    previous_count = int(await client.get(previous) or 0)
+    estimate = previous_count * (1 - elapsed) + current_count
+    if estimate >= limit:
+        return False, estimate
+    if await client.incr(current) == 1:
+        await client.expire(current, 2 * window)
+    return True, estimate + 1
+
+
+def _unwrap(entry: Any) -> Any:
+    """Get the value out of a stale-while-revalidate envelope"""
+    if isinstance(entry, dict) and SWR_MARKER in entry:
+        return entry.get("value")
+    return entry
 
 
 class CacheService:
-    """Redis cache service with in-memory fallback"""
+    """
+    Redis cache service with in-memory fallback.
+    
+    When Redis is in use, a small per-worker in-process L1 tier sits in
+    front of it: hits are served from L1, L2 hits are promoted into L1,
+    and writes go through both. L1 entries live for at most
+    `cache_l1_ttl_seconds`; with `cache_l1_pubsub` enabled, writes and
+    deletes are also broadcast so other workers drop their copies.
+    
+    Values written to Redis above `cache_compression_threshold` bytes are
+    zstd-compressed transparently (see `CacheCompressor`).
+    
+    Redis calls go through a circuit breaker: after consecutive failures
+    the service fails over to the local tier without touching Redis,
+    probes it in the background and fails back once it answers again.
+    
+    The local tier is in-memory by default. With `disk_cache_dir` set it
+    is a SQLite `DiskCache` instead, which survives restarts and is
+    shared by all workers on the host; values are compressed there too.
+    """
     
     def __init__(self):
         self._redis: Optional[redis.Redis] = None
-        self._fallback = InMemoryCache()
+        self._fallback = self._create_local_tier()
         self._use_fallback = False
+        self._l1: Optional[InMemoryCache] = None
+        if settings.cache_l1_enabled:
+            self._l1 = InMemoryCache(
+                max_entries=settings.cache_l1_max_entries,
+                max_bytes=settings.cache_l1_max_bytes,
+            )
+        self._instance_id = uuid.uuid4().hex
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._compressor = CacheCompressor.from_file(
+            settings.cache_zstd_dict_path,
+            threshold=(
+                settings.cache_compression_threshold
+                if settings.cache_compression_enabled
+                else None
+            ),
+            level=settings.cache_compression_level,
+        )
+        self._invalidation_task: Optional[asyncio.Task] = None
+        self._breaker = CircuitBreaker(settings.cache_breaker_failure_threshold)
+        self.metrics = CacheMetrics()
+        self._probe_task: Optional[asyncio.Task] = None
+        self._sliding_window_script = None
+    
+    @staticmethod
+    def _create_local_tier():
+        """Create the fallback tier: SQLite if a disk cache directory is configured"""
+        if settings.disk_cache_dir:
+            return DiskCache(
+                os.path.join(settings.disk_cache_dir, "cache.sqlite3"),
+                max_bytes=settings.disk_cache_max_bytes,
+            )
+        return InMemoryCache(
+            max_entries=settings.memory_cache_max_entries,
+            max_bytes=settings.memory_cache_max_bytes,
+        )
+    
+    @property
+    def _local_backend(self) -> str:
+        return "disk" if isinstance(self._fallback, DiskCache) else "memory"
+    
+    def _stores_bytes(self, client) -> bool:
+        """Whether `client` stores encoded (possibly compressed) values"""
+        return client is self._redis or isinstance(client, DiskCache)
     
     async def connect(self) -> None:
         """Connect to Redis"""
         if settings.redis_url:
             try:
+                # Raw bytes: compressed values are binary, see CacheCompressor
                 self._redis = redis.from_url(
                     settings.redis_url,
-                    encoding="utf-8",
-                    decode_responses=True,
+                    decode_responses=False,
+                    socket_timeout=settings.redis_socket_timeout,
+                    socket_connect_timeout=settings.redis_socket_timeout,
                 )
                 # Test connection
                 await self._redis.ping()
                 print("✅ Connected to Redis")
             except Exception as e:
                 print(f"⚠️ Redis connection failed: {e}")
-                print("📦 Using in-memory cache fallback")
-                self._use_fallback = True
+                print(f"📦 Using {self._local_backend} cache fallback until Redis recovers")
+                self._breaker.trip(e)
+                self._start_probe()
         else:
-            print("📦 No Redis URL configured, using in-memory cache")
+            print(f"📦 No Redis URL configured, using {self._local_backend} cache")
             self._use_fallback = True
+        
+        self._fallback.start_sweeper(settings.memory_cache_sweep_interval)
+        
+        if self._l1 is not None and self._redis is not None:
+            self._l1.start_sweeper(settings.memory_cache_sweep_interval)
+            if settings.cache_l1_pubsub:
+                self._invalidation_task = asyncio.create_task(
+                    self._listen_for_invalidations()
+                )
     
     async def disconnect(self) -> None:
         """Disconnect from Redis"""
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        if self._probe_task:
+            self._probe_task.cancel()
+            self._probe_task = None
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
+        await self._fallback.stop_sweeper()
+        if isinstance(self._fallback, DiskCache):
+            self._fallback.close()
+        if self._l1:
+            await self._l1.stop_sweeper()
         if self._redis:
             await self._redis.close()
     
@@ -99,8 +391,113 @@ class CacheService:
         """Get the active cache client"""
         if self._use_fallback or not self._redis:
             return self._fallback
+        if not self._breaker.allow_request():
+            return self._fallback
         return self._redis
     
+    def _record_success(self, client) -> None:
+        if client is self._redis:
+            self._breaker.record_success()
+    
+    def _record_failure(self, client, error: Exception, namespace: str) -> None:
+        """Count a failure, opening the breaker after too many Redis failures in a row"""
+        self.metrics.record_error(namespace)
+        if client is self._redis and self._breaker.record_failure(error):
+            print(f"⚠️ Redis circuit opened after {self._breaker.consecutive_failures} failures, using {self._local_backend} cache")
+            self._start_probe()
+    
+    def _start_probe(self) -> None:
+        if self._probe_task is None or self._probe_task.done():
+            try:
+                self._probe_task = asyncio.create_task(self._probe_loop())
+            except RuntimeError:
+                # No running event loop (e.g. sync test code); probe on next trip
+                self._probe_task = None
+    
+    async def _probe_loop(self) -> None:
+        """Ping Redis in the background while the breaker is open"""
+        while not self._breaker.is_closed:
+            await asyncio.sleep(settings.cache_breaker_probe_interval)
+            self._breaker.begin_probe()
+            try:
+                await self._redis.ping()
+            except Exception as e:
+                self._breaker.probe_failed(e)
+                continue
+            self._breaker.close()
+            print(f"✅ Redis reachable again, failing back from {self._local_backend} cache")
+    
+    def status(self) -> Dict[str, Any]:
+        """Get the active backend and circuit breaker state"""
+        if self._use_fallback or not self._redis:
+            backend = self._local_backend
+        elif self._breaker.is_closed:
+            backend = "redis"
+        else:
+            backend = f"{self._local_backend} (failover)"
+        return {
+            "backend": backend,
+            "breaker": self._breaker.snapshot(),
+        }
+    
+    @property
+    def _l1_active(self) -> bool:
+        """L1 is only used in front of Redis, not in front of the local fallback"""
+        return self._l1 is not None and self._client is self._redis
+    
+    def _l1_eligible(self, key: str) -> bool:
+        return self._l1_active and not key.startswith(L1_EXCLUDED_PREFIXES)
+    
+    async def _l1_invalidate(self, key: str) -> None:
+        """Drop a key from the local L1 and tell other workers to do the same"""
+        await self._l1.delete(key)
+        if settings.cache_l1_pubsub:
+            try:
+                await self._redis.publish(
+                    L1_INVALIDATION_CHANNEL,
+                    f"{self._instance_id} {key}",
+                )
+            except Exception as e:
+                print(f"Cache invalidation publish error: {e}")
+    
+    async def _listen_for_invalidations(self) -> None:
+        """
+        Drop L1 entries invalidated by other workers, resubscribing with
+        backoff if the subscription is lost (e.g. Redis restarted)
+        """
+        delay = INVALIDATION_RETRY_MIN
+        resubscribing = False
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(L1_INVALIDATION_CHANNEL)
+                if resubscribing:
+                    # Invalidations sent while we weren't listening are lost
+                    await self._l1.clear()
+                    print("✅ Cache invalidation listener resubscribed")
+                delay = INVALIDATION_RETRY_MIN
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    data = message["data"]
+                    if isinstance(data, bytes):
+                        data = data.decode("utf-8")
+                    origin, _, key = data.partition(" ")
+                    if origin != self._instance_id:
+                        await self._l1.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cache invalidation listener lost its subscription, retrying in {delay:.0f}s: {e}")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            resubscribing = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, INVALIDATION_RETRY_MAX)
+    
     def _generate_key(self, *parts: str) -> str:
         """Generate a cache key from parts"""
         key = ":".join(str(p) for p in parts)
@@ -114,18 +511,47 @@ class CacheService:
     
     async def get(self, key: str) -> Optional[str]:
         """Get a value from cache"""
+        namespace = key_namespace(key)
+        key = self._hash_key(key)
+        start = time.perf_counter()
+        use_l1 = self._l1_eligible(key)
+        if use_l1:
+            value = await self._l1.get(key)
+            if value is not None:
+                self.metrics.record_get(
+                    namespace, True, time.perf_counter() - start, len(value), l1=True
+                )
+                return value
+        
+        client = self._client
         try:
-            return await self._client.get(self._hash_key(key))
+            value = await client.get(key)
+            self._record_success(client)
+            size = len(value) if value is not None else 0
+            if isinstance(value, bytes):
+                value = self._compressor.decode(namespace, value)
+        except CompressionError as e:
+            print(f"Cache decompression error for {key}: {e}")
+            self.metrics.record_error(namespace)
+            return None
         except Exception as e:
             print(f"Cache get error: {e}")
+            self._record_failure(client, e, namespace)
             return None
+        self.metrics.record_get(
+            namespace, value is not None, time.perf_counter() - start, size
+        )
+        
+        if use_l1 and value is not None:
+            await self._l1.set(key, value, ex=settings.cache_l1_ttl_seconds)
+        return value
     
     async def get_json(self, key: str) -> Optional[Any]:
         """Get and deserialize JSON from cache"""
         value = await self.get(key)
         if value:
             try:
-                return json.loads(value)
+                return _unwrap(json.loads(value))
             except json.JSONDecodeError:
                 return None
         return None
@@ -137,14 +563,32 @@ class CacheService:
         ttl: Optional[int] = None
     ) -> None:
         """Set a value in cache"""
+        namespace = key_namespace(key)
+        key = self._hash_key(key)
+        ttl = ttl or settings.cache_ttl_seconds
+        start = time.perf_counter()
+        client = self._client
         try:
-            await self._client.set(
-                self._hash_key(key),
-                value,
-                ex=ttl or settings.cache_ttl_seconds
+            payload = (
+                self._compressor.encode(namespace, value)
+                if self._stores_bytes(client)
+                else value
             )
+            await client.set(key, payload, ex=ttl)
+            self._record_success(client)
         except Exception as e:
             print(f"Cache set error: {e}")
+            self._record_failure(client, e, namespace)
+            return
+        self.metrics.record_set(namespace, time.perf_counter() - start, len(payload))
+        
+        if self._l1_eligible(key):
+            await self._l1_invalidate(key)
+            await self._l1.set(
+                key,
+                value,
+                ex=min(ttl, settings.cache_l1_ttl_seconds),
+            )
     
     async def set_json(
         self,
@@ -155,45 +599,402 @@ class CacheService:
         """Serialize and set JSON in cache"""
         await self.set(key, json.dumps(value), ttl)
     
+    async def get_many(self, keys: List[str]) -> Dict[str, Optional[str]]:
+        """Get several values in a single round trip (MGET)"""
+        result: Dict[str, Optional[str]] = {}
+        pending: List[Tuple[str, str, str]] = []
+        
+        for key in keys:
+            hashed = self._hash_key(key)
+            if self._l1_eligible(hashed):
+                value = await self._l1.get(hashed)
+                if value is not None:
+                    self.metrics.record_get(
+                        key_namespace(key), True, size=len(value), l1=True
+                    )
+                    result[key] = value
+                    continue
+            pending.append((key, hashed, key_namespace(key)))
+        
+        if not pending:
+            return result
+        
+        start = time.perf_counter()
+        client = self._client
+        try:
+            values = await client.mget([hashed for _, hashed, _ in pending])
+            self._record_success(client)
+        except Exception as e:
+            print(f"Cache mget error: {e}")
+            self._record_failure(client, e, "mget")
+            values = [None] * len(pending)
+        self.metrics.record_batch("mget", time.perf_counter() - start)
+        
+        for (key, hashed, namespace), value in zip(pending, values):
+            size = len(value) if value is not None else 0
+            if isinstance(value, bytes):
+                try:
+                    value = self._compressor.decode(namespace, value)
+                except CompressionError as e:
+                    print(f"Cache decompression error for {hashed}: {e}")
+                    self.metrics.record_error(namespace)
+                    value = None
+            self.metrics.record_get(namespace, value is not None, size=size)
+            result[key] = value
+            if value is not None and self._l1_eligible(hashed):
+                await self._l1.set(hashed, value, ex=settings.cache_l1_ttl_seconds)
+        
+        return result
+    
+    async def get_many_json(self, keys: List[str]) -> Dict[str, Optional[Any]]:
+        """Get and deserialize several JSON values in a single round trip"""
+        result: Dict[str, Optional[Any]] = {}
+        for key, value in (await self.get_many(keys)).items():
+            try:
+                result[key] = _unwrap(json.loads(value)) if value else None
+            except json.JSONDecodeError:
+                result[key] = None
+        return result
+    
+    async def set_many(
+        self,
+        mapping: Dict[str, str],
+        ttl: Optional[int] = None
+    ) -> None:
+        """Set several values in a single round trip (pipelined SETs)"""
+        if not mapping:
+            return
+        ttl = ttl or settings.cache_ttl_seconds
+        hashed = {self._hash_key(key): (key_namespace(key), value) for key, value in mapping.items()}
+        
+        start = time.perf_counter()
+        client = self._client
+        try:
+            if self._stores_bytes(client):
+                payloads = {
+                    key: self._compressor.encode(namespace, value)
+                    for key, (namespace, value) in hashed.items()
+                }
+            else:
+                payloads = {key: value for key, (_, value) in hashed.items()}
+            if client is self._redis:
+                async with client.pipeline(transaction=False) as pipe:
+                    for key, payload in payloads.items():
+                        pipe.set(key, payload, ex=ttl)
+                    await pipe.execute()
+            else:
+                await client.set_many(payloads, ex=ttl)
+            self._record_success(client)
+        except Exception as e:
+            print(f"Cache set_many error: {e}")
+            self._record_failure(client, e, "mset")
+            return
+        self.metrics.record_batch("mset", time.perf_counter() - start)
+        for key, (namespace, _) in hashed.items():
+            self.metrics.record_set(namespace, size=len(payloads[key]))
+        
+        for key, (_, value) in hashed.items():
+            if self._l1_eligible(key):
+                await self._l1_invalidate(key)
+                await self._l1.set(
+                    key,
+                    value,
+                    ex=min(ttl, settings.cache_l1_ttl_seconds),
+                )
+    
+    async def set_many_json(
+        self,
+        mapping: Dict[str, Any],
+        ttl: Optional[int] = None
+    ) -> None:
+        """Serialize and set several JSON values in a single round trip"""
+        await self.set_many(
+            {key: json.dumps(value) for key, value in mapping.items()},
+            ttl,
+        )
+    
+    async def get_or_revalidate_json(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None,
+        soft_ttl: Optional[int] = None,
+    ) -> Any:
+        """
+        Get a JSON value with stale-while-revalidate semantics.
+        
+        Entries carry a soft expiry (`soft_ttl`) in addition to the hard
+        expiry (`ttl`) enforced by the cache. Before the soft expiry the
+        value is served as-is; between soft and hard expiry the stale value
+        is served immediately and a single background refresh is started,
+        deduplicated across workers with a lock. On a miss the loader is
+        awaited inline. Falsy loader results are returned but not cached.
+        """
+        ttl = ttl or settings.cache_ttl_seconds
+        soft_ttl = min(soft_ttl or settings.cache_soft_ttl_seconds, ttl)
+        
+        raw = await self.get(key)
+        entry = None
+        if raw:
+            try:
+                entry = json.loads(raw)
+            except json.JSONDecodeError:
+                entry = None
+        
+        if isinstance(entry, dict) and SWR_MARKER in entry:
+            if entry.get("softExpires", 0) <= time.time():
+                self._schedule_refresh(key, loader, ttl, soft_ttl)
+            return entry.get("value")
+        if entry is not None:
+            # Written without an envelope; fresh until its hard expiry
+            return entry
+        
+        value = await loader()
+        if value:
+            await self._set_revalidating(key, value, ttl, soft_ttl)
+        return value
+    
+    async def _set_revalidating(self, key: str, value: Any, ttl: int, soft_ttl: int) -> None:
+        await self.set_json(
+            key,
+            {SWR_MARKER: 1, "softExpires": time.time() + soft_ttl, "value": value},
+            ttl,
+        )
+    
+    def _schedule_refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        soft_ttl: int,
+    ) -> None:
+        """Start a background refresh of `key` unless one is already running here"""
+        if key in self._refreshing:
+            return
+        task = asyncio.create_task(self._refresh(key, loader, ttl, soft_ttl))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+    
+    async def _refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        soft_ttl: int,
+    ) -> None:
+        lock_name = f"lock:{key}"
+        token = await self.acquire_lock(lock_name, settings.cache_refresh_lock_seconds)
+        if not token:
+            # Another worker is already refreshing this key
+            return
+        try:
+            value = await loader()
+            if value:
+                await self._set_revalidating(key, value, ttl, soft_ttl)
+        except Exception as e:
+            print(f"Cache refresh error for {key}: {e}")
+        finally:
+            await self.release_lock(lock_name, token)
+    
+    async def acquire_lock(self, name: str, ttl: int) -> Optional[str]:
+        """Try to acquire a short-lived lock. Returns a token on success."""
+        token = uuid.uuid4().hex
+        client = self._client
+        try:
+            acquired = await client.set(self._hash_key(name), token, ex=ttl, nx=True)
+            self._record_success(client)
+        except Exception as e:
+            print(f"Cache lock error: {e}")
+            self._record_failure(client, e, "lock")
+            return None
+        return token if acquired else None
+    
+    async def release_lock(self, name: str, token: str) -> None:
+        """Release a lock if it is still held with `token`"""
+        key = self._hash_key(name)
+        client = self._client
+        try:
+            if client is self._redis:
+                await client.eval(RELEASE_LOCK_SCRIPT, 1, key, token)
+            elif await client.get(key) == token:
+                await client.delete(key)
+            self._record_success(client)
+        except Exception as e:
+            print(f"Cache unlock error: {e}")
+            self._record_failure(client, e, "lock")
+    
+    async def extend_lock(self, name: str, token: str, ttl: int) -> bool:
+        """Reset a lock's expiry to `ttl` if it is still held with `token`"""
+        key = self._hash_key(name)
+        client = self._client
+        try:
+            if client is self._redis:
+                extended = await client.eval(EXTEND_LOCK_SCRIPT, 1, key, token, ttl)
+            elif await client.get(key) == token:
+                await client.expire(key, ttl)
+                extended = True
+            else:
+                extended = False
+            self._record_success(client)
+        except Exception as e:
+            print(f"Cache lock extend error: {e}")
+            self._record_failure(client, e, "lock")
+            return False
+        return bool(extended)
+    
     async def delete(self, key: str) -> None:
         """Delete a key from cache"""
+        key = self._hash_key(key)
+        client = self._client
         try:
-            await self._client.delete(self._hash_key(key))
+            await client.delete(key)
+            self._record_success(client)
         except Exception as e:
             print(f"Cache delete error: {e}")
+            self._record_failure(client, e, key_namespace(key))
+        
+        if self._l1_eligible(key):
+            await self._l1_invalidate(key)
     
     async def exists(self, key: str) -> bool:
         """Check if a key exists"""
+        client = self._client
         try:
-            return await self._client.exists(self._hash_key(key))
+            result = await client.exists(self._hash_key(key))
+            self._record_success(client)
+            return result
         except Exception as e:
             print(f"Cache exists error: {e}")
+            self._record_failure(client, e, key_namespace(key))
             return False
     
     # Rate limiting helpers
     async def incr(self, key: str) -> int:
         """Increment a counter"""
+        client = self._client
         try:
-            return await self._client.incr(self._hash_key(key))
+            result = await client.incr(self._hash_key(key))
+            self._record_success(client)
+            return result
         except Exception as e:
             print(f"Cache incr error: {e}")
+            self._record_failure(client, e, key_namespace(key))
             return 1
     
+    async def incr_with_expiry(self, key: str, seconds: int) -> int:
+        """
+        Increment a counter and (re)set its expiry in a single round trip.
+        
+        Recorded as a get in the key's namespace: a hit when the counter
+        already existed, a miss when this call started it.
+        """
+        namespace = key_namespace(key)
+        key = self._hash_key(key)
+        start = time.perf_counter()
+        client = self._client
+        try:
+            if client is self._redis:
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.incr(key)
+                    pipe.expire(key, seconds)
+                    count, _ = await pipe.execute()
+                self._record_success(client)
+            else:
+                count = await client.incr(key)
+                if count == 1:
+                    await client.expire(key, seconds)
+        except Exception as e:
+            print(f"Cache incr error: {e}")
+            self._record_failure(client, e, namespace)
+            return 1
+        self.metrics.record_get(namespace, count > 1, time.perf_counter() - start)
+        return count
+    
+    async def sliding_window_hit(
+        self,
+        key: str,
+        limit: int,
+        window: int,
+        now: Optional[float] = None,
+    ) -> Tuple[bool, float]:
+        """
+        Count a hit against a limit of `limit` hits per sliding `window` seconds.
+        
+        On Redis this is a single script call, so the check and the
+        increment are atomic across workers. Fails open on errors.
+        Recorded as a get in the key's namespace, a hit when the window
+        already held hits.
+        
+        Returns:
+            Tuple of (allowed, estimated hits in the window including this one)
+        """
+        now = time.time() if now is None else now
+        current_window = int(now // window)
+        current = self._hash_key(f"{key}:{current_window}")
+        previous = self._hash_key(f"{key}:{current_window - 1}")
+        elapsed = now / window - current_window
+        namespace = key_namespace(key)
+        start = time.perf_counter()
+        client = self._client
+        try:
+            if client is self._redis:
+                if self._sliding_window_script is None:
+                    self._sliding_window_script = client.register_script(SLIDING_WINDOW_SCRIPT)
+                allowed, estimate = await self._sliding_window_script(
+                    keys=[current, previous],
+                    args=[limit, window, elapsed],
+                    client=client,
+                )
+                self._record_success(client)
+            else:
+                allowed, estimate = await sliding_window_hit_local(
+                    client, current, previous, limit, window, elapsed
+                )
+        except Exception as e:
+            print(f"Rate limit counter error: {e}")
+            self._record_failure(client, e, namespace)
+            return True, 0.0
+        allowed, estimate = bool(allowed), float(estimate)
+        existing = estimate - 1 if allowed else estimate
+        self.metrics.record_get(namespace, existing > 0, time.perf_counter() - start)
+        return allowed, estimate
+    
     async def expire(self, key: str, seconds: int) -> None:
         """Set expiration on a key"""
+        client = self._client
         try:
-            await self._client.expire(self._hash_key(key), seconds)
+            await client.expire(self._hash_key(key), seconds)
+            self._record_success(client)
         except Exception as e:
             print(f"Cache expire error: {e}")
+            self._record_failure(client, e, key_namespace(key))
     
     async def ttl(self, key: str) -> int:
         """Get TTL of a key"""
+        client = self._client
         try:
-            return await self._client.ttl(self._hash_key(key))
+            result = await client.ttl(self._hash_key(key))
+            self._record_success(client)
+            return result
         except Exception as e:
             print(f"Cache ttl error: {e}")
+            self._record_failure(client, e, key_namespace(key))
             return -1
     
+    def compression_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get compression ratio and CPU cost per key namespace"""
+        return self._compressor.stats()
+    
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        """Get all cache metrics for the internal metrics endpoint"""
+        return {
+            **self.status(),
+            "namespaces": self.metrics.snapshot(),
+            "compression": self.compression_stats(),
+            "memory": self._fallback.stats(),
+            "l1": self._l1.stats() if self._l1 else None,
+        }
+    
     # Telemetry-specific cache keys
     def telemetry_key(
         self,
@@ -219,6 +1020,18 @@ class CacheService:
             lap_b_str
         )
     
+    def events_key(self, season: int) -> str:
+        """Generate cache key for a season's events"""
+        return self._generate_key("events", str(season))
+    
+    def sessions_key(self, season: int, event: str) -> str:
+        """Generate cache key for an event's sessions"""
+        return self._generate_key("sessions", str(season), event)
+    
+    def drivers_key(self, season: int, event: str, session: str) -> str:
+        """Generate cache key for a session's drivers"""
+        return self._generate_key("drivers", str(season), event, session)
+    
     def strategy_key(self, season: int, event: str, session: str) -> str:
         """Generate cache key for strategy data"""
         return self._generate_key("strategy", str(season), event, session)
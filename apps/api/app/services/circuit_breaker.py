@@ -0,0 +1,87 @@
+"""
+Circuit breaker for the Redis cache tier
+
+After `failure_threshold` consecutive failures the breaker opens and
+callers switch to the local tier instead of waiting on timeouts. While
+open, a background probe (run by the owner) decides when to close it.
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3):
+        self.failure_threshold = failure_threshold
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._stats = {
+            "trips": 0,
+            "failures": 0,
+            "short_circuits": 0,
+            "probe_failures": 0,
+        }
+
+    @property
+    def is_closed(self) -> bool:
+        return self.state == self.CLOSED
+
+    def allow_request(self) -> bool:
+        """Check whether a request may go to the protected tier"""
+        if self.state == self.CLOSED:
+            return True
+        self._stats["short_circuits"] += 1
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+
+    def record_failure(self, error: Exception) -> bool:
+        """Record a failed call. Returns True if this failure opened the breaker."""
+        self._stats["failures"] += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+        if self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self.trip(error)
+            return True
+        return False
+
+    def trip(self, error: Optional[Exception] = None) -> None:
+        """Open the breaker"""
+        if error is not None:
+            self.last_error = str(error)
+        self.state = self.OPEN
+        self.opened_at = time.time()
+        self._stats["trips"] += 1
+
+    def begin_probe(self) -> None:
+        self.state = self.HALF_OPEN
+
+    def probe_failed(self, error: Exception) -> None:
+        self._stats["probe_failures"] += 1
+        self.last_error = str(error)
+        self.state = self.OPEN
+
+    def close(self) -> None:
+        """Close the breaker after a successful probe"""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the breaker state for monitoring"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opened_at": self.opened_at,
+            "last_error": self.last_error,
+            **self._stats,
+        }
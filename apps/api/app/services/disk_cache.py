@@ -0,0 +1,324 @@
+"""
+Persistent local cache tier backed by SQLite
+
+Used in place of the in-memory fallback on single-node deployments
+without Redis, so computed artifacts survive restarts and are shared by
+all uvicorn workers on the host. The database runs in WAL mode, so
+readers in one worker never block on a writer in another; writers wait
+on `busy_timeout` instead of failing.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+Value = Union[str, bytes]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires);
+"""
+
+# Upserts a row, keeping it if it still holds a live value and nx is set
+UPSERT = """
+INSERT INTO cache (key, value, expires, accessed, size) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value,
+    expires = excluded.expires,
+    accessed = excluded.accessed,
+    size = excluded.size
+"""
+UPSERT_NX = UPSERT + " WHERE cache.expires <= ?"
+
+# Reads only bump the LRU position if it is older than this (seconds),
+# so hot keys don't turn every read into a write
+ACCESS_RESOLUTION = 60
+
+# Check the size budget every this many writes
+BUDGET_CHECK_INTERVAL = 64
+
+# Evict down to this fraction of the budget so eviction isn't run on every write
+EVICTION_LOW_WATER = 0.9
+
+
+class DiskCache:
+    """
+    SQLite cache with the same interface as `InMemoryCache`.
+
+    Entries carry an absolute expiry and a last-access time. The cache is
+    bounded by an approximate byte budget (and optionally an entry count);
+    when it is exceeded, least recently accessed entries are evicted.
+    Expired entries are removed lazily on read and by the background
+    sweeper. Blocking SQLite calls run in a worker thread.
+
+    The database is shared by all workers, so its size is counted rather
+    than tracked per write: on open, on every budget check and on every
+    sweep. `stats()` reports the last count and never touches SQLite.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        busy_timeout: float = 5.0,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.busy_timeout = busy_timeout
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._size = {"entries": 0, "bytes": 0}
+        self._sweeper: Optional[asyncio.Task] = None
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use (after the worker process has started)"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL only fsyncs on checkpoints; a crash can lose the
+            # last few writes, which is fine for a cache
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout * 1000)}")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+            self._enforce_budget(conn)
+        return self._conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.to_thread(self._locked, fn, *args)
+
+    def _locked(self, fn, *args):
+        with self._lock:
+            return fn(self._connect(), *args)
+
+    @staticmethod
+    def _entry_size(key: str, value: Value) -> int:
+        return len(key) + len(value)
+
+    # Blocking operations, called with the lock held
+
+    def _get(self, conn: sqlite3.Connection, key: str) -> Optional[Value]:
+        row = conn.execute(
+            "SELECT value, expires, accessed FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self._stats["misses"] += 1
+            return None
+        value, expires, accessed = row
+        now = time.time()
+        if expires <= now:
+            conn.execute("DELETE FROM cache WHERE key = ? AND expires <= ?", (key, now))
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None
+        if accessed < now - ACCESS_RESOLUTION:
+            conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        self._stats["hits"] += 1
+        return value
+
+    def _set(
+        self,
+        conn: sqlite3.Connection,
+        items: List[Tuple[str, Value]],
+        ex: int,
+        nx: bool,
+    ) -> bool:
+        now = time.time()
+        rows = [
+            (key, value, now + ex, now, self._entry_size(key, value))
+            for key, value in items
+        ]
+        if nx:
+            stored = conn.execute(UPSERT_NX, rows[0] + (now,)).rowcount > 0
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(UPSERT, rows)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            stored = True
+        self._writes += len(rows)
+        if self._writes >= BUDGET_CHECK_INTERVAL:
+            self._writes = 0
+            self._enforce_budget(conn)
+        return stored
+
+    def _incr(self, conn: sqlite3.Connection, key: str) -> int:
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] > now:
+                new_val = int(row[0]) + 1
+                expires = row[1]
+            else:
+                # Keep existing TTL or set default
+                new_val = 1
+                expires = now + 60
+            value = str(new_val)
+            conn.execute(UPSERT, (key, value, expires, now, self._entry_size(key, value)))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return new_val
+
+    def _enforce_budget(self, conn: sqlite3.Connection) -> int:
+        """Count the entries, then evict least recently accessed ones until within budget"""
+        entries, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        self._size = {"entries": entries, "bytes": total}
+        excess_entries = 0
+        excess_bytes = 0
+        if self.max_entries and entries > self.max_entries:
+            excess_entries = entries - int(self.max_entries * EVICTION_LOW_WATER)
+        if self.max_bytes and total > self.max_bytes:
+            excess_bytes = total - int(self.max_bytes * EVICTION_LOW_WATER)
+        if not excess_entries and not excess_bytes:
+            return 0
+
+        victims = []
+        freed = 0
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed"):
+            if len(victims) >= excess_entries and freed >= excess_bytes:
+                break
+            victims.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+        self._stats["evictions"] += len(victims)
+        self._size = {"entries": entries - len(victims), "bytes": total - freed}
+        return len(victims)
+
+    def _sweep(self, conn: sqlite3.Connection) -> int:
+        removed = conn.execute(
+            "DELETE FROM cache WHERE expires <= ?", (time.time(),)
+        ).rowcount
+        self._stats["expirations"] += removed
+        self._enforce_budget(conn)
+        return removed
+
+    # InMemoryCache interface
+
+    async def get(self, key: str) -> Optional[Value]:
+        return await self._run(self._get, key)
+
+    async def set(
+        self,
+        key: str,
+        value: Value,
+        ex: int = 3600,
+        nx: bool = False,
+    ) -> Optional[bool]:
+        stored = await self._run(self._set, [(key, value)], ex, nx)
+        return True if stored else None
+
+    async def delete(self, key: str) -> None:
+        await self._run(lambda conn: conn.execute("DELETE FROM cache WHERE key = ?", (key,)))
+
+    async def mget(self, keys: List[str]) -> List[Optional[Value]]:
+        return await self._run(lambda conn: [self._get(conn, key) for key in keys])
+
+    async def set_many(self, mapping: Dict[str, Value], ex: int = 3600) -> None:
+        if mapping:
+            await self._run(self._set, list(mapping.items()), ex, False)
+
+    async def exists(self, key: str) -> bool:
+        return await self.get(key) is not None
+
+    async def incr(self, key: str) -> int:
+        return await self._run(self._incr, key)
+
+    async def expire(self, key: str, seconds: int) -> None:
+        await self._run(
+            lambda conn: conn.execute(
+                "UPDATE cache SET expires = ? WHERE key = ? AND expires > ?",
+                (time.time() + seconds, key, time.time()),
+            )
+        )
+
+    async def ttl(self, key: str) -> int:
+        row = await self._run(
+            lambda conn: conn.execute(
+                "SELECT expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        )
+        if row is None:
+            return -1
+        return max(0, int(row[0] - time.time()))
+
+    def sweep_expired(self) -> int:
+        """Remove all expired entries and enforce the budget. Returns the number expired."""
+        return self._locked(self._sweep)
+
+    async def _sweep_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.sweep_expired)
+            except sqlite3.Error as e:
+                print(f"Disk cache sweep error: {e}")
+
+    def start_sweeper(self, interval: float) -> None:
+        """Start the periodic background sweep of expired keys"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop(interval))
+
+    async def stop_sweeper(self) -> None:
+        """Stop the background sweeper"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get size (as of the last count), budget and hit/eviction statistics"""
+        return {
+            "path": self.path,
+            **self._size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            **self._stats,
+        }
@@ -2,7 +2,10 @@
 FastF1 service for fetching F1 telemetry data
 """
 
+import contextvars
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 import pandas as pd
@@ -28,7 +31,15 @@ from app.models import (
     TrackEvolutionPoint,
     TrackEvolution,
 )
+from app.services.metrics import StageTimings
+from app.services.telemetry_bundle import BundleLap, TelemetryBundle, resample_lap
+from app.utils.cancellation import checkpoint
 from app.utils.downsampling import downsample_lttb
+from app.utils.progress import report_progress
+
+
+# Durations of the telemetry comparison stages, for /internal/metrics
+telemetry_stages = StageTimings()
 
 
 class FastF1Service:
@@ -36,6 +47,9 @@ class FastF1Service:
     
     def __init__(self):
         self._cache_initialized = False
+        # Per-driver halves of a telemetry comparison; started on first use
+        self._driver_pool: Optional[ThreadPoolExecutor] = None
+        self._driver_pool_lock = threading.Lock()
     
     def initialize_cache(self) -> None:
         """Initialize FastF1 cache directory"""
@@ -45,6 +59,22 @@ class FastF1Service:
         self._cache_initialized = True
         print(f"✅ FastF1 cache enabled at {cache_dir}")
     
+    def _drivers(self) -> ThreadPoolExecutor:
+        with self._driver_pool_lock:
+            if self._driver_pool is None:
+                self._driver_pool = ThreadPoolExecutor(
+                    max_workers=settings.telemetry_driver_threads,
+                    thread_name_prefix="telemetry-driver",
+                )
+            return self._driver_pool
+    
+    def shutdown(self) -> None:
+        """Stop the driver pool, dropping comparisons that haven't started"""
+        with self._driver_pool_lock:
+            pool, self._driver_pool = self._driver_pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
     def get_seasons(self) -> List[Season]:
         """Get available F1 seasons"""
         current_year = datetime.now().year
@@ -164,83 +194,95 @@ class FastF1Service:
     ) -> TelemetryComparison:
         """Get telemetry comparison between two drivers"""
         try:
-            session_obj = fastf1.get_session(season, event, session)
-            session_obj.load()
-            
-            # Get laps for each driver
-            driver_a_laps = session_obj.laps.pick_driver(driver_a)
-            driver_b_laps = session_obj.laps.pick_driver(driver_b)
-            
-            # Get specific lap or fastest lap
-            if lap_a:
-                lap_a_data = driver_a_laps[driver_a_laps["LapNumber"] == lap_a].iloc[0]
-            else:
-                lap_a_data = driver_a_laps.pick_fastest()
-            
-            if lap_b:
-                lap_b_data = driver_b_laps[driver_b_laps["LapNumber"] == lap_b].iloc[0]
-            else:
-                lap_b_data = driver_b_laps.pick_fastest()
-            
-            # Get telemetry
-            tel_a = lap_a_data.get_telemetry()
-            tel_b = lap_b_data.get_telemetry()
-            
-            # Process telemetry for driver A
-            telemetry_a = self._process_telemetry(
-                tel_a,
-                driver_a,
-                int(lap_a_data["LapNumber"]),
-                lap_a_data["LapTime"].total_seconds() if pd.notna(lap_a_data["LapTime"]) else None,
-                max_points
-            )
-            
-            # Process telemetry for driver B
-            telemetry_b = self._process_telemetry(
-                tel_b,
-                driver_b,
-                int(lap_b_data["LapNumber"]),
-                lap_b_data["LapTime"].total_seconds() if pd.notna(lap_b_data["LapTime"]) else None,
-                max_points
-            )
-            
-            # Calculate delta
-            delta = self._calculate_delta(tel_a, tel_b, max_points)
-            
-# Calculate delta
-            delta = self._calculate_delta(tel_a, tel_b, max_points)
-            
-            # Extract sector times
-            try:
-                sectors_a = SectorTimes(
-                    sector1=float(lap_a_data["Sector1Time"].total_seconds()) if pd.notna(lap_a_data["Sector1Time"]) else None,
-                    sector2=float(lap_a_data["Sector2Time"].total_seconds()) if pd.notna(lap_a_data["Sector2Time"]) else None,
-                    sector3=float(lap_a_data["Sector3Time"].total_seconds()) if pd.notna(lap_a_data["Sector3Time"]) else None,
+            with telemetry_stages.time("total"):
+                with telemetry_stages.time("load"):
+                    session_obj = fastf1.get_session(season, event, session)
+                    # Never interrupted: a load that outlives its request still
+                    # fills the FastF1 cache for the next one
+                    session_obj.load()
+                checkpoint()
+                report_progress(0.5)
+                
+                # Get specific lap or fastest lap for each driver
+                with telemetry_stages.time("laps"):
+                    lap_a_data = self._pick_lap(session_obj.laps, driver_a, lap_a)
+                    lap_b_data = self._pick_lap(session_obj.laps, driver_b, lap_b)
+                report_progress(0.6)
+                
+                # Driver B's pipeline runs alongside driver A's (with this
+                # request's cancellation token)
+                future_b = self._drivers().submit(
+                    contextvars.copy_context().run, self._driver_lap, lap_b_data, driver_b, max_points
                 )
-            except:
-                sectors_a = SectorTimes()
-
-            try:
-                sectors_b = SectorTimes(
-                    sector1=float(lap_b_data["Sector1Time"].total_seconds()) if pd.notna(lap_b_data["Sector1Time"]) else None,
-                    sector2=float(lap_b_data["Sector2Time"].total_seconds()) if pd.notna(lap_b_data["Sector2Time"]) else None,
-                    sector3=float(lap_b_data["Sector3Time"].total_seconds()) if pd.notna(lap_b_data["Sector3Time"]) else None,
+                try:
+                    telemetry_a, sectors_a, trace_a = self._driver_lap(lap_a_data, driver_a, max_points)
+                except BaseException:
+                    # Don't leave driver B's half running after this comparison
+                    future_b.cancel()
+                    wait([future_b])
+                    raise
+                report_progress(0.75)
+                telemetry_b, sectors_b, trace_b = future_b.result()
+                checkpoint()
+                report_progress(0.9)
+                
+                # Calculate delta
+                with telemetry_stages.time("delta"):
+                    delta = self._calculate_delta(trace_a, trace_b, max_points)
+                report_progress(0.95)
+                
+                return TelemetryComparison(
+                    driverA=telemetry_a,
+                    driverB=telemetry_b,
+                    delta=delta,
+                    sectorsA=sectors_a,
+                    sectorsB=sectors_b,
                 )
-            except:
-                sectors_b = SectorTimes()
-
-            return TelemetryComparison(
-                driverA=telemetry_a,
-                driverB=telemetry_b,
-                delta=delta,
-                sectorsA=sectors_a,
-                sectorsB=sectors_b,
-            )
         except Exception as e:
             print(f"Error fetching telemetry: {e}")
             raise
-
+    
+    @staticmethod
+    def _pick_lap(laps, driver: str, lap_number: Optional[int]) -> pd.Series:
+        """Get a driver's lap by number, or their fastest lap"""
+        driver_laps = laps.pick_driver(driver)
+        if lap_number:
+            return driver_laps[driver_laps["LapNumber"] == lap_number].iloc[0]
+        return driver_laps.pick_fastest()
+    
+    def _driver_lap(
+        self,
+        lap: pd.Series,
+        driver: str,
+        max_points: int
+    ) -> Tuple[LapTelemetry, SectorTimes, Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """Processed telemetry, sector times and (distance, seconds) trace for one lap"""
+        with telemetry_stages.time("telemetry"):
+            tel = lap.get_telemetry()
+        checkpoint()
         
+        with telemetry_stages.time("process"):
+            telemetry = self._process_telemetry(
+                tel,
+                driver,
+                int(lap["LapNumber"]),
+                lap["LapTime"].total_seconds() if pd.notna(lap["LapTime"]) else None,
+                max_points
+            )
+            try:
+                sectors = SectorTimes(**self._sector_times(lap))
+            except Exception:
+                sectors = SectorTimes()
+            
+            # Time along the lap, for the delta
+            trace = None
+            if "Time" in tel.columns and "Distance" in tel.columns:
+                trace = (
+                    tel["Distance"].to_numpy(dtype=np.float64, na_value=np.nan),
+                    tel["Time"].dt.total_seconds().to_numpy(dtype=np.float64, na_value=np.nan),
+                )
+        return telemetry, sectors, trace
+    
     def _process_telemetry(
         self,
         telemetry_df: pd.DataFrame,
@@ -250,28 +292,45 @@ class FastF1Service:
         max_points: int
     ) -> LapTelemetry:
         """Process raw telemetry DataFrame to LapTelemetry model"""
-        # Convert to list of dictionaries
-        data = []
-        for _, row in telemetry_df.iterrows():
-            data.append({
-                "distance": float(row.get("Distance", 0)),
-                "speed": float(row.get("Speed", 0)),
-                "throttle": float(row.get("Throttle", 0)),
-                "brake": float(row.get("Brake", 0)),
-                "gear": int(row.get("nGear", 0)),
-                "rpm": float(row.get("RPM", 0)) if pd.notna(row.get("RPM")) else None,
-                "drs": int(row.get("DRS", 0)) if pd.notna(row.get("DRS")) else None,
-            })
+        def column(name: str, default: float = 0.0) -> np.ndarray:
+            if name not in telemetry_df.columns:
+                return np.full(len(telemetry_df), default)
+            return telemetry_df[name].to_numpy(dtype=np.float64, na_value=np.nan)
+        
+        distance = column("Distance")
+        speed = column("Speed")
         
         # Downsample if needed
-        if len(data) > max_points:
+        if len(telemetry_df) > max_points:
             # Use LTTB algorithm for speed (representative)
-            distances = [d["distance"] for d in data]
-            speeds = [d["speed"] for d in data]
-            indices = downsample_lttb(distances, speeds, max_points)
-            data = [data[i] for i in indices]
+            indices = np.asarray(downsample_lttb(distance.tolist(), speed.tolist(), max_points), dtype=np.intp)
+        else:
+            indices = np.arange(len(telemetry_df))
+        
+        def values(name: str, default: float = 0.0) -> List[float]:
+            return column(name, default)[indices].tolist()
         
-        points = [TelemetryPoint(**d) for d in data]
+        # NaN != NaN: missing RPM and DRS samples become None
+        points = [
+            TelemetryPoint(
+                distance=d,
+                speed=s,
+                throttle=t,
+                brake=b,
+                gear=int(g) if g == g else 0,
+                rpm=r if r == r else None,
+                drs=int(x) if x == x else None,
+            )
+            for d, s, t, b, g, r, x in zip(
+                distance[indices].tolist(),
+                speed[indices].tolist(),
+                values("Throttle"),
+                values("Brake"),
+                values("nGear"),
+                values("RPM", np.nan),
+                values("DRS", np.nan),
+            )
+        ]
         
         return LapTelemetry(
             driver=driver,
@@ -282,45 +341,97 @@ class FastF1Service:
     
     def _calculate_delta(
         self,
-        tel_a: pd.DataFrame,
-        tel_b: pd.DataFrame,
+        trace_a: Optional[Tuple[np.ndarray, np.ndarray]],
+        trace_b: Optional[Tuple[np.ndarray, np.ndarray]],
         max_points: int
     ) -> List[DeltaPoint]:
-        """Calculate lap time delta between two drivers"""
+        """Calculate lap time delta between two (distance, seconds) traces"""
+        if trace_a is None or trace_b is None:
+            return []
         try:
-            # Add time column if not present
-            if "Time" not in tel_a.columns or "Time" not in tel_b.columns:
-                return []
-            
-            # Convert time to seconds
-            tel_a = tel_a.copy()
-            tel_b = tel_b.copy()
-            
-            tel_a["Seconds"] = tel_a["Time"].dt.total_seconds()
-            tel_b["Seconds"] = tel_b["Time"].dt.total_seconds()
+            (distance_a, seconds_a), (distance_b, seconds_b) = trace_a, trace_b
             
             # Interpolate times at common distances
             common_distances = np.linspace(
-                max(tel_a["Distance"].min(), tel_b["Distance"].min()),
-                min(tel_a["Distance"].max(), tel_b["Distance"].max()),
+                max(np.nanmin(distance_a), np.nanmin(distance_b)),
+                min(np.nanmax(distance_a), np.nanmax(distance_b)),
                 max_points
             )
             
-            time_a = np.interp(common_distances, tel_a["Distance"], tel_a["Seconds"])
-            time_b = np.interp(common_distances, tel_b["Distance"], tel_b["Seconds"])
-            
-            delta_points = []
-            for dist, t_a, t_b in zip(common_distances, time_a, time_b):
-                delta_points.append(DeltaPoint(
-                    distance=float(dist),
-                    delta=float(t_a - t_b)  # negative = A is faster
-                ))
+            time_a = np.interp(common_distances, distance_a, seconds_a)
+            time_b = np.interp(common_distances, distance_b, seconds_b)
             
-            return delta_points
+            return [
+                DeltaPoint(distance=dist, delta=delta)  # negative = A is faster
+                for dist, delta in zip(common_distances.tolist(), (time_a - time_b).tolist())
+            ]
         except Exception as e:
             print(f"Error calculating delta: {e}")
             return []
     
+    @staticmethod
+    def _sector_times(lap: pd.Series) -> Dict[str, Optional[float]]:
+        """Get a lap's sector times in seconds"""
+        return {
+            f"sector{i}": (
+                float(lap[f"Sector{i}Time"].total_seconds())
+                if pd.notna(lap.get(f"Sector{i}Time"))
+                else None
+            )
+            for i in (1, 2, 3)
+        }
+    
+    def get_session_bundle(
+        self,
+        season: int,
+        event: str,
+        session: str,
+        all_laps: bool = False
+    ) -> TelemetryBundle:
+        """Get every driver's fastest lap (or every lap) on a shared distance grid"""
+        try:
+            session_obj = fastf1.get_session(season, event, session)
+            session_obj.load()
+            report_progress(0.5)
+            
+            laps = []
+            fastest = {}
+            drivers = session_obj.laps["Driver"].dropna().unique()
+            for index, driver in enumerate(drivers):
+                report_progress(0.5 + 0.45 * index / len(drivers))
+                driver_laps = session_obj.laps.pick_driver(driver)
+                fastest_lap = driver_laps.pick_fastest()
+                if fastest_lap is not None and pd.notna(fastest_lap.get("LapNumber")):
+                    fastest[driver] = int(fastest_lap["LapNumber"])
+                
+                if all_laps:
+                    selected = [lap for _, lap in driver_laps.iterlaps()]
+                elif driver in fastest:
+                    selected = [fastest_lap]
+                else:
+                    continue
+                
+                for lap in selected:
+                    try:
+                        channels = resample_lap(lap.get_telemetry())
+                    except Exception as e:
+                        print(f"Skipping {driver} lap {lap.get('LapNumber')} in bundle: {e}")
+                        continue
+                    if "speed" not in channels:
+                        continue
+                    laps.append(BundleLap(
+                        driver=str(driver),
+                        lap_number=int(lap["LapNumber"]),
+                        lap_time=lap["LapTime"].total_seconds() if pd.notna(lap["LapTime"]) else None,
+                        sectors=self._sector_times(lap),
+                        channels=channels,
+                    ))
+            
+            return TelemetryBundle(laps, fastest)
+        except Exception as e:
+            print(f"Error building telemetry bundle: {e}")
+            raise
+    
     def get_strategy(self, season: int, event: str, session: str) -> StrategyData:
         """Get tire strategy data for a session"""
         try:
@@ -496,13 +607,16 @@ class FastF1Service:
             try:
                 session_obj = fastf1.get_session(season, event, session)
                 session_obj.load(telemetry=False, weather=False, messages=False)
+                report_progress(0.3)
                 
                 laps = session_obj.laps
                 results = session_obj.results
                 
                 drivers_data = []
                 
-                for driver_code in drivers:
+                for index, driver_code in enumerate(drivers):
+                    checkpoint()
+                    report_progress(0.3 + 0.65 * index / len(drivers))
                     driver_laps = laps[laps["Driver"] == driver_code].sort_values("LapNumber")
                     
                     if driver_laps.empty:
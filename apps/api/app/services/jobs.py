@@ -0,0 +1,422 @@
+"""
+Background jobs for heavy analyses
+
+Cold full-race computations can outlast proxy timeouts, so they can be
+submitted as jobs instead: submission returns immediately with a job id,
+a small pool of worker tasks computes the result, and clients poll the
+job for progress and pick up the result when it's done.
+
+Job ids are derived from the normalized parameters, so identical
+submissions share one job (and one computation) for as long as the job
+is kept. Handlers cache their result and return its cache key; the job
+record keeps only the key and polls read the result through it.
+
+The worker computing a job holds a short lease on it, renewed by a
+heartbeat that also refreshes the job's record. A queued or running job
+whose record hasn't been refreshed within the lease belonged to a worker
+that has gone away: it is reported as failed and can be submitted again.
+
+Jobs live in the shared cache (Redis, or the disk tier that all workers
+on a host share) when one is configured, so any worker can answer a
+poll. Otherwise they are kept in the submitting worker's memory, which
+only works with a single worker.
+"""
+
+import asyncio
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field, fields, replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.services.admission import Overloaded
+from app.services.cache_service import InMemoryCache, cache_service
+from app.utils.progress import Progress
+
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Polls for the record of a job claimed by a concurrent submission
+CLAIM_WAIT_ATTEMPTS = 10
+CLAIM_WAIT_INTERVAL = 0.05
+
+# Computes and caches a job's result; returns the result's cache key
+Handler = Callable[[Dict[str, Any], Progress], Awaitable[str]]
+# Reads a result back from its cache key, or None if it has expired
+ResultReader = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass
+class Job:
+    """A submitted computation and its outcome"""
+
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str = QUEUED
+    progress: float = 0.0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    error: Optional[str] = None
+    result_key: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        names = {f.name for f in fields(cls)}
+        return cls(**{name: value for name, value in data.items() if name in names})
+
+
+async def read_cached_json(key: str, params: Dict[str, Any]) -> Any:
+    """Default result reader: the JSON value cached under the key"""
+    return await cache_service.get_json(key)
+
+
+def job_id(kind: str, dedupe_key: str) -> str:
+    """Deterministic job id for a kind and its normalized parameters"""
+    digest = hashlib.sha256(f"{kind}:{dedupe_key}".encode()).hexdigest()
+    return f"{kind}-{digest[:24]}"
+
+
+class JobStore(ABC):
+    """Where job state lives between submission and the last poll"""
+
+    # Whether every worker sees the same jobs
+    shared = True
+
+    @abstractmethod
+    async def claim(self, job_id: str, ttl: int) -> bool:
+        """Atomically take ownership of computing `job_id`. False if already owned."""
+
+    @abstractmethod
+    async def renew(self, job_id: str, ttl: int) -> bool:
+        """Extend ownership of `job_id` for another `ttl` seconds. False if no longer owned."""
+
+    @abstractmethod
+    async def release(self, job_id: str) -> None:
+        """Give up ownership so the job can be submitted again"""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        """Load a job, or None if it doesn't exist or has expired"""
+
+    @abstractmethod
+    async def save(self, job: Job, ttl: int) -> None:
+        """Store a job's current state"""
+
+
+class InMemoryJobStore(JobStore):
+    """Jobs in this worker's memory; polls must reach the same worker"""
+
+    shared = False
+
+    def __init__(self, max_entries: int = 1000):
+        self._jobs = InMemoryCache(max_entries=max_entries)
+        self._claims = InMemoryCache(max_entries=max_entries)
+
+    async def claim(self, job_id: str, ttl: int) -> bool:
+        return bool(await self._claims.set(job_id, "1", ex=ttl, nx=True))
+
+    async def renew(self, job_id: str, ttl: int) -> bool:
+        if await self._claims.get(job_id) is None:
+            return False
+        await self._claims.expire(job_id, ttl)
+        return True
+
+    async def release(self, job_id: str) -> None:
+        await self._claims.delete(job_id)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = await self._jobs.get(job_id)
+        return Job.from_dict(job) if job else None
+
+    async def save(self, job: Job, ttl: int) -> None:
+        await self._jobs.set(job.id, job.to_dict(), ex=ttl)
+
+
+class SharedJobStore(JobStore):
+    """Jobs in the shared cache (Redis or the disk tier), visible to every worker"""
+
+    def __init__(self):
+        self._tokens: Dict[str, str] = {}
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"pitlane:job:{job_id}"
+
+    async def claim(self, job_id: str, ttl: int) -> bool:
+        token = await cache_service.acquire_lock(f"job:{job_id}", ttl)
+        if token is None:
+            return False
+        self._tokens[job_id] = token
+        return True
+
+    async def renew(self, job_id: str, ttl: int) -> bool:
+        token = self._tokens.get(job_id)
+        if token is None:
+            return False
+        return await cache_service.extend_lock(f"job:{job_id}", token, ttl)
+
+    async def release(self, job_id: str) -> None:
+        token = self._tokens.pop(job_id, None)
+        if token:
+            await cache_service.release_lock(f"job:{job_id}", token)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = await cache_service.get_json(self._key(job_id))
+        return Job.from_dict(job) if job else None
+
+    async def save(self, job: Job, ttl: int) -> None:
+        await cache_service.set_json(self._key(job.id), job.to_dict(), ttl=ttl)
+
+
+def create_job_store() -> JobStore:
+    """
+    Create the store selected by `jobs_backend`; by default the shared
+    cache if Redis or the disk tier is configured
+    """
+    shared_cache = settings.redis_url or settings.disk_cache_dir
+    backend = settings.jobs_backend or ("shared" if shared_cache else "memory")
+    if backend in ("shared", "redis"):
+        return SharedJobStore()
+    if backend != "memory":
+        raise ValueError(f"Unknown jobs backend: {backend!r}")
+    return InMemoryJobStore()
+
+
+class JobManager:
+    """
+    Deduplicating job queue drained by a pool of worker tasks.
+
+    Handlers are registered per job kind and called as
+    `await handler(params, progress)`; they return the cache key of the
+    result, which is read back with the kind's result reader. Computations
+    shed by admission control are retried after the suggested delay
+    rather than failed. Unfinished jobs are leased for `lease` seconds at
+    a time; finished ones are kept for `ttl`.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        workers: int = 2,
+        max_queued: int = 100,
+        ttl: int = 3600,
+        lease: float = 30,
+    ):
+        self.store = store
+        self.workers = workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.lease = lease
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._handlers: Dict[str, Handler] = {}
+        self._readers: Dict[str, ResultReader] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        # Queue slots held by submissions that haven't enqueued their job yet
+        self._reserved = 0
+        self._tasks: List[asyncio.Task] = []
+        # Jobs owned by this worker that haven't finished
+        self._active: Dict[str, Job] = {}
+        self._stats = {"submitted": 0, "deduplicated": 0, "succeeded": 0, "failed": 0, "retried": 0}
+
+    def register(
+        self,
+        kind: str,
+        handler: Handler,
+        reader: ResultReader = read_cached_json,
+    ) -> None:
+        self._handlers[kind] = handler
+        self._readers[kind] = reader
+
+    def _ensure_workers(self) -> None:
+        self._tasks = [task for task in self._tasks if not task.done()]
+        if not self._tasks:
+            # Created here so it belongs to the running event loop
+            self._queue = asyncio.Queue(maxsize=self.max_queued)
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._run()))
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._renew_leases())
+
+    def _stale(self, job: Job) -> bool:
+        """Whether an unfinished job's worker has stopped refreshing it"""
+        return not job.finished and job.updated_at < time.time() - self.lease
+
+    async def submit(self, kind: str, params: Dict[str, Any], dedupe_key: str) -> Job:
+        """
+        Submit a job, or return the existing job for identical parameters.
+        Raises Overloaded if the queue is full.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind!r}")
+        id_ = job_id(kind, dedupe_key)
+
+        existing = await self.store.get(id_)
+        if existing and not existing.finished and not self._stale(existing):
+            self._stats["deduplicated"] += 1
+            return existing
+        if existing and existing.status == SUCCEEDED and await self.result(existing) is not None:
+            self._stats["deduplicated"] += 1
+            return existing
+        # Failed, abandoned, or its result has expired from the cache: run it again
+        self._ensure_workers()
+        # Reserve the slot before awaiting, so concurrent submissions can't
+        # all pass the check and then overfill the queue
+        if self._queue.qsize() + self._reserved >= self.max_queued:
+            raise Overloaded("job queue full", retry_after=5)
+        self._reserved += 1
+        try:
+            if not await self.store.claim(id_, self._lease_seconds):
+                # Submitted concurrently elsewhere; its record may not be saved yet
+                self._stats["deduplicated"] += 1
+                return await self._wait_for_record(id_, existing)
+
+            job = Job(id_, kind, params)
+            try:
+                await self.store.save(job, self.ttl)
+            except BaseException:
+                await self.store.release(id_)
+                raise
+            self._active[id_] = job
+            self._queue.put_nowait(job)
+        finally:
+            self._reserved -= 1
+        self._stats["submitted"] += 1
+        return job
+
+    async def _wait_for_record(self, job_id: str, previous: Optional[Job]) -> Job:
+        """Get the record saved by the submission that claimed the job"""
+        for _ in range(CLAIM_WAIT_ATTEMPTS):
+            job = await self.store.get(job_id)
+            if job is not None and (previous is None or job.created_at != previous.created_at):
+                return job
+            await asyncio.sleep(CLAIM_WAIT_INTERVAL)
+        raise Overloaded("job is being submitted", retry_after=1)
+
+    @property
+    def _lease_seconds(self) -> int:
+        return max(1, round(self.lease))
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = await self.store.get(job_id)
+        if job is not None and self._stale(job):
+            return replace(job, status=FAILED, error="Job was abandoned by its worker, submit it again")
+        return job
+
+    async def _renew_leases(self) -> None:
+        """Keep this worker's unfinished jobs leased and their records fresh"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            for job in list(self._active.values()):
+                try:
+                    if not await self.store.renew(job.id, self._lease_seconds):
+                        print(f"⚠️ Lease on job {job.id} was lost")
+                    await self._update(job)
+                except Exception as e:
+                    print(f"Job lease renewal error for {job.id}: {e}")
+
+    async def result(self, job: Job) -> Any:
+        """Read a succeeded job's result, or None if it has expired from the cache"""
+        if job.status != SUCCEEDED or job.result_key is None:
+            return None
+        return await self._readers[job.kind](job.result_key, job.params)
+
+    async def _run(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._active.pop(job.id, None)
+                self._queue.task_done()
+
+    async def _update(self, job: Job, **changes: Any) -> None:
+        for name, value in changes.items():
+            setattr(job, name, value)
+        job.updated_at = time.time()
+        await self.store.save(job, self.ttl)
+
+    async def _execute(self, job: Job) -> None:
+        handler = self._handlers[job.kind]
+
+        async def progress(fraction: float) -> None:
+            fraction = round(min(max(fraction, 0.0), 1.0), 3)
+            # Reports from worker threads can land late or out of order
+            if job.finished or fraction <= job.progress:
+                return
+            await self._update(job, progress=fraction)
+
+        await self._update(job, status=RUNNING)
+        while True:
+            try:
+                result_key = await handler(job.params, progress)
+            except Overloaded as e:
+                # Shed by admission control: wait our turn instead of failing
+                self._stats["retried"] += 1
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                print(f"Job {job.id} failed: {e}")
+                self._stats["failed"] += 1
+                # HTTPExceptions from shared endpoint code carry a detail
+                await self._update(job, status=FAILED, error=str(getattr(e, "detail", e)))
+                await self.store.release(job.id)
+                return
+            break
+
+        self._stats["succeeded"] += 1
+        await self._update(job, status=SUCCEEDED, progress=1.0, result_key=result_key)
+        # The record dedupes submissions from here; releasing the claim lets
+        # the job run again once its result expires
+        await self.store.release(job.id)
+
+    async def join(self) -> None:
+        """Wait until every queued job has finished"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        """Cancel the workers and fail unfinished jobs so they can be submitted again"""
+        tasks = self._tasks + ([self._heartbeat] if self._heartbeat else [])
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._heartbeat = None
+        for job in list(self._active.values()):
+            await self._update(job, status=FAILED, error="Interrupted by shutdown")
+            await self.store.release(job.id)
+        self._active.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth, worker count and job counters"""
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "workers": len([task for task in self._tasks if not task.done()]),
+            **self._stats,
+        }
+
+
+# Global job manager
+job_manager = JobManager(
+    create_job_store(),
+    workers=settings.job_workers,
+    max_queued=settings.job_queue_max,
+    ttl=settings.job_ttl_seconds,
+    lease=settings.job_lease_seconds,
+)
@@ -0,0 +1,163 @@
+"""
+In-process metrics for the cache tier and computations
+
+Counters and fixed-bucket histograms per key namespace, and durations
+per computation stage, exposed as JSON on the internal metrics endpoint.
+Each worker process keeps its own numbers; aggregate across workers in
+the scraper.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+
+# Upper bounds in seconds
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Upper bounds in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Upper bounds in seconds for computation stages
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram with per-bucket (non-cumulative) counts"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class NamespaceMetrics:
+    """Cache metrics for one key namespace"""
+
+    def __init__(self):
+        self.hits = 0
+        self.l1_hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.sets = 0
+        self.get_latency = Histogram(LATENCY_BUCKETS)
+        self.set_latency = Histogram(LATENCY_BUCKETS)
+        self.value_size = Histogram(SIZE_BUCKETS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "l1_hits": self.l1_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "errors": self.errors,
+            "sets": self.sets,
+            "get_latency_seconds": self.get_latency.snapshot(),
+            "set_latency_seconds": self.set_latency.snapshot(),
+            "value_size_bytes": self.value_size.snapshot(),
+        }
+
+
+class CacheMetrics:
+    """Hit/miss/error counters and latency/size histograms per namespace"""
+
+    def __init__(self):
+        self._namespaces: Dict[str, NamespaceMetrics] = {}
+
+    def _ns(self, namespace: str) -> NamespaceMetrics:
+        metrics = self._namespaces.get(namespace)
+        if metrics is None:
+            metrics = self._namespaces[namespace] = NamespaceMetrics()
+        return metrics
+
+    def record_get(
+        self,
+        namespace: str,
+        hit: bool,
+        seconds: Optional[float] = None,
+        size: int = 0,
+        l1: bool = False,
+    ) -> None:
+        metrics = self._ns(namespace)
+        if hit:
+            metrics.hits += 1
+            if l1:
+                metrics.l1_hits += 1
+            metrics.value_size.observe(size)
+        else:
+            metrics.misses += 1
+        if seconds is not None:
+            metrics.get_latency.observe(seconds)
+
+    def record_set(self, namespace: str, seconds: Optional[float] = None, size: int = 0) -> None:
+        metrics = self._ns(namespace)
+        metrics.sets += 1
+        metrics.value_size.observe(size)
+        if seconds is not None:
+            metrics.set_latency.observe(seconds)
+
+    def record_batch(self, op: str, seconds: float) -> None:
+        """Record the latency of a multi-key round trip ("mget" or "mset")"""
+        metrics = self._ns(op)
+        if op == "mget":
+            metrics.get_latency.observe(seconds)
+        else:
+            metrics.set_latency.observe(seconds)
+
+    def record_error(self, namespace: str) -> None:
+        self._ns(namespace).errors += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            namespace: metrics.snapshot()
+            for namespace, metrics in sorted(self._namespaces.items())
+        }
+
+
+class StageTimings:
+    """Duration histograms per computation stage, recorded from worker threads"""
+
+    def __init__(self, buckets: Sequence[float] = STAGE_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._stages: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Record how long the block takes under `stage`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                stage: histogram.snapshot()
+                for stage, histogram in sorted(self._stages.items())
+            }
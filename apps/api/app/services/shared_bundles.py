@@ -0,0 +1,244 @@
+"""
+Telemetry bundles in shared memory
+
+Each worker keeps the bundles it serves in memory, so a hot session's
+arrays would be held once per worker. Instead, the first worker to load
+a bundle publishes its channel arrays into one `multiprocessing.
+shared_memory` segment, and the other workers on the host map that
+segment read-only rather than keeping their own copies.
+
+Segments are found through a small JSON registry guarded by a lock file
+(fcntl). It records each segment's layout (the lap table and where each
+lap's channels sit), its expiry and the pids that map it; a worker drops
+its reference when its own LRU evicts the bundle. A segment is unlinked
+once it has expired, no live worker maps it, or it is evicted to keep
+the registry bounded. Processes still mapping an unlinked segment
+keep valid memory until they drop their views.
+"""
+
+import json
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.services.telemetry_bundle import BundleLap, TelemetryBundle
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - POSIX only
+    fcntl = None
+
+
+DTYPE = np.float64
+
+
+def _open(name: str, size: int = 0) -> shared_memory.SharedMemory:
+    """Create (if `size`) or map a segment whose lifetime the registry manages"""
+    shm = shared_memory.SharedMemory(name=name, create=bool(size), size=size)
+    # Otherwise the resource tracker unlinks it when this process exits,
+    # pulling it out from under the other workers
+    resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+def _discard(shm: shared_memory.SharedMemory) -> None:
+    # unlink() unregisters it from the tracker, so register it first
+    resource_tracker.register(shm._name, "shared_memory")
+    shm.close()
+    shm.unlink()
+
+
+def _unlink(name: str) -> None:
+    try:
+        # Mapping registers it with the tracker, which unlink() undoes
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedBundleRegistry:
+    """Publishes bundles to shared memory and maps those published by other workers"""
+
+    def __init__(self, directory: str, max_segments: int = 16):
+        self.directory = directory
+        self.max_segments = max_segments
+        self._stats = {"published": 0, "attached": 0, "unlinked": 0}
+
+    @property
+    def available(self) -> bool:
+        return fcntl is not None
+
+    @property
+    def _registry_path(self) -> str:
+        return os.path.join(self.directory, "registry.json")
+
+    @contextmanager
+    def _locked(self) -> Iterator[Dict[str, Any]]:
+        """Registry entries by bundle key, written back if the block succeeds"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "registry.lock"), "a+") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self._registry_path) as f:
+                        entries = json.load(f)
+                except (FileNotFoundError, ValueError):
+                    entries = {}
+                yield entries
+                tmp_path = f"{self._registry_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(entries, f)
+                os.replace(tmp_path, self._registry_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _remove(self, entries: Dict[str, Any], key: str) -> None:
+        _unlink(entries.pop(key)["segment"])
+        self._stats["unlinked"] += 1
+
+    def _prune(self, entries: Dict[str, Any]) -> None:
+        """Drop dead workers' references, then expired and unreferenced segments"""
+        now = time.time()
+        for key, entry in list(entries.items()):
+            entry["refs"] = [pid for pid in entry["refs"] if _alive(pid)]
+            if entry["expires"] <= now or not entry["refs"]:
+                self._remove(entries, key)
+
+    @staticmethod
+    def _bundle(shm: shared_memory.SharedMemory, entry: Dict[str, Any]) -> TelemetryBundle:
+        data = np.ndarray(entry["size"], DTYPE, buffer=shm.buf)
+        data.flags.writeable = False
+        laps = [
+            BundleLap(
+                driver=lap["driver"],
+                lap_number=lap["lapNumber"],
+                lap_time=lap["lapTime"],
+                sectors=lap["sectors"],
+                channels={
+                    name: data[offset:offset + length]
+                    for name, (offset, length) in lap["channels"].items()
+                },
+            )
+            for lap in entry["laps"]
+        ]
+        bundle = TelemetryBundle(laps, entry["fastest"], entry["gridStep"])
+        # The views need the mapping; it goes away with the bundle
+        bundle.segment = shm
+        return bundle
+
+    def detach(self, key: str, segment: str) -> None:
+        """
+        Drop this worker's reference to a bundle it no longer keeps,
+        unlinking the segment if nobody else maps it. Views already
+        handed out stay valid.
+        """
+        with self._locked() as entries:
+            entry = entries.get(key)
+            # The key may have been republished in a new segment since
+            if entry is not None and entry["segment"] == segment:
+                entry["refs"] = [pid for pid in entry["refs"] if pid != os.getpid()]
+            self._prune(entries)
+
+    def attach(self, key: str) -> Optional[TelemetryBundle]:
+        """Map a bundle another worker published, or None if there isn't one"""
+        with self._locked() as entries:
+            self._prune(entries)
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            try:
+                shm = _open(entry["segment"])
+            except FileNotFoundError:
+                del entries[key]
+                return None
+            if os.getpid() not in entry["refs"]:
+                entry["refs"].append(os.getpid())
+        self._stats["attached"] += 1
+        return self._bundle(shm, entry)
+
+    def publish(self, key: str, bundle: TelemetryBundle, ttl: int) -> TelemetryBundle:
+        """
+        Copy a bundle into a new segment and register it. Returns the
+        shared copy, which the caller should use in place of `bundle`.
+        """
+        laps = []
+        offset = 0
+        for lap in bundle.laps.values():
+            channels = {}
+            for name, values in lap.channels.items():
+                channels[name] = (offset, len(values))
+                offset += len(values)
+            laps.append({
+                "driver": lap.driver,
+                "lapNumber": lap.lap_number,
+                "lapTime": lap.lap_time,
+                "sectors": lap.sectors,
+                "channels": channels,
+            })
+
+        shm = _open(f"pitlane_{secrets.token_hex(8)}", size=max(offset, 1) * DTYPE().itemsize)
+        data = np.ndarray(offset, DTYPE, buffer=shm.buf)
+        for lap, layout in zip(bundle.laps.values(), laps):
+            for name, (start, length) in layout["channels"].items():
+                data[start:start + length] = lap.channels[name]
+        del data
+
+        entry = {
+            "segment": shm.name,
+            "size": offset,
+            "gridStep": bundle.grid_step,
+            "fastest": bundle.fastest,
+            "laps": laps,
+            "expires": time.time() + ttl,
+            "refs": [os.getpid()],
+        }
+        with self._locked() as entries:
+            self._prune(entries)
+            published = key not in entries
+            if published:
+                entries[key] = entry
+                # Oldest first: evict down to the bound
+                while len(entries) > self.max_segments:
+                    self._remove(entries, next(iter(entries)))
+        if not published:
+            # Another worker got there first; use theirs
+            _discard(shm)
+            return self.attach(key) or bundle
+        self._stats["published"] += 1
+        return self._bundle(shm, entry)
+
+    def release(self) -> None:
+        """Drop this worker's references, unlinking segments nobody maps any more"""
+        with self._locked() as entries:
+            for entry in entries.values():
+                entry["refs"] = [pid for pid in entry["refs"] if pid != os.getpid()]
+            self._prune(entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get publish, attach and unlink counts"""
+        return dict(self._stats)
+
+
+# Global shared bundle registry; used when SHARED_BUNDLES_ENABLED
+shared_bundles = SharedBundleRegistry(
+    settings.shared_bundle_dir,
+    max_segments=settings.shared_bundle_max_segments,
+)
@@ -0,0 +1,266 @@
+"""
+Artifact storage backends
+
+`StorageService` handles serialization, content addressing and the
+manifest; a backend only moves bytes to and from paths. Supabase Storage
+is used in hosted deployments, the local filesystem on single-box and
+on-prem deployments and in tests.
+"""
+
+import asyncio
+import mmap
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Optional, Union
+
+import httpx
+
+from app.config import settings
+
+
+Blob = Union[bytes, mmap.mmap]
+
+
+class StorageError(Exception):
+    """Raised when a backend fails to read or write an object"""
+
+
+class StorageBackend(ABC):
+    """Byte storage addressed by slash-separated paths"""
+
+    # Whether artifacts should be gzipped before they are stored
+    compress = True
+
+    @property
+    def is_enabled(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def put(
+        self,
+        path: str,
+        body: bytes,
+        content_type: str,
+        cache_control: Optional[str] = None,
+        overwrite: bool = True,
+    ) -> None:
+        """Store `body` at `path`. With overwrite=False an existing object is kept."""
+
+    @abstractmethod
+    async def get(self, path: str) -> Optional[Blob]:
+        """Read the object at `path`, or None if it doesn't exist"""
+
+    @abstractmethod
+    async def delete(self, path: str) -> None:
+        """Delete the object at `path` if it exists"""
+
+    def public_url(self, path: str) -> Optional[str]:
+        """Get a public URL for the object at `path`, if the backend has one"""
+        return None
+
+    async def close(self) -> None:
+        """Release connections and other resources"""
+
+
+class SupabaseStorageBackend(StorageBackend):
+    """
+    Supabase Storage over its REST API.
+
+    Requests share one keep-alive connection pool and are capped at
+    `storage_max_concurrency` in flight, so storage I/O overlaps with
+    other requests without opening a connection per call.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str = "telemetry",
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.bucket_name = bucket_name
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def is_enabled(self) -> bool:
+        """Check if Supabase is configured"""
+        return all([
+            settings.supabase_url,
+            settings.supabase_service_key,
+        ])
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Get or create the HTTP client"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=f"{settings.supabase_url.rstrip('/')}/storage/v1",
+                headers={
+                    "apikey": settings.supabase_service_key,
+                    "Authorization": f"Bearer {settings.supabase_service_key}",
+                },
+                limits=httpx.Limits(
+                    max_connections=settings.storage_max_connections,
+                    max_keepalive_connections=settings.storage_max_connections,
+                ),
+                timeout=httpx.Timeout(
+                    settings.storage_timeout,
+                    connect=settings.storage_connect_timeout,
+                ),
+                transport=self._transport,
+            )
+            self._semaphore = asyncio.Semaphore(settings.storage_max_concurrency)
+        return self._client
+
+    async def _request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        client = self._get_client()
+        async with self._semaphore:
+            return await client.request(method, path, **kwargs)
+
+    def _object_path(self, path: str) -> str:
+        return f"/object/{self.bucket_name}/{path}"
+
+    @staticmethod
+    def _is_not_found(response: httpx.Response) -> bool:
+        # Storage reports missing objects as 400 with a not_found error body
+        return response.status_code == 404 or (
+            response.status_code == 400 and "not_found" in response.text.lower().replace(" ", "_")
+        )
+
+    @staticmethod
+    def _is_duplicate(response: httpx.Response) -> bool:
+        # Reported as 409, or as 400 with a Duplicate error body
+        return response.status_code == 409 or (
+            response.status_code == 400 and "duplicate" in response.text.lower()
+        )
+
+    async def put(
+        self,
+        path: str,
+        body: bytes,
+        content_type: str,
+        cache_control: Optional[str] = None,
+        overwrite: bool = True,
+    ) -> None:
+        headers = {"content-type": content_type}
+        if cache_control:
+            headers["cache-control"] = cache_control
+        if overwrite:
+            headers["x-upsert"] = "true"
+        response = await self._request("POST", self._object_path(path), content=body, headers=headers)
+        if not overwrite and self._is_duplicate(response):
+            return
+        response.raise_for_status()
+
+    async def get(self, path: str) -> Optional[bytes]:
+        response = await self._request("GET", self._object_path(path))
+        if self._is_not_found(response):
+            return None
+        response.raise_for_status()
+        return response.content
+
+    async def delete(self, path: str) -> None:
+        response = await self._request(
+            "DELETE",
+            f"/object/{self.bucket_name}",
+            json={"prefixes": [path]},
+        )
+        response.raise_for_status()
+
+    def public_url(self, path: str) -> Optional[str]:
+        return (
+            f"{settings.supabase_url.rstrip('/')}/storage/v1/object/public/"
+            f"{self.bucket_name}/{path}"
+        )
+
+    async def close(self) -> None:
+        """Close the connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Objects as files under a root directory.
+
+    Content-addressed object paths are already sharded by hash prefix,
+    which keeps directories small. Writes go to a temporary file in the
+    target directory and are renamed into place, so readers (including
+    other workers) never see a partial object. With `use_mmap`,
+    artifacts are stored uncompressed and read through a memory map.
+    """
+
+    def __init__(self, root: str, use_mmap: bool = False):
+        self.root = os.path.abspath(root)
+        self.use_mmap = use_mmap
+        self.compress = not use_mmap
+
+    def _path(self, path: str) -> str:
+        full = os.path.abspath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, full]) != self.root:
+            raise StorageError(f"Path escapes storage root: {path}")
+        return full
+
+    def _write(self, path: str, body: bytes, overwrite: bool) -> None:
+        target = self._path(path)
+        if not overwrite and os.path.exists(target):
+            return
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, target)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def _read(self, path: str) -> Optional[Blob]:
+        try:
+            with open(self._path(path), "rb") as f:
+                if self.use_mmap and not path.endswith(".gz"):
+                    if os.fstat(f.fileno()).st_size == 0:
+                        return b""
+                    # The mapping stays valid after the file is closed
+                    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.unlink(self._path(path))
+        except FileNotFoundError:
+            pass
+
+    async def put(
+        self,
+        path: str,
+        body: bytes,
+        content_type: str,
+        cache_control: Optional[str] = None,
+        overwrite: bool = True,
+    ) -> None:
+        await asyncio.to_thread(self._write, path, body, overwrite)
+
+    async def get(self, path: str) -> Optional[Blob]:
+        return await asyncio.to_thread(self._read, path)
+
+    async def delete(self, path: str) -> None:
+        await asyncio.to_thread(self._remove, path)
+
+
+def create_backend() -> StorageBackend:
+    """Create the backend selected by `storage_backend`"""
+    if settings.storage_backend == "local":
+        return LocalStorageBackend(settings.storage_local_dir, use_mmap=settings.storage_local_mmap)
+    if settings.storage_backend != "supabase":
+        raise ValueError(f"Unknown storage backend: {settings.storage_backend!r}")
+    return SupabaseStorageBackend()
@@ -1,133 +1,183 @@
 """
 Storage service for storing telemetry artifacts
-Uses Supabase Storage
+Uses Supabase Storage or the local filesystem (see storage_backends)
+
+Artifacts are content-addressed: each payload is written once under
+`objects/<sha256[:2]>/<sha256>.json.gz` and never modified, and a small
+manifest maps logical keys to object keys. Writes are single idempotent
+uploads, identical payloads are stored once, and object URLs can be
+cached indefinitely.
 """
 
+import asyncio
+import hashlib
 import json
 import gzip
 from typing import Optional, Any
-from supabase import create_client, Client
 
-from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.storage_backends import Blob, StorageBackend, create_backend
+
+
+OBJECT_PREFIX = "objects"
+MANIFEST_PREFIX = "manifests"
+
+# Objects never change once written
+IMMUTABLE_CACHE_CONTROL = "max-age=31536000, immutable"
+
+GZIP_MAGIC = b"\x1f\x8b"
 
 
 class StorageService:
-    """Supabase Storage service for telemetry artifacts"""
-    
-    def __init__(self):
-        self._client: Optional[Client] = None
-        self._enabled = False
-        self.bucket_name = "telemetry"
-    
-    def _get_client(self) -> Optional[Client]:
-        """Get or create Supabase client"""
-        if self._client is None and self._can_initialize():
-            self._client = create_client(
-                settings.supabase_url,
-                settings.supabase_service_key
-            )
-            self._enabled = True
-        return self._client
+    """
+    Content-addressed telemetry artifact storage.
     
-    def _can_initialize(self) -> bool:
-        """Check if Supabase can be initialized"""
-        return all([
-            settings.supabase_url,
-            settings.supabase_service_key,
-        ])
+    Bytes are stored by a pluggable backend (see `storage_backends`),
+    selected with the `storage_backend` setting. JSON encoding and gzip
+    run in a worker thread.
+    """
+    
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend or create_backend()
     
     @property
     def is_enabled(self) -> bool:
         """Check if storage is enabled and configured"""
-        if not self._enabled:
-            self._get_client()
-        return self._enabled
+        return self.backend.is_enabled
+    
+    async def close(self) -> None:
+        """Release backend connections"""
+        await self.backend.close()
     
     def _get_key(self, *parts: str) -> str:
         """Generate an object key from parts"""
         return "/".join(str(p) for p in parts)
     
+    @staticmethod
+    def _encode(data: Any, compress: bool) -> bytes:
+        """Serialize deterministically, so equal payloads produce equal bytes"""
+        body = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return gzip.compress(body, mtime=0) if compress else body
+    
+    @staticmethod
+    def _decode(body: Blob) -> Any:
+        if body[:2] == GZIP_MAGIC:
+            body = gzip.decompress(body)
+        # str() decodes straight from a memory map without an extra copy
+        return json.loads(str(body, "utf-8"))
+    
+    @staticmethod
+    def object_key(digest: str, compress: bool = True) -> str:
+        """Get the content-addressed object key for a payload hash"""
+        extension = "json.gz" if compress else "json"
+        return f"{OBJECT_PREFIX}/{digest[:2]}/{digest}.{extension}"
+    
+    def public_url(self, object_key: str) -> Optional[str]:
+        """Get the public URL of an immutable object (for public buckets behind a CDN)"""
+        return self.backend.public_url(object_key)
+    
+    def _manifest_cache_key(self, key: str) -> str:
+        return f"pitlane:manifest:{key}"
+    
+    async def resolve(self, key: str) -> Optional[str]:
+        """Get the object key a logical key currently points to"""
+        cache_key = self._manifest_cache_key(key)
+        object_key = await cache_service.get(cache_key)
+        if object_key:
+            return object_key
+        
+        body = await self.backend.get(f"{MANIFEST_PREFIX}/{key}")
+        if body is None:
+            return None
+        object_key = str(body, "utf-8").strip()
+        await cache_service.set(cache_key, object_key)
+        return object_key
+    
     async def upload_json(
         self,
         key: str,
         data: Any,
-        compress: bool = True
+        compress: Optional[bool] = None
     ) -> bool:
-        """Upload JSON data to Supabase Storage"""
-        client = self._get_client()
-        if not client:
+        """
+        Store JSON data under a logical key.
+        
+        The payload is uploaded once under its content hash (an existing
+        object with the same hash is left as is), then the manifest entry
+        for `key` is pointed at it. Re-uploading an unchanged payload for
+        the same key makes no requests. `compress` defaults to the
+        backend's preference.
+        """
+        if not self.is_enabled:
             return False
+        if compress is None:
+            compress = self.backend.compress
         
         try:
-            json_data = json.dumps(data)
-            
-            if compress:
-                body = gzip.compress(json_data.encode("utf-8"))
-            else:
-                body = json_data.encode("utf-8")
+            body = await asyncio.to_thread(self._encode, data, compress)
+            object_key = self.object_key(hashlib.sha256(body).hexdigest(), compress)
+            if await cache_service.get(self._manifest_cache_key(key)) == object_key:
+                return True
             
-            # Remove existing file if exists (upsert)
-            try:
-                client.storage.from_(self.bucket_name).remove([key])
-            except:
-                pass
-            
-            client.storage.from_(self.bucket_name).upload(
-                key,
+            await self.backend.put(
+                object_key,
                 body,
-                {"content-type": "application/gzip" if compress else "application/json"}
+                "application/gzip" if compress else "application/json",
+                cache_control=IMMUTABLE_CACHE_CONTROL,
+                overwrite=False,
+            )
+            await self.backend.put(
+                f"{MANIFEST_PREFIX}/{key}",
+                object_key.encode("utf-8"),
+                "text/plain",
+                cache_control="no-cache",
             )
+            await cache_service.set(self._manifest_cache_key(key), object_key)
             return True
         except Exception as e:
             print(f"Storage upload error: {e}")
             return False
     
     async def download_json(self, key: str) -> Optional[Any]:
-        """Download JSON data from Supabase Storage"""
-        client = self._get_client()
-        if not client:
+        """Download JSON data stored under a logical key"""
+        if not self.is_enabled:
             return None
         
         try:
-            response = client.storage.from_(self.bucket_name).download(key)
-            
-            # Try to decompress (assume gzipped)
-            try:
-                body = gzip.decompress(response)
-            except:
-                body = response
-            
-            return json.loads(body.decode("utf-8"))
-        except Exception as e:
-            if "not found" in str(e).lower() or "404" in str(e):
+            # Artifacts written before content addressing live at their logical key
+            object_key = await self.resolve(key) or key
+            body = await self.backend.get(object_key)
+            if body is None:
                 return None
+            return await asyncio.to_thread(self._decode, body)
+        except Exception as e:
             print(f"Storage download error: {e}")
             return None
     
     async def exists(self, key: str) -> bool:
-        """Check if an object exists in storage"""
-        client = self._get_client()
-        if not client:
+        """Check if a logical key has been stored"""
+        if not self.is_enabled:
             return False
         
         try:
-            # Try to get file info by listing with prefix
-            folder = "/".join(key.split("/")[:-1])
-            filename = key.split("/")[-1]
-            result = client.storage.from_(self.bucket_name).list(folder)
-            return any(f["name"] == filename for f in result)
+            return await self.resolve(key) is not None
         except Exception as e:
             print(f"Storage exists check error: {e}")
             return False
     
     async def delete(self, key: str) -> bool:
-        """Delete an object from storage"""
-        client = self._get_client()
-        if not client:
+        """
+        Delete a logical key.
+        
+        Only the manifest entry is removed; the object may be shared with
+        other keys and is left in place.
+        """
+        if not self.is_enabled:
             return False
         
         try:
-            client.storage.from_(self.bucket_name).remove([key])
+            await self.backend.delete(f"{MANIFEST_PREFIX}/{key}")
+            await cache_service.delete(self._manifest_cache_key(key))
             return True
         except Exception as e:
             print(f"Storage delete error: {e}")
@@ -153,6 +203,15 @@ class StorageService:
             session,
             f"{driver_a}_{driver_b}_{lap_a_str}_{lap_b_str}.json.gz"
         )
+    
+    def bundle_key(self, season: int, event: str, session: str, all_laps: bool = False) -> str:
+        """Generate storage key for a session telemetry bundle"""
+        return self._get_key(
+            str(season),
+            event.replace(" ", "_").replace("/", "-"),
+            session,
+            "bundle_all_laps.json.gz" if all_laps else "bundle.json.gz"
+        )
 
 
 # Global storage service instance
@@ -0,0 +1,365 @@
+"""
+Session telemetry bundles
+
+A bundle holds every driver's processed fastest lap (optionally every
+lap) for one session, resampled onto a shared distance grid. A worker
+loads it once, keeps it in memory and derives any driver pairing with
+array math, instead of storing and computing one artifact per pair.
+
+Continuous channels (time, speed, throttle, RPM) are linearly
+interpolated onto the grid; discrete ones (gear, DRS, brake) use
+sample-and-hold so they never take values the car didn't report.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi.concurrency import run_in_threadpool
+
+from app.config import settings
+from app.services.storage_service import storage_service
+from app.services.write_behind import storage_writer
+from app.utils.downsampling import downsample_lttb
+from app.utils.telemetry_codec import decode_array, encode_array
+
+
+BUNDLE_FORMAT = "bundle-v1"
+
+# Grid spacing in metres (a ~5 km lap is ~1000 samples)
+GRID_STEP = 5.0
+
+# Source column and stored dtype per channel
+CHANNELS = {
+    "time": ("Time", "f4"),
+    "speed": ("Speed", "f4"),
+    "throttle": ("Throttle", "u1"),
+    "brake": ("Brake", "u1"),
+    "gear": ("nGear", "u1"),
+    "rpm": ("RPM", "f4"),
+    "drs": ("DRS", "u1"),
+}
+HOLD_CHANNELS = ("brake", "gear", "drs")
+
+
+def resample_lap(telemetry: pd.DataFrame, grid_step: float = GRID_STEP) -> Dict[str, np.ndarray]:
+    """Resample a lap's telemetry onto the distance grid 0, step, 2*step, ..."""
+    # Distance must be non-decreasing for interpolation and searchsorted
+    distance = np.maximum.accumulate(telemetry["Distance"].to_numpy(dtype=np.float64))
+    count = int(distance[-1] // grid_step) + 1
+    grid = np.arange(count) * grid_step
+    hold_index = np.clip(np.searchsorted(distance, grid, side="right") - 1, 0, len(distance) - 1)
+
+    channels = {}
+    for name, (column, _) in CHANNELS.items():
+        if column not in telemetry.columns:
+            continue
+        series = telemetry[column]
+        if name == "time":
+            series = series.dt.total_seconds()
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        if name in HOLD_CHANNELS:
+            channels[name] = values[hold_index]
+            continue
+        finite = np.isfinite(values)
+        if not finite.any():
+            continue
+        channels[name] = np.interp(grid, distance[finite], values[finite])
+    return channels
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else value
+
+
+@dataclass
+class BundleLap:
+    """One lap on the bundle grid"""
+
+    driver: str
+    lap_number: int
+    lap_time: Optional[float]
+    sectors: Dict[str, Optional[float]]
+    channels: Dict[str, np.ndarray] = field(repr=False)
+
+    @property
+    def size(self) -> int:
+        return len(self.channels["speed"])
+
+    def points(self, grid_step: float, max_points: int) -> List[Dict[str, Any]]:
+        """Telemetry points for the lap, LTTB-downsampled on speed"""
+        distance = np.arange(self.size) * grid_step
+        speed = self.channels["speed"]
+        indices = downsample_lttb(distance.tolist(), speed.tolist(), max_points)
+        nan = np.full(self.size, np.nan)
+        columns = {
+            name: self.channels.get(name, nan)[indices].tolist()
+            for name in ("speed", "throttle", "brake", "gear", "rpm", "drs")
+        }
+        return [
+            {
+                "distance": d,
+                "speed": s,
+                "throttle": _optional(t) or 0.0,
+                "brake": _optional(b) or 0.0,
+                "gear": int(_optional(g) or 0),
+                "rpm": _optional(r),
+                "drs": None if np.isnan(x) else int(x),
+            }
+            for d, s, t, b, g, r, x in zip(
+                distance[indices].tolist(),
+                columns["speed"],
+                columns["throttle"],
+                columns["brake"],
+                columns["gear"],
+                columns["rpm"],
+                columns["drs"],
+            )
+        ]
+
+
+def lap_key(driver: str, lap_number: int) -> str:
+    return f"{driver}:{lap_number}"
+
+
+class TelemetryBundle:
+    """Laps for one session on a shared distance grid"""
+
+    def __init__(
+        self,
+        laps: Iterable[BundleLap],
+        fastest: Dict[str, int],
+        grid_step: float = GRID_STEP,
+    ):
+        self.laps = {lap_key(lap.driver, lap.lap_number): lap for lap in laps}
+        self.fastest = fastest
+        self.grid_step = grid_step
+        # Shared memory the channels are views of, if mapped from another
+        # worker's copy; kept open for as long as the bundle is
+        self.segment: Optional[SharedMemory] = None
+
+    def lap(self, driver: str, lap_number: Optional[int] = None) -> Optional[BundleLap]:
+        """Get a driver's lap, or their fastest lap if `lap_number` is None"""
+        if lap_number is None:
+            lap_number = self.fastest.get(driver)
+            if lap_number is None:
+                return None
+        return self.laps.get(lap_key(driver, lap_number))
+
+    def delta(self, lap_a: BundleLap, lap_b: BundleLap, max_points: int) -> List[Dict[str, float]]:
+        """Time delta (A - B) at `max_points` distances over the shared lap length"""
+        if "time" not in lap_a.channels or "time" not in lap_b.channels:
+            return []
+        size = min(lap_a.size, lap_b.size)
+        grid = np.arange(size) * self.grid_step
+        common = np.linspace(0.0, grid[-1], max_points)
+        time_a = np.interp(common, grid, lap_a.channels["time"][:size])
+        time_b = np.interp(common, grid, lap_b.channels["time"][:size])
+        # negative = A is faster
+        return [
+            {"distance": d, "delta": t}
+            for d, t in zip(common.tolist(), (time_a - time_b).tolist())
+        ]
+
+    def comparison(
+        self,
+        driver_a: str,
+        driver_b: str,
+        lap_a: Optional[int] = None,
+        lap_b: Optional[int] = None,
+        max_points: int = 1000,
+    ) -> Optional[Dict[str, Any]]:
+        """Build a serialized TelemetryComparison, or None if a lap isn't in the bundle"""
+        a = self.lap(driver_a, lap_a)
+        b = self.lap(driver_b, lap_b)
+        if a is None or b is None:
+            return None
+        return {
+            "driverA": {
+                "driver": a.driver,
+                "lapNumber": a.lap_number,
+                "lapTime": a.lap_time,
+                "data": a.points(self.grid_step, max_points),
+            },
+            "driverB": {
+                "driver": b.driver,
+                "lapNumber": b.lap_number,
+                "lapTime": b.lap_time,
+                "data": b.points(self.grid_step, max_points),
+            },
+            "delta": self.delta(a, b, max_points),
+            "sectorsA": a.sectors,
+            "sectorsB": b.sectors,
+        }
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Serialize to a JSON document with packed channels"""
+        return {
+            "encoding": BUNDLE_FORMAT,
+            "gridStep": self.grid_step,
+            "fastest": self.fastest,
+            "laps": [
+                {
+                    "driver": lap.driver,
+                    "lapNumber": lap.lap_number,
+                    "lapTime": lap.lap_time,
+                    "sectors": lap.sectors,
+                    "channels": {
+                        name: encode_array(values, CHANNELS[name][1])
+                        for name, values in lap.channels.items()
+                    },
+                }
+                for lap in self.laps.values()
+            ],
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "TelemetryBundle":
+        if payload.get("encoding") != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported bundle encoding: {payload.get('encoding')!r}")
+        laps = [
+            BundleLap(
+                driver=lap["driver"],
+                lap_number=lap["lapNumber"],
+                lap_time=lap["lapTime"],
+                sectors=lap["sectors"],
+                channels={
+                    name: decode_array(channel)
+                    for name, channel in lap["channels"].items()
+                },
+            )
+            for lap in payload["laps"]
+        ]
+        return cls(laps, payload["fastest"], payload["gridStep"])
+
+
+class TelemetryBundleStore:
+    """
+    Per-worker LRU of decoded bundles, backed by artifact storage.
+
+    The LRU is bounded by a bundle count: bundles are arrays rather than
+    strings, so the byte sizing of `InMemoryCache` doesn't apply.
+    Concurrent requests for the same session share one load or build.
+    With SHARED_BUNDLES_ENABLED the arrays live in shared memory, mapped
+    by every worker on the host (see `app.services.shared_bundles`).
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self._bundles: "OrderedDict[str, Tuple[TelemetryBundle, float]]" = OrderedDict()
+        # Per-key load locks and the number of requests holding or awaiting each
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._waiters: Dict[str, int] = {}
+
+    async def _drop(self, key: str, bundle: TelemetryBundle) -> None:
+        """Stop mapping a dropped bundle's shared segment, if it has one"""
+        if bundle.segment is None:
+            return
+        from app.services.shared_bundles import shared_bundles
+
+        try:
+            await run_in_threadpool(shared_bundles.detach, key, bundle.segment.name)
+        except OSError as e:
+            print(f"Could not detach shared telemetry bundle {key}: {e}")
+
+    async def _cached(self, key: str) -> Optional[TelemetryBundle]:
+        entry = self._bundles.get(key)
+        if entry is None:
+            return None
+        bundle, expires = entry
+        if expires <= time.time():
+            del self._bundles[key]
+            await self._drop(key, bundle)
+            return None
+        self._bundles.move_to_end(key)
+        return bundle
+
+    async def _store(self, key: str, bundle: TelemetryBundle, ttl: int) -> None:
+        previous = self._bundles.pop(key, None)
+        self._bundles[key] = (bundle, time.time() + ttl)
+        dropped = [] if previous is None else [(key, previous[0])]
+        while len(self._bundles) > self.max_entries:
+            evicted, (old, _) = self._bundles.popitem(last=False)
+            dropped.append((evicted, old))
+        for evicted, old in dropped:
+            if old is not bundle:
+                await self._drop(evicted, old)
+
+    async def _load(
+        self,
+        key: str,
+        storage_key: str,
+        build: Callable[[], Awaitable[TelemetryBundle]],
+        ttl: int,
+    ) -> TelemetryBundle:
+        """Map another worker's shared copy, or load from storage or build"""
+        # Imported here: shared_bundles builds on this module
+        from app.services.shared_bundles import shared_bundles
+
+        shared = settings.shared_bundles_enabled and shared_bundles.available
+        if shared:
+            bundle = await run_in_threadpool(shared_bundles.attach, key)
+            if bundle is not None:
+                return bundle
+
+        payload = None
+        if storage_service.is_enabled:
+            payload = await storage_service.download_json(storage_key)
+        if payload is not None:
+            bundle = await run_in_threadpool(TelemetryBundle.from_payload, payload)
+        else:
+            bundle = await build()
+            if storage_service.is_enabled:
+                payload = await run_in_threadpool(bundle.to_payload)
+                storage_writer.enqueue(storage_key, payload)
+
+        if shared:
+            try:
+                bundle = await run_in_threadpool(shared_bundles.publish, key, bundle, ttl)
+            except OSError as e:
+                # e.g. /dev/shm is full; keep the private copy
+                print(f"Could not share telemetry bundle {key}: {e}")
+        return bundle
+
+    async def get(
+        self,
+        key: str,
+        storage_key: str,
+        build: Callable[[], Awaitable[TelemetryBundle]],
+        ttl: int,
+    ) -> TelemetryBundle:
+        """
+        Get a bundle from memory, then storage, building it with
+        `await build()` if needed
+        """
+        bundle = await self._cached(key)
+        if bundle is not None:
+            return bundle
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                bundle = await self._cached(key)
+                if bundle is not None:
+                    return bundle
+
+                bundle = await self._load(key, storage_key, build, ttl)
+                await self._store(key, bundle, ttl)
+                return bundle
+        finally:
+            # Only drop the lock once nobody holds or awaits it, so later
+            # requests can't build alongside a waiter
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                del self._locks[key]
+
+
+# Global bundle store instance
+telemetry_bundles = TelemetryBundleStore(settings.telemetry_bundle_cache_size)
@@ -0,0 +1,68 @@
+"""
+Per-worker token buckets
+
+A cheap in-process prefilter for rate limiting: each client gets a
+bucket holding `limit` tokens that refills at `limit / window` tokens per
+second. A client that empties its bucket in one worker has already gone
+over the shared limit, so the request can be rejected without asking
+Redis. The buckets are never stricter than the shared limit; they only
+spare Redis the traffic of an obvious flood.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class TokenBucket:
+    """Token count as of the last update"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class TokenBucketLimiter:
+    """LRU-bounded token buckets keyed by client"""
+
+    def __init__(self, max_clients: int = 10000):
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.rejected = 0
+
+    def acquire(
+        self,
+        client_id: str,
+        limit: int,
+        window: float,
+        now: Optional[float] = None,
+    ) -> float:
+        """
+        Take a token for `client_id`.
+
+        Returns 0.0 if the request may proceed, otherwise the number of
+        seconds until a token is available.
+        """
+        now = time.time() if now is None else now
+        rate = limit / window
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(float(limit), now)
+            self._buckets[client_id] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+            bucket.tokens = min(float(limit), bucket.tokens + (now - bucket.updated) * rate)
+            bucket.updated = now
+
+        if bucket.tokens >= 1.0:
+            bucket.tokens -= 1.0
+            return 0.0
+        self.rejected += 1
+        return (1.0 - bucket.tokens) / rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
@@ -0,0 +1,112 @@
+"""
+Data-aware cache TTLs
+
+Artifacts are classified by where their session is in its lifecycle:
+upcoming, live, recently finished or historical. Historical data doesn't
+change, so it is kept (effectively) forever and never revalidated; data
+from a session that just ended can still be corrected, and data from a
+session in progress is partial, so those get progressively shorter TTLs.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from app.config import settings
+from app.services.cache_keys import cache_keys, normalize_session
+
+
+UPCOMING = "upcoming"
+LIVE = "live"
+RECENT = "recent"
+HISTORICAL = "historical"
+CURRENT_SEASON = "current_season"
+
+# Scheduled session lengths in seconds, with margin for red flags and overruns
+SESSION_DURATIONS = {
+    "FP1": 90 * 60,
+    "FP2": 90 * 60,
+    "FP3": 90 * 60,
+    "Q": 90 * 60,
+    "SQ": 75 * 60,
+    "S": 90 * 60,
+    "R": 4 * 3600,
+}
+DEFAULT_SESSION_DURATION = 4 * 3600
+
+
+@dataclass(frozen=True)
+class TtlDecision:
+    """Hard and soft (stale-while-revalidate) TTLs for a cache entry"""
+
+    ttl: int
+    soft_ttl: int
+    lifecycle: str
+
+
+def classify_session(
+    start: Optional[float],
+    session: str,
+    now: Optional[float] = None,
+) -> str:
+    """
+    Classify a session by its scheduled start (UTC timestamp).
+
+    Sessions with an unknown start are treated as recent, so they are
+    neither pinned nor recomputed constantly.
+    """
+    if start is None:
+        return RECENT
+    now = time.time() if now is None else now
+    end = start + SESSION_DURATIONS.get(normalize_session(session), DEFAULT_SESSION_DURATION)
+    if now < start:
+        return UPCOMING
+    if now < end:
+        return LIVE
+    if now < end + settings.cache_recent_window_seconds:
+        return RECENT
+    return HISTORICAL
+
+
+def decision_for(lifecycle: str) -> TtlDecision:
+    """Get the TTLs for a lifecycle class"""
+    if lifecycle == HISTORICAL:
+        ttl = settings.cache_ttl_historical_seconds
+        return TtlDecision(ttl, ttl, lifecycle)
+    if lifecycle == RECENT:
+        ttl = settings.cache_ttl_recent_seconds
+        return TtlDecision(ttl, max(ttl // 4, 1), lifecycle)
+    # Live sessions have partial data; upcoming ones have none yet
+    ttl = settings.cache_ttl_live_seconds
+    return TtlDecision(ttl, max(ttl // 2, 1), lifecycle)
+
+
+class TtlPolicy:
+    """Picks cache TTLs from the session schedule"""
+
+    async def for_session(self, season: int, event: str, session: str) -> TtlDecision:
+        """TTLs for an artifact computed from one session"""
+        start = await cache_keys.session_start(season, event, session)
+        return decision_for(classify_session(start, session))
+
+    async def for_event(self, season: int, event: str) -> TtlDecision:
+        """TTLs for event-level data (session lists), keyed off the race"""
+        start = await cache_keys.session_start(season, event, "R")
+        lifecycle = classify_session(start, "R")
+        if lifecycle == HISTORICAL:
+            return decision_for(lifecycle)
+        # Session times can still move until the weekend is over
+        return self.for_schedule(season)
+
+    def for_schedule(self, season: int, now: Optional[float] = None) -> TtlDecision:
+        """TTLs for a season schedule: past seasons are pinned, others refresh daily"""
+        now = time.time() if now is None else now
+        if season < time.gmtime(now).tm_year:
+            return decision_for(HISTORICAL)
+        refresh = settings.cache_schedule_refresh_seconds
+        # Keep serving the last schedule for a while if refreshes fail
+        return TtlDecision(refresh * 7, refresh, CURRENT_SEASON)
+
+
+# Global TTL policy instance
+ttl_policy = TtlPolicy()
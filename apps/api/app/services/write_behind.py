@@ -0,0 +1,214 @@
+"""
+Write-behind queue for storage uploads
+
+Artifacts are persisted after the response has been produced instead of
+on the request path. Pending writes are keyed, so re-enqueueing a key
+that hasn't been written yet replaces its payload rather than uploading
+twice. A single worker task uploads in batches and retries failures with
+exponential backoff; the queue is flushed on shutdown.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.metrics import Histogram
+from app.services.storage_service import storage_service
+
+
+# Upper bounds in seconds from enqueue to a successful write
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0)
+
+
+class PendingWrite:
+    """A queued write and its retry state"""
+
+    __slots__ = ("data", "enqueued_at", "attempts", "not_before")
+
+    def __init__(self, data: Any, enqueued_at: float):
+        self.data = data
+        self.enqueued_at = enqueued_at
+        self.attempts = 0
+        self.not_before = 0.0
+
+
+class WriteBehindQueue:
+    """
+    Deduplicating write-behind queue with batched, retried writes.
+
+    `writer(key, data)` must return True on success. Failed writes are
+    retried after `base_delay * 2**attempt` seconds (capped at `max_delay`)
+    up to `max_attempts` times, then dropped; the artifact is still in
+    the cache and is recomputed if it is ever needed again.
+    """
+
+    def __init__(
+        self,
+        writer: Callable[[str, Any], Awaitable[bool]],
+        batch_size: int = 8,
+        max_pending: int = 1000,
+        max_attempts: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        self._writer = writer
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._pending: "OrderedDict[str, PendingWrite]" = OrderedDict()
+        self._in_flight = 0
+        self._flushing = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._lag = Histogram(LAG_BUCKETS)
+        self._stats = {
+            "enqueued": 0,
+            "deduplicated": 0,
+            "written": 0,
+            "retries": 0,
+            "failed": 0,
+            "rejected": 0,
+        }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    def enqueue(self, key: str, data: Any) -> bool:
+        """Queue `data` to be written under `key`. Returns False if the queue is full."""
+        entry = self._pending.get(key)
+        if entry is not None:
+            # Not written yet: the newest payload wins
+            entry.data = data
+            entry.attempts = 0
+            entry.not_before = 0.0
+            self._stats["deduplicated"] += 1
+        elif len(self._pending) >= self.max_pending:
+            self._stats["rejected"] += 1
+            return False
+        else:
+            self._pending[key] = PendingWrite(data, time.time())
+            self._stats["enqueued"] += 1
+
+        self._ensure_worker()
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    def _take_batch(self, now: float) -> List[Tuple[str, PendingWrite]]:
+        batch = []
+        for key in list(self._pending):
+            if len(batch) >= self.batch_size:
+                break
+            if self._pending[key].not_before <= now:
+                batch.append((key, self._pending.pop(key)))
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            # Don't wait out backoff delays when flushing, including
+            # those of writes that fail during the flush
+            batch = self._take_batch(math.inf if self._flushing else time.time())
+            if not batch:
+                if not self._pending:
+                    self._idle.set()
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+                    continue
+                # Only backed-off retries left: sleep until the first is due
+                delay = min(entry.not_before for entry in self._pending.values()) - time.time()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0))
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            self._in_flight = len(batch)
+            results = await asyncio.gather(
+                *(self._write(key, entry) for key, entry in batch),
+                return_exceptions=True,
+            )
+            self._in_flight = 0
+            for (key, entry), ok in zip(batch, results):
+                if ok is True:
+                    continue
+                if isinstance(ok, Exception):
+                    print(f"Write-behind error for {key}: {ok}")
+                self._retry(key, entry)
+
+    async def _write(self, key: str, entry: PendingWrite) -> bool:
+        ok = await self._writer(key, entry.data)
+        if ok:
+            self._stats["written"] += 1
+            self._lag.observe(time.time() - entry.enqueued_at)
+        return ok
+
+    def _retry(self, key: str, entry: PendingWrite) -> None:
+        if key in self._pending:
+            # Re-enqueued while in flight; the newer payload supersedes this one
+            return
+        entry.attempts += 1
+        if entry.attempts >= self.max_attempts:
+            print(f"⚠️ Giving up on write of {key} after {entry.attempts} attempts")
+            self._stats["failed"] += 1
+            return
+        entry.not_before = time.time() + min(
+            self.base_delay * 2 ** (entry.attempts - 1), self.max_delay
+        )
+        self._pending[key] = entry
+        self._stats["retries"] += 1
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued write has completed. Returns False on timeout."""
+        if self._worker is None or self._worker.done():
+            return not self._pending
+        self._flushing = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._flushing = False
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Flush pending writes, then stop the worker"""
+        if not await self.flush(timeout):
+            print(f"⚠️ Write-behind flush timed out with {len(self._pending)} writes pending")
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth, lag and write counters"""
+        now = time.time()
+        oldest = min((e.enqueued_at for e in self._pending.values()), default=None)
+        return {
+            "depth": len(self._pending),
+            "in_flight": self._in_flight,
+            "oldest_pending_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "lag_seconds": self._lag.snapshot(),
+            **self._stats,
+        }
+
+
+# Global write-behind queue for artifact uploads
+storage_writer = WriteBehindQueue(
+    storage_service.upload_json,
+    batch_size=settings.storage_write_batch_size,
+    max_pending=settings.storage_write_queue_max,
+)
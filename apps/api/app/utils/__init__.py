@@ -1,8 +1,16 @@
 """Utils package"""
 
 from app.utils.downsampling import downsample_lttb, downsample_simple
+from app.utils.telemetry_codec import (
+    encode_comparison,
+    decode_comparison,
+    is_compact,
+)
 
 __all__ = [
     "downsample_lttb",
     "downsample_simple",
+    "encode_comparison",
+    "decode_comparison",
+    "is_compact",
 ]
@@ -0,0 +1,130 @@
+"""
+Request-scoped cancellation for blocking computations
+
+A CancelToken is made current for a request with `request_cancellation`
+and follows the work into the threadpool (context variables are copied
+to worker threads). Blocking code calls `checkpoint()` between stages;
+once the client has disconnected or the deadline has passed, the next
+checkpoint raises OperationCancelled and the thread stops there.
+
+Stages are never interrupted midway. In particular a FastF1 session load
+always runs to completion, so its data still lands in the FastF1 cache
+for the next request. Work that other requests are waiting on can opt
+out with `detached()`.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional
+
+from starlette.requests import Request
+
+
+DISCONNECTED = "client disconnected"
+TIMED_OUT = "timed out"
+
+
+class OperationCancelled(Exception):
+    """Raised at a checkpoint once the operation has been cancelled"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """Thread-safe cancellation flag with an optional deadline"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self._event = threading.Event()
+        self._reason: Optional[str] = None
+        self.deadline = time.monotonic() + timeout if timeout else None
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.deadline and time.monotonic() >= self.deadline:
+            self.cancel(TIMED_OUT)
+        return self._event.is_set()
+
+    @property
+    def reason(self) -> Optional[str]:
+        return self._reason
+
+    def check(self) -> None:
+        """Raise OperationCancelled if the token has been cancelled"""
+        if self.cancelled:
+            raise OperationCancelled(self._reason)
+
+
+_current_token: ContextVar[Optional[CancelToken]] = ContextVar("cancel_token", default=None)
+
+
+def current_token() -> Optional[CancelToken]:
+    return _current_token.get()
+
+
+def checkpoint() -> None:
+    """Stop here if the current operation has been cancelled"""
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+@contextmanager
+def cancellable(token: Optional[CancelToken]) -> Iterator[None]:
+    """Run the block with `token` as the current cancellation token"""
+    reset = _current_token.set(token)
+    try:
+        yield
+    finally:
+        _current_token.reset(reset)
+
+
+@contextmanager
+def detached() -> Iterator[None]:
+    """Run the block without the current cancellation token"""
+    reset = _current_token.set(None)
+    try:
+        yield
+    finally:
+        _current_token.reset(reset)
+
+
+async def _watch(request: Request, token: CancelToken, interval: float) -> None:
+    while not token.cancelled:
+        if await request.is_disconnected():
+            token.cancel(DISCONNECTED)
+            return
+        await asyncio.sleep(interval)
+
+
+@asynccontextmanager
+async def request_cancellation(
+    request: Request,
+    timeout: Optional[float] = None,
+    interval: float = 0.25,
+) -> AsyncIterator[CancelToken]:
+    """
+    Make a token current for the block that is cancelled when the client
+    disconnects or after `timeout` seconds.
+
+    The request task itself isn't cancelled: a computation in the
+    threadpool keeps its admission units until its thread reaches a
+    checkpoint and raises OperationCancelled.
+    """
+    token = CancelToken(timeout)
+    reset = _current_token.set(token)
+    watcher = asyncio.create_task(_watch(request, token, interval))
+    try:
+        yield token
+    finally:
+        watcher.cancel()
+        _current_token.reset(reset)
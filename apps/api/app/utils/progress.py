@@ -0,0 +1,49 @@
+"""
+Progress reporting from blocking computations
+
+A background job makes its progress callback current with `reporting`.
+Like the cancellation token, it follows the work into the threadpool
+(context variables are copied to worker threads), where blocking code
+calls `report_progress(fraction)` as it finishes each stage. The report
+is handed back to the event loop, which stores it on the job. Outside a
+job the calls do nothing.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, Optional
+
+
+Progress = Callable[[float], Awaitable[None]]
+
+
+class _Reporter:
+    """Runs a job's async progress callback from any thread"""
+
+    def __init__(self, progress: Progress, loop: asyncio.AbstractEventLoop):
+        self._progress = progress
+        self._loop = loop
+
+    def __call__(self, fraction: float) -> None:
+        asyncio.run_coroutine_threadsafe(self._progress(fraction), self._loop)
+
+
+_current_reporter: ContextVar[Optional[_Reporter]] = ContextVar("progress_reporter", default=None)
+
+
+@contextmanager
+def reporting(progress: Progress) -> Iterator[None]:
+    """Send `report_progress` calls made within the block to `progress`"""
+    reset = _current_reporter.set(_Reporter(progress, asyncio.get_running_loop()))
+    try:
+        yield
+    finally:
+        _current_reporter.reset(reset)
+
+
+def report_progress(fraction: float) -> None:
+    """Report that the current computation is `fraction` (0 to 1) done"""
+    reporter = _current_reporter.get()
+    if reporter is not None:
+        reporter(fraction)
@@ -0,0 +1,227 @@
+"""
+Compact encoding for telemetry comparisons
+
+Packs each telemetry channel into a typed array (float32, uint8 or a
+bit-packed mask) and base64-encodes it, so cached and served comparisons
+stay JSON documents while using a fraction of the bytes.
+"""
+
+import base64
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+COMPACT_FORMAT = "compact-v1"
+
+# Decoded floats are rounded to this many decimals (mm / thousandths),
+# which is finer than the resolution of the FastF1 source channels.
+FLOAT_DECIMALS = 3
+
+_U1_NULL = 255
+_I4_NULL = np.iinfo(np.int32).min
+
+
+def _to_b64(array: np.ndarray) -> str:
+    return base64.b64encode(array.tobytes()).decode("ascii")
+
+
+def _from_b64(data: str, dtype: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=dtype)
+
+
+def _is_integral(values: np.ndarray) -> bool:
+    return bool(np.all(np.isfinite(values)) and np.all(values == np.round(values)))
+
+
+def _encode_float(values: List[Optional[float]], delta: bool = False) -> Dict[str, Any]:
+    """
+    Encode a float channel as float32, or for `delta` as int32 differences
+    of the values in thousandths. Integer differences add up exactly, so
+    the rebuilt values don't drift along the lap.
+    """
+    array = np.array(
+        [np.nan if v is None else v for v in values],
+        dtype=np.float64,
+    )
+    if delta and array.size and np.all(np.isfinite(array)):
+        diffs = np.diff(np.round(array * 10 ** FLOAT_DECIMALS).astype(np.int64), prepend=0)
+        if np.all(np.abs(diffs) <= np.iinfo(np.int32).max):
+            return {"dtype": "i4d", "data": _to_b64(diffs.astype("<i4"))}
+    return {"dtype": "f4", "data": _to_b64(array.astype("<f4"))}
+
+
+def _encode_small_int(values: List[Optional[float]]) -> Dict[str, Any]:
+    """Encode an integer-valued channel as uint8, widening only if needed"""
+    present = np.array([v for v in values if v is not None], dtype=np.float64)
+    if _is_integral(present) and (present.size == 0 or (present.min() >= 0 and present.max() < _U1_NULL)):
+        array = np.array(
+            [_U1_NULL if v is None else int(v) for v in values],
+            dtype="<u1",
+        )
+        return {"dtype": "u1", "data": _to_b64(array)}
+    if _is_integral(present):
+        array = np.array(
+            [_I4_NULL if v is None else int(v) for v in values],
+            dtype="<i4",
+        )
+        return {"dtype": "i4", "data": _to_b64(array)}
+    return _encode_float(values)
+
+
+def _encode_flag(values: List[Optional[float]]) -> Dict[str, Any]:
+    """Bit-pack a 0/1 channel, falling back to floats for anything else"""
+    if all(v in (0, 1) for v in values):
+        bits = np.packbits(np.array(values, dtype=np.uint8))
+        return {"dtype": "bits", "data": _to_b64(bits)}
+    return _encode_float(values)
+
+
+def _decode_channel(channel: Dict[str, Any], count: int, as_int: bool = False) -> List[Any]:
+    """Decode a channel back to a list of Python values (None for nulls)"""
+    dtype = channel["dtype"]
+    data = channel["data"]
+
+    if dtype == "bits":
+        bits = np.unpackbits(_from_b64(data, "u1"))[:count]
+        return [int(b) if as_int else float(b) for b in bits]
+
+    if dtype == "u1":
+        array = _from_b64(data, "<u1")
+        return [None if v == _U1_NULL else (int(v) if as_int else float(v)) for v in array]
+
+    if dtype == "i4":
+        array = _from_b64(data, "<i4")
+        return [None if v == _I4_NULL else (int(v) if as_int else float(v)) for v in array]
+
+    if dtype == "i4d":
+        array = np.cumsum(_from_b64(data, "<i4"), dtype=np.int64) / 10 ** FLOAT_DECIMALS
+        return [int(v) if as_int else float(v) for v in array]
+
+    array = np.round(_from_b64(data, "<f4").astype(np.float64), FLOAT_DECIMALS)
+    return [
+        None if np.isnan(v) else (int(v) if as_int else float(v))
+        for v in array
+    ]
+
+
+def encode_array(values: np.ndarray, dtype: str = "f4") -> Dict[str, Any]:
+    """Encode a numpy array as a "f4" or "u1" channel (NaN is stored as null)"""
+    values = np.asarray(values, dtype=np.float64)
+    if dtype == "u1":
+        array = np.where(np.isfinite(values), np.round(values), _U1_NULL)
+        return {"dtype": "u1", "data": _to_b64(np.clip(array, 0, _U1_NULL).astype("<u1"))}
+    return {"dtype": "f4", "data": _to_b64(values.astype("<f4"))}
+
+
+def decode_array(channel: Dict[str, Any]) -> np.ndarray:
+    """Decode a channel to a float64 numpy array with NaN for nulls"""
+    dtype = channel["dtype"]
+    if dtype == "u1":
+        array = _from_b64(channel["data"], "<u1").astype(np.float64)
+        array[array == _U1_NULL] = np.nan
+        return array
+    return _from_b64(channel["data"], "<f4").astype(np.float64)
+
+
+def encode_points(points: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Encode a list of telemetry point dicts into a compact channel map"""
+    channels: Dict[str, Any] = {
+        "distance": _encode_float([p["distance"] for p in points], delta=True),
+        "speed": _encode_float([p["speed"] for p in points]),
+        "throttle": _encode_small_int([p["throttle"] for p in points]),
+        "brake": _encode_flag([p["brake"] for p in points]),
+        "gear": _encode_small_int([p["gear"] for p in points]),
+    }
+
+    rpm = [p.get("rpm") for p in points]
+    if any(v is not None for v in rpm):
+        channels["rpm"] = _encode_float(rpm)
+
+    drs = [p.get("drs") for p in points]
+    if any(v is not None for v in drs):
+        channels["drs"] = _encode_small_int(drs)
+
+    return {"n": len(points), "channels": channels}
+
+
+def decode_points(encoded: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Decode a compact channel map back into telemetry point dicts"""
+    count = encoded["n"]
+    channels = encoded["channels"]
+
+    distance = _decode_channel(channels["distance"], count)
+    speed = _decode_channel(channels["speed"], count)
+    throttle = _decode_channel(channels["throttle"], count)
+    brake = _decode_channel(channels["brake"], count)
+    gear = _decode_channel(channels["gear"], count, as_int=True)
+    rpm = _decode_channel(channels["rpm"], count) if "rpm" in channels else [None] * count
+    drs = _decode_channel(channels["drs"], count, as_int=True) if "drs" in channels else [None] * count
+
+    return [
+        {
+            "distance": distance[i],
+            "speed": speed[i],
+            "throttle": throttle[i],
+            "brake": brake[i],
+            "gear": gear[i],
+            "rpm": rpm[i],
+            "drs": drs[i],
+        }
+        for i in range(count)
+    ]
+
+
+def encode_delta(delta: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Encode delta points (distance, delta) into a compact channel map"""
+    return {
+        "n": len(delta),
+        "channels": {
+            "distance": _encode_float([d["distance"] for d in delta], delta=True),
+            "delta": _encode_float([d["delta"] for d in delta]),
+        },
+    }
+
+
+def decode_delta(encoded: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Decode a compact delta channel map back into delta point dicts"""
+    count = encoded["n"]
+    distance = _decode_channel(encoded["channels"]["distance"], count)
+    delta = _decode_channel(encoded["channels"]["delta"], count)
+    return [{"distance": distance[i], "delta": delta[i]} for i in range(count)]
+
+
+def is_compact(payload: Any) -> bool:
+    """Check whether a payload uses the compact encoding"""
+    return isinstance(payload, dict) and payload.get("encoding") == COMPACT_FORMAT
+
+
+def encode_comparison(comparison: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Encode a serialized TelemetryComparison (by_alias) into compact form.
+
+    Lap metadata and sector times are kept as plain JSON; only the
+    per-point traces are packed.
+    """
+    encoded = dict(comparison)
+    encoded["encoding"] = COMPACT_FORMAT
+    for side in ("driverA", "driverB"):
+        lap = dict(comparison[side])
+        lap["data"] = encode_points(lap["data"])
+        encoded[side] = lap
+    encoded["delta"] = encode_delta(comparison.get("delta", []))
+    return encoded
+
+
+def decode_comparison(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode a compact comparison back into a TelemetryComparison dict"""
+    if not is_compact(payload):
+        return payload
+
+    decoded = {k: v for k, v in payload.items() if k != "encoding"}
+    for side in ("driverA", "driverB"):
+        lap = dict(payload[side])
+        lap["data"] = decode_points(lap["data"])
+        decoded[side] = lap
+    decoded["delta"] = decode_delta(payload["delta"])
+    return decoded
@@ -0,0 +1,72 @@
+"""
+Benchmark JWT verification per request
+
+Compares verifying a bearer token on every use (the rate limiter's client
+ID, its authenticated check and the auth dependency each did) against
+the verified-claims cache with the user shared through request.state.
+
+Usage (from apps/api):
+    python -m scripts.bench_auth --requests 20000
+"""
+
+import argparse
+import time
+import timeit
+
+from jose import jwt
+
+from app.middleware import auth
+
+
+SECRET = "benchmark-secret"
+
+
+def make_token(sub: str) -> str:
+    return jwt.encode(
+        {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + 3600},
+        SECRET,
+        algorithm="HS256",
+    )
+
+
+def decode(token: str) -> dict:
+    return jwt.decode(token, SECRET, algorithms=["HS256"], audience="authenticated")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=500, help="distinct tokens in rotation")
+    args = parser.parse_args()
+
+    auth.settings.supabase_jwt_secret = SECRET
+    tokens = [make_token(f"user-{i}") for i in range(args.users)]
+
+    def uncached():
+        for i in range(args.requests):
+            token = tokens[i % len(tokens)]
+            # Client ID, authenticated check, get_current_user
+            for _ in range(3):
+                decode(token)
+
+    def cached():
+        for i in range(args.requests):
+            # Once per request; later lookups read request.state.user
+            auth.verify_token(tokens[i % len(tokens)])
+
+    auth.claims_cache.clear()
+    results = {
+        "verify on every use (3x)": min(timeit.repeat(uncached, number=1, repeat=3)),
+        "claims cache + request.state": min(timeit.repeat(cached, number=1, repeat=3)),
+    }
+
+    print(f"{args.requests} requests over {args.users} tokens")
+    baseline = results["verify on every use (3x)"]
+    for name, seconds in results.items():
+        per_request = seconds / args.requests * 1e6
+        print(f"  {name:<30} {per_request:8.2f} µs/request  ({baseline / seconds:5.1f}x)")
+    print(f"  cache hit rate: {auth.claims_cache.hits / max(auth.claims_cache.hits + auth.claims_cache.misses, 1):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark middleware stack throughput on cache hits
+
+Serves a cached endpoint through CORS + rate limiting, with the rate
+limiter as plain ASGI (current) and wrapped in Starlette's
+BaseHTTPMiddleware (as it was before), and reports requests per second.
+Requests go straight to the ASGI app, so the numbers measure the stack
+rather than the network.
+
+Usage (from apps/api):
+    python -m scripts.bench_middleware --requests 5000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from unittest.mock import patch
+
+import httpx
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
+
+from app.config import settings
+from app.main import app
+from app.middleware.auth import get_user_from_request
+from app.middleware.rate_limit import EXEMPT_PATHS, RateLimitMiddleware
+from app.models import Event
+from app.services import cache_service, fastf1_service
+
+
+class BaseHTTPRateLimitMiddleware(BaseHTTPMiddleware):
+    """The same checks, dispatched the way the middleware used to be"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._limiter = RateLimitMiddleware(app)
+
+    async def dispatch(self, request, call_next):
+        if request.url.path in EXEMPT_PATHS:
+            return await call_next(request)
+        user = get_user_from_request(request)
+        allowed, (limit, remaining, reset) = await self._limiter._check_rate_limit(
+            self._limiter._get_client_id(request, user), user is not None
+        )
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(limit)
+        response.headers["X-RateLimit-Remaining"] = str(remaining)
+        response.headers["X-RateLimit-Reset"] = str(reset)
+        return response
+
+
+def build_stack(rate_limit_cls):
+    """CORS around rate limiting around the app's routes, as in app.main"""
+    return CORSMiddleware(
+        rate_limit_cls(app.router),
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+
+async def run(stack, path: str, requests: int, concurrency: int) -> float:
+    """Requests per second for `requests` GETs of `path`"""
+    transport = httpx.ASGITransport(app=stack)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = iter(range(requests))
+
+        async def worker(n: int):
+            headers = {"Origin": "http://localhost:5173", "X-Forwarded-For": f"10.0.0.{n}"}
+            for _ in remaining:
+                response = await client.get(path, headers=headers)
+                assert response.status_code == 200, response.status_code
+
+        # Warm up, then measure
+        await client.get(path)
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--season", type=int, default=2023)
+    args = parser.parse_args()
+
+    # httpx logs every request at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    # Limits high enough that nothing is rejected; the in-memory cache tier
+    settings.rate_limit_requests = 10 ** 9
+    cache_service._use_fallback = True
+    path = f"/events?season={args.season}"
+
+    # Prime the cache with a full season of events
+    events = [
+        Event(
+            round_number=i,
+            country="Country",
+            location="City",
+            event_name=f"Grand Prix {i}",
+            event_date=f"{args.season}-03-{i:02d}",
+        )
+        for i in range(1, 25)
+    ]
+    with patch.object(fastf1_service, "get_events", return_value=events):
+        await run(build_stack(RateLimitMiddleware), path, 1, 1)
+
+    stacks = {
+        "BaseHTTPMiddleware (before)": build_stack(BaseHTTPRateLimitMiddleware),
+        "pure ASGI (after)": build_stack(RateLimitMiddleware),
+    }
+    print(f"GET {path}: {args.requests} requests, concurrency {args.concurrency}")
+    results = {}
+    for name, stack in stacks.items():
+        results[name] = await run(stack, path, args.requests, args.concurrency)
+        print(f"  {name:<30} {results[name]:8.0f} req/s")
+    before, after = results.values()
+    print(f"  speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
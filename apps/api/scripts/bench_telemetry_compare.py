@@ -0,0 +1,96 @@
+"""
+Benchmark direct telemetry comparisons
+
+Runs `get_telemetry_comparison` against a synthetic session (laps of
+FastF1-sized telemetry, no network or FastF1 cache) and reports the mean
+time per comparison and per stage, as recorded for /internal/metrics.
+
+Usage (from apps/api):
+    python -m scripts.bench_telemetry_compare --comparisons 50 --samples 800
+"""
+
+import argparse
+import time
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from app.services.fastf1_service import fastf1_service, telemetry_stages
+
+
+def lap_telemetry(speed: float, samples: int, length: float = 5300.0) -> pd.DataFrame:
+    """A lap with FastF1's merged telemetry columns and a varying speed trace"""
+    distance = np.linspace(0.0, length, samples)
+    speed = speed + 40 * np.sin(distance / 300)
+    seconds = np.concatenate(([0.0], np.cumsum(np.diff(distance) / (speed[1:] / 3.6))))
+    return pd.DataFrame({
+        "Distance": distance,
+        "Time": pd.to_timedelta(seconds, unit="s"),
+        "Speed": speed,
+        "Throttle": np.clip(speed / 3, 0, 100),
+        "Brake": speed < 200,
+        "nGear": (speed // 40).astype(int),
+        "RPM": speed * 50,
+        "DRS": np.where(distance < 500, 12, 0),
+    })
+
+
+class SyntheticLap(dict):
+    def __init__(self, speed: float, samples: int):
+        super().__init__(
+            LapNumber=10,
+            LapTime=pd.Timedelta(seconds=90),
+            Sector1Time=pd.Timedelta(seconds=30),
+            Sector2Time=pd.Timedelta(seconds=30),
+            Sector3Time=pd.Timedelta(seconds=30),
+        )
+        self.telemetry = lap_telemetry(speed, samples)
+
+    def get_telemetry(self) -> pd.DataFrame:
+        return self.telemetry.copy()
+
+    def pick_fastest(self) -> "SyntheticLap":
+        return self
+
+
+class SyntheticSession:
+    def __init__(self, samples: int):
+        self.drivers = {"VER": SyntheticLap(230.0, samples), "HAM": SyntheticLap(225.0, samples)}
+
+    def load(self, **kwargs) -> None:
+        pass
+
+    @property
+    def laps(self) -> "SyntheticSession":
+        return self
+
+    def pick_driver(self, driver: str) -> SyntheticLap:
+        return self.drivers[driver]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--comparisons", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=800, help="telemetry samples per lap")
+    args = parser.parse_args()
+
+    with patch("fastf1.get_session", return_value=SyntheticSession(args.samples)):
+        # Warm up (thread pool, imports)
+        fastf1_service.get_telemetry_comparison(2024, "1", "R", "VER", "HAM")
+        before = telemetry_stages.snapshot()
+        start = time.perf_counter()
+        for _ in range(args.comparisons):
+            fastf1_service.get_telemetry_comparison(2024, "1", "R", "VER", "HAM")
+        elapsed = time.perf_counter() - start
+
+    print(f"{args.comparisons} comparisons, {args.samples} samples per lap")
+    print(f"  {'comparison':<12} {elapsed / args.comparisons * 1000:8.2f} ms")
+    for stage, histogram in telemetry_stages.snapshot().items():
+        count = histogram["count"] - before[stage]["count"]
+        total = histogram["sum"] - before[stage]["sum"]
+        print(f"  {stage:<12} {total / count * 1000:8.2f} ms x{count // args.comparisons}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Train a zstd dictionary from cached telemetry payloads
+
+Samples `pitlane:telemetry:*` values from Redis and writes a dictionary
+that can be loaded with CACHE_ZSTD_DICT_PATH.
+
+Usage (from apps/api):
+    python -m scripts.train_cache_dictionary /path/to/telemetry.dict
+"""
+
+import argparse
+import asyncio
+
+import redis.asyncio as redis
+
+from app.config import settings
+from app.services.cache_compression import CacheCompressor, CompressionError
+
+
+async def collect_samples(pattern: str, limit: int) -> list:
+    """Read up to `limit` decoded values matching `pattern` from Redis"""
+    client = redis.from_url(settings.redis_url, decode_responses=False)
+    # Existing values may already be compressed without a dictionary
+    compressor = CacheCompressor()
+    samples = []
+    try:
+        async for key in client.scan_iter(match=pattern, count=100):
+            value = await client.get(key)
+            if not value:
+                continue
+            try:
+                samples.append(compressor.decode("telemetry", value))
+            except CompressionError:
+                # Written with a previous dictionary
+                continue
+            if len(samples) >= limit:
+                break
+    finally:
+        await client.close()
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output", help="Path to write the dictionary to")
+    parser.add_argument("--pattern", default="pitlane:telemetry:*")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--size", type=int, default=112640, help="Dictionary size in bytes")
+    args = parser.parse_args()
+
+    if not settings.redis_url:
+        raise SystemExit("REDIS_URL is not configured")
+
+    samples = asyncio.run(collect_samples(args.pattern, args.samples))
+    if len(samples) < 10:
+        raise SystemExit(f"Need at least 10 samples, found {len(samples)}")
+
+    dictionary = CacheCompressor.train_dictionary(samples, dict_size=args.size)
+    with open(args.output, "wb") as f:
+        f.write(dictionary)
+    print(f"✅ Trained {len(dictionary)} byte dictionary from {len(samples)} samples")
+
+
+if __name__ == "__main__":
+    main()
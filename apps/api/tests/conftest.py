@@ -2,10 +2,85 @@
 Pytest fixtures and configuration
 """
 
+import numpy as np
+import pandas as pd
 import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.services.cache_service import InMemoryCache
+
+
+class FakePipeline:
+    """Collects queued commands and runs them against a FakeRedis"""
+    
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc):
+        return False
+    
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return queue
+    
+    async def execute(self):
+        self._client.round_trips += 1
+        results = []
+        for name, args, kwargs in self._commands:
+            results.append(await getattr(InMemoryCache, name)(self._client, *args, **kwargs))
+        self._commands = []
+        return results
+
+
+class FakeScript:
+    """Runs the Python equivalent of a registered Lua script in one round trip"""
+    
+    def __init__(self, client, script):
+        from app.services.cache_service import SLIDING_WINDOW_SCRIPT, sliding_window_hit_local
+        
+        assert script == SLIDING_WINDOW_SCRIPT, "no Python equivalent for this script"
+        self._client = client
+        self._run = sliding_window_hit_local
+    
+    async def __call__(self, keys, args, client=None):
+        self._client.round_trips += 1
+        allowed, estimate = await self._run(self._client, *keys, *args)
+        return [int(allowed), str(estimate).encode()]
+
+
+class FakeRedis(InMemoryCache):
+    """In-process stand-in for a Redis server, counting round trips"""
+    
+    def __init__(self):
+        super().__init__()
+        self.round_trips = 0
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+    
+    def register_script(self, script):
+        return FakeScript(self, script)
+    
+    async def mget(self, keys):
+        self.round_trips += 1
+        return await super().mget(keys)
+    
+    async def publish(self, channel, message):
+        self.round_trips += 1
+        return 0
+
+
+@pytest.fixture
+def fake_redis():
+    """In-process Redis stand-in"""
+    return FakeRedis()
 
 
 @pytest.fixture
@@ -73,3 +148,37 @@ def mock_strategy_data():
         ],
         "totalLaps": 50
     }
+
+
+def make_lap_telemetry(speed_kmh: float, length: float = 1000.0, step: float = 10.0) -> pd.DataFrame:
+    """Synthetic constant-speed lap telemetry with FastF1 column names"""
+    distance = np.arange(0.0, length + step, step)
+    seconds = distance / (speed_kmh / 3.6)
+    return pd.DataFrame({
+        "Distance": distance,
+        "Time": pd.to_timedelta(seconds, unit="s"),
+        "Speed": np.full(len(distance), speed_kmh),
+        "Throttle": np.where(distance < length / 2, 100.0, 40.0),
+        "Brake": distance >= length * 0.8,
+        "nGear": np.where(distance < length / 2, 7, 4),
+        "RPM": np.full(len(distance), 11000.0),
+        "DRS": np.where(distance < 200, 12, 0),
+    })
+
+
+@pytest.fixture
+def telemetry_bundle():
+    """Session bundle with fastest laps for VER, HAM and LEC"""
+    from app.services.telemetry_bundle import BundleLap, TelemetryBundle, resample_lap
+    
+    laps = []
+    for number, (driver, speed) in enumerate((("VER", 200.0), ("HAM", 190.0), ("LEC", 195.0)), start=10):
+        telemetry = make_lap_telemetry(speed)
+        laps.append(BundleLap(
+            driver=driver,
+            lap_number=number,
+            lap_time=telemetry["Time"].iloc[-1].total_seconds(),
+            sectors={"sector1": 30.0, "sector2": None, "sector3": None},
+            channels=resample_lap(telemetry),
+        ))
+    return TelemetryBundle(laps, {lap.driver: lap.lap_number for lap in laps})
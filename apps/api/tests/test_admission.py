@@ -0,0 +1,124 @@
+"""
+Tests for admission control of expensive computations
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.services.admission import AdmissionController, Overloaded
+
+
+async def hold(controller, cost, seconds, log=None, name=None):
+    async with controller.admit(cost):
+        if log is not None:
+            log.append(name)
+        await asyncio.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_admission_limits_units_in_use():
+    """Test computations only run while their units fit in the capacity"""
+    controller = AdmissionController(capacity=4, target_wait=2)
+    peak = 0
+
+    async def job(cost):
+        nonlocal peak
+        async with controller.admit(cost):
+            peak = max(peak, controller.stats()["in_use"])
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(job(2) for _ in range(6)), job(4))
+
+    assert peak == 4
+    stats = controller.stats()
+    assert stats["in_use"] == 0
+    assert stats["admitted"] == 7
+
+
+@pytest.mark.asyncio
+async def test_admission_is_fifo():
+    """Test a large computation at the head of the queue isn't overtaken"""
+    controller = AdmissionController(capacity=4, target_wait=2)
+    order = []
+    running = asyncio.create_task(hold(controller, 2, 0.02))
+    await asyncio.sleep(0)
+
+    large = asyncio.create_task(hold(controller, 4, 0, order, "large"))
+    await asyncio.sleep(0)
+    # Would fit right now, but must wait behind the large one
+    small = asyncio.create_task(hold(controller, 1, 0, order, "small"))
+    await asyncio.gather(running, large, small)
+
+    assert order == ["large", "small"]
+
+
+@pytest.mark.asyncio
+async def test_admission_sheds_when_queue_full():
+    """Test requests beyond the queue bound are rejected immediately"""
+    controller = AdmissionController(capacity=1, max_queue=1, target_wait=2)
+    running = asyncio.create_task(hold(controller, 1, 0.05))
+    queued = asyncio.create_task(hold(controller, 1, 0))
+    await asyncio.sleep(0)
+
+    with pytest.raises(Overloaded) as exc:
+        await controller.acquire(1)
+    assert exc.value.retry_after >= 1
+    assert controller.stats()["shed_queue_full"] == 1
+    await asyncio.gather(running, queued)
+
+
+@pytest.mark.asyncio
+async def test_admission_sheds_after_target_wait():
+    """Test a waiter is shed once it has waited past the target"""
+    controller = AdmissionController(capacity=1, target_wait=0.02)
+    running = asyncio.create_task(hold(controller, 1, 0.2))
+    await asyncio.sleep(0)
+
+    start = time.monotonic()
+    with pytest.raises(Overloaded):
+        await controller.acquire(1)
+    assert time.monotonic() - start < 0.15
+    assert controller.stats()["queue_depth"] == 0
+    running.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await running
+    assert controller.stats()["in_use"] == 0
+
+
+@pytest.mark.asyncio
+async def test_admission_fast_fails_on_predicted_wait():
+    """Test a request is shed up front when recent service times predict a long wait"""
+    controller = AdmissionController(capacity=2, target_wait=1)
+    controller._unit_seconds = 0.5
+    running = asyncio.create_task(hold(controller, 2, 0.05))
+    await asyncio.sleep(0)
+
+    # 2 units in use + 2 requested over capacity 2, at 0.5s a unit: 1s is fine
+    waiter = asyncio.create_task(controller.acquire(2))
+    await asyncio.sleep(0)
+    # Another 2 units queued behind it would wait 2s
+    with pytest.raises(Overloaded):
+        await controller.acquire(2)
+
+    await running
+    await waiter
+    controller.release(2)
+    assert controller.stats()["shed_wait"] == 1
+
+
+def test_overloaded_returns_503_with_retry_after():
+    """Test shed computations surface as a retryable 503"""
+    from app.main import app
+    from app.services.admission import admission
+
+    with patch.object(admission, "acquire", side_effect=Overloaded("admission queue full", 7)):
+        response = TestClient(app).get(
+            "/events?season=2019", headers={"X-Forwarded-For": "10.0.1.1"}
+        )
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "7"
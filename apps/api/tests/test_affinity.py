@@ -0,0 +1,174 @@
+"""
+Tests for session affinity across worker processes
+"""
+
+import asyncio
+import os
+import socket
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.admission import Overloaded
+from app.services.affinity import AffinityRouter, rendezvous_owner
+from app.utils.cancellation import (
+    DISCONNECTED,
+    CancelToken,
+    OperationCancelled,
+    cancellable,
+    checkpoint,
+    current_token,
+)
+
+
+def key_owned_by(member, members):
+    """A session key that `member` owns among `members`"""
+    for n in range(1000):
+        key = f"2024:r{n}:R"
+        if rendezvous_owner(key, members) == member:
+            return key
+    raise AssertionError(f"No key owned by {member}")
+
+
+@pytest.fixture
+async def workers(tmp_path):
+    """Two routers sharing a socket directory, as two workers on a host"""
+    routers = [AffinityRouter(str(tmp_path), member_id) for member_id in ("a", "b")]
+    for router in routers:
+        await router.start()
+    yield routers
+    for router in routers:
+        await router.stop()
+
+
+def test_rendezvous_only_moves_departed_members_sessions():
+    """Test removing a worker only reassigns the sessions it owned"""
+    members = ["101", "102", "103", "104"]
+    keys = [f"2024:r{n}:R" for n in range(200)]
+    before = {key: rendezvous_owner(key, members) for key in keys}
+    after = {key: rendezvous_owner(key, members[:-1]) for key in keys}
+
+    assert set(before.values()) == set(members)
+    moved = [key for key in keys if before[key] != after[key]]
+    assert moved and all(before[key] == "104" for key in moved)
+    assert rendezvous_owner("2024:r1:R", []) is None
+
+
+@pytest.mark.asyncio
+async def test_forwards_to_owner(workers):
+    """Test a non-owner gets the owner's result and the owner computes locally"""
+    a, b = workers
+    calls = []
+
+    async def compute(params):
+        calls.append(params)
+        # Forwarded calls are never forwarded again
+        assert await b.forward("telemetry", params["key"], params) is None
+        return {"computedBy": "b", "lap": params["lap"]}
+
+    b.register("telemetry", compute)
+    key = key_owned_by("b", ["a", "b"])
+
+    assert await a.forward("telemetry", key, {"key": key, "lap": 12}) == {"computedBy": "b", "lap": 12}
+    assert await b.forward("telemetry", key, {"key": key, "lap": 12}) is None
+    assert len(calls) == 1
+    assert a.stats()["forwarded"] == 1
+    assert b.stats()["served"] == 1
+    assert a.stats()["members"] == 2
+
+
+@pytest.mark.asyncio
+async def test_forwarded_errors_are_raised_by_caller(workers):
+    """Test the owner's HTTP errors and shedding surface on the forwarding worker"""
+    a, b = workers
+
+    async def missing(params):
+        raise HTTPException(status_code=404, detail="Lap not found")
+
+    async def shed(params):
+        raise Overloaded("admission queue full", retry_after=3)
+
+    b.register("telemetry", missing)
+    b.register("race-pace", shed)
+    key = key_owned_by("b", ["a", "b"])
+
+    with pytest.raises(HTTPException) as exc:
+        await a.forward("telemetry", key, {})
+    assert exc.value.status_code == 404
+    assert exc.value.detail == "Lap not found"
+    with pytest.raises(Overloaded) as shed_exc:
+        await a.forward("race-pace", key, {})
+    assert shed_exc.value.retry_after == 3
+
+
+@pytest.mark.asyncio
+async def test_dead_owner_falls_back_to_local(workers, tmp_path):
+    """Test a socket left by a dead worker is removed and the caller computes itself"""
+    a, _ = workers
+    path = os.path.join(str(tmp_path), "worker-dead.sock")
+    # Bound but never listening, like the socket of a killed process
+    with socket.socket(socket.AF_UNIX) as leftover:
+        leftover.bind(path)
+    a._members_at = 0.0
+    key = key_owned_by("dead", ["a", "b", "dead"])
+
+    assert await a.forward("telemetry", key, {}) is None
+    assert not os.path.exists(path)
+    assert a.stats()["fallbacks"] == 1
+    assert "dead" not in a.members()
+
+
+@pytest.mark.asyncio
+async def test_cancelling_forwarder_cancels_owner(workers, monkeypatch):
+    """Test a cancelled forwarding request hangs up and the owner's token is cancelled"""
+    monkeypatch.setattr("app.services.affinity.CANCEL_POLL_INTERVAL", 0.01)
+    a, b = workers
+    started = asyncio.Event()
+    stopped = asyncio.Event()
+    reasons = []
+
+    async def compute(params):
+        started.set()
+        token = current_token()
+        while not token.cancelled:
+            await asyncio.sleep(0.01)
+        reasons.append(token.reason)
+        stopped.set()
+        checkpoint()
+
+    b.register("telemetry", compute)
+    key = key_owned_by("b", ["a", "b"])
+    token = CancelToken()
+
+    async def forward():
+        with cancellable(token):
+            return await a.forward("telemetry", key, {})
+
+    forwarding = asyncio.create_task(forward())
+    await asyncio.wait_for(started.wait(), timeout=2)
+    token.cancel(DISCONNECTED)
+
+    with pytest.raises(OperationCancelled):
+        await asyncio.wait_for(forwarding, timeout=2)
+    await asyncio.wait_for(stopped.wait(), timeout=2)
+    assert reasons == [DISCONNECTED]
+
+
+@pytest.mark.asyncio
+async def test_owner_cancellation_surfaces_on_forwarder(workers, monkeypatch):
+    """Test the owner runs under the compute deadline and reports cancellation back"""
+    monkeypatch.setattr("app.services.affinity.settings.compute_timeout", 30)
+    a, b = workers
+    deadlines = []
+
+    async def compute(params):
+        deadlines.append(current_token().deadline)
+        raise OperationCancelled("timed out")
+
+    b.register("telemetry", compute)
+    key = key_owned_by("b", ["a", "b"])
+
+    with pytest.raises(OperationCancelled) as exc:
+        await a.forward("telemetry", key, {})
+    assert exc.value.reason == "timed out"
+    assert deadlines[0] is not None
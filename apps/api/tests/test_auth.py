@@ -0,0 +1,78 @@
+"""
+Tests for JWT verification and the verified-claims cache
+"""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+from unittest.mock import patch
+
+from app.middleware import auth
+from app.middleware.auth import ClaimsCache, verify_token
+
+
+SECRET = "test-jwt-secret"
+
+
+def make_token(sub="user-1", exp_in=3600, **claims):
+    claims = {"sub": sub, "aud": "authenticated", "email": f"{sub}@example.com", **claims}
+    if exp_in is not None:
+        claims["exp"] = int(time.time()) + exp_in
+    return jwt.encode(claims, SECRET, algorithm="HS256")
+
+
+@pytest.fixture
+def jwt_secret():
+    auth.claims_cache.clear()
+    with patch("app.middleware.auth.settings.supabase_jwt_secret", SECRET):
+        yield
+    auth.claims_cache.clear()
+
+
+def test_verify_token_cached_until_expiry(jwt_secret):
+    """Test a token is verified once and then served from the cache"""
+    token = make_token()
+    with patch("app.middleware.auth.jwt.decode", wraps=jwt.decode) as decode:
+        assert verify_token(token)["sub"] == "user-1"
+        assert verify_token(token)["sub"] == "user-1"
+    assert decode.call_count == 1
+
+
+def test_verify_token_rejects_bad_tokens(jwt_secret):
+    """Test invalid and expired tokens are rejected and not cached"""
+    assert verify_token("not-a-jwt") is None
+    assert verify_token(make_token(exp_in=-10)) is None
+    assert verify_token(jwt.encode({"sub": "x", "aud": "authenticated"}, "other", algorithm="HS256")) is None
+    assert len(auth.claims_cache) == 0
+
+
+def test_claims_cache_expiry_and_bound():
+    """Test entries expire with the token and the cache stays bounded"""
+    cache = ClaimsCache(max_entries=2)
+    cache.set("a", {"sub": "a", "exp": 100})
+    cache.set("b", {"sub": "b", "exp": 300})
+    cache.set("no-exp", {"sub": "c"})
+    assert cache.get("a", now=50) == {"sub": "a", "exp": 100}
+    assert cache.get("a", now=150) is None
+    assert cache.get("no-exp") is None
+
+    cache.set("c", {"sub": "c", "exp": 300})
+    cache.set("d", {"sub": "d", "exp": 300})
+    assert len(cache) == 2
+    assert cache.get("b", now=0) is None
+
+
+def test_request_verifies_token_once(jwt_secret):
+    """Test rate limiting and the auth dependency share one verification"""
+    from app.main import app
+
+    token = make_token(sub="user-2")
+    with patch("app.middleware.auth.jwt.decode", wraps=jwt.decode) as decode:
+        response = TestClient(app).get(
+            "/saved-analyses", headers={"Authorization": f"Bearer {token}"}
+        )
+    # Authenticated, then stopped because the database isn't configured
+    assert response.status_code == 503
+    assert decode.call_count == 1
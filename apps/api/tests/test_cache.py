@@ -2,6 +2,9 @@
 Tests for caching functionality
 """
 
+import asyncio
+import sys
+
 import pytest
 from unittest.mock import AsyncMock, patch
 
@@ -138,3 +141,316 @@ async def test_cache_service_json():
     result = await service.get_json("json_test")
     
     assert result == data
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_lru_entry_budget():
+    """Test in-memory cache evicts least recently used entries"""
+    cache = InMemoryCache(max_entries=2)
+    await cache.set("a", "1", ex=60)
+    await cache.set("b", "2", ex=60)
+    
+    # Touch "a" so "b" becomes least recently used
+    assert await cache.get("a") == "1"
+    await cache.set("c", "3", ex=60)
+    
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "1"
+    assert await cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_byte_budget():
+    """Test in-memory cache stays within its byte budget"""
+    cache = InMemoryCache(max_bytes=100)
+    for i in range(10):
+        await cache.set(f"k{i}", "x" * 20, ex=60)
+    
+    stats = cache.stats()
+    assert stats["bytes"] <= 100
+    assert stats["entries"] < 10
+    assert await cache.get("k9") == "x" * 20
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_sweep_expired():
+    """Test sweeping removes expired keys that are never read again"""
+    cache = InMemoryCache()
+    await cache.set("ratelimit:ip:1:100", "5", ex=0)
+    await cache.set("ratelimit:ip:1:101", "1", ex=60)
+    
+    assert cache.sweep_expired() == 1
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert stats["expirations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_background_sweeper():
+    """Test the background sweeper removes expired keys"""
+    import asyncio
+    
+    cache = InMemoryCache()
+    await cache.set("stale", "value", ex=0)
+    cache.start_sweeper(0.01)
+    await asyncio.sleep(0.05)
+    await cache.stop_sweeper()
+    
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_incr_keeps_ttl(memory_cache):
+    """Test incr preserves the existing expiry"""
+    await memory_cache.set("counter", "1", ex=30)
+    assert await memory_cache.incr("counter") == 2
+    assert 0 < await memory_cache.ttl("counter") <= 30
+
+
+@pytest.fixture
+def two_tier_service(fake_redis):
+    """Cache service with an in-process Redis stand-in as L2"""
+    service = CacheService()
+    service._redis = fake_redis
+    service._l1 = InMemoryCache(max_entries=10)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_l1_serves_repeat_hits(two_tier_service):
+    """Test L2 hits are promoted and then served from L1"""
+    l2 = two_tier_service._redis
+    await l2.set("pitlane:events:2024", "[1, 2]", ex=60)
+    
+    assert await two_tier_service.get("pitlane:events:2024") == "[1, 2]"
+    assert await two_tier_service.get("pitlane:events:2024") == "[1, 2]"
+    
+    assert l2.stats()["hits"] == 1
+    assert two_tier_service._l1.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_l1_write_through_and_delete(two_tier_service):
+    """Test writes update L1 and deletes remove from both tiers"""
+    await two_tier_service.set("pitlane:drivers:x", "old")
+    await two_tier_service.set("pitlane:drivers:x", "new")
+    assert await two_tier_service._l1.get("pitlane:drivers:x") == "new"
+    
+    await two_tier_service.delete("pitlane:drivers:x")
+    assert await two_tier_service.get("pitlane:drivers:x") is None
+
+
+@pytest.mark.asyncio
+async def test_l1_skips_rate_limit_counters(two_tier_service):
+    """Test counters are never cached in L1"""
+    await two_tier_service.incr("ratelimit:ip:1:1")
+    assert await two_tier_service.get("ratelimit:ip:1:1") == "1"
+    await two_tier_service.incr("ratelimit:ip:1:1")
+    assert await two_tier_service.get("ratelimit:ip:1:1") == "2"
+    assert two_tier_service._l1.stats()["entries"] == 0
+
+
+class FlakyPubSub:
+    """Fails its first subscription, then delivers one invalidation"""
+    
+    attempts = 0
+    
+    async def subscribe(self, channel):
+        FlakyPubSub.attempts += 1
+        if FlakyPubSub.attempts == 1:
+            raise ConnectionError("Redis restarted")
+    
+    async def listen(self):
+        yield {"type": "subscribe", "data": 1}
+        yield {"type": "message", "data": b"other-worker pitlane:drivers:x"}
+        await asyncio.Event().wait()
+    
+    async def aclose(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_invalidation_listener_resubscribes(two_tier_service, monkeypatch):
+    """Test a lost subscription is retried and L1 is cleared of possibly stale entries"""
+    monkeypatch.setattr(
+        sys.modules["app.services.cache_service"], "INVALIDATION_RETRY_MIN", 0.01
+    )
+    two_tier_service._redis.pubsub = lambda: FlakyPubSub()
+    await two_tier_service._l1.set("pitlane:drivers:x", "old", ex=60)
+    await two_tier_service._l1.set("pitlane:events:2024", "[]", ex=60)
+    
+    task = asyncio.create_task(two_tier_service._listen_for_invalidations())
+    await asyncio.sleep(0.05)
+    task.cancel()
+    
+    assert FlakyPubSub.attempts == 2
+    assert two_tier_service._l1.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_l1_unused_in_fallback_mode():
+    """Test L1 is bypassed when the memory fallback is the active tier"""
+    service = CacheService()
+    service._l1 = InMemoryCache()
+    service._use_fallback = True
+    
+    await service.set("pitlane:events:2024", "[]")
+    assert await service.get("pitlane:events:2024") == "[]"
+    assert service._l1.stats()["entries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_service_get_many_fallback():
+    """Test batched get/set against the memory fallback"""
+    service = CacheService()
+    service._use_fallback = True
+    
+    await service.set_many_json({"pitlane:a": {"x": 1}, "pitlane:b": [1, 2]})
+    result = await service.get_many_json(["pitlane:a", "pitlane:b", "pitlane:missing"])
+    
+    assert result == {"pitlane:a": {"x": 1}, "pitlane:b": [1, 2], "pitlane:missing": None}
+
+
+@pytest.mark.asyncio
+async def test_cache_service_get_many_single_round_trip(two_tier_service):
+    """Test batched reads make one MGET call and fill L1"""
+    l2 = two_tier_service._redis
+    await two_tier_service.set_many({"pitlane:a": "1", "pitlane:b": "2"})
+    assert l2.round_trips == 1
+    await two_tier_service._l1.delete("pitlane:a")
+    await two_tier_service._l1.delete("pitlane:b")
+    
+    result = await two_tier_service.get_many(["pitlane:a", "pitlane:b"])
+    assert result == {"pitlane:a": "1", "pitlane:b": "2"}
+    assert l2.round_trips == 2
+    
+    # Second read is served entirely from L1
+    await two_tier_service.get_many(["pitlane:a", "pitlane:b"])
+    assert l2.round_trips == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_service_incr_with_expiry_pipelined(two_tier_service):
+    """Test counter increment and expiry share one Redis round trip"""
+    l2 = two_tier_service._redis
+    assert await two_tier_service.incr_with_expiry("ratelimit:ip:x:1", 60) == 1
+    assert await two_tier_service.incr_with_expiry("ratelimit:ip:x:1", 60) == 2
+    assert l2.round_trips == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_service_incr_with_expiry():
+    """Test counter increment sets an expiry on first use"""
+    service = CacheService()
+    service._use_fallback = True
+    
+    assert await service.incr_with_expiry("ratelimit:ip:x:1", 60) == 1
+    assert await service.incr_with_expiry("ratelimit:ip:x:1", 60) == 2
+    assert 0 < await service.ttl("ratelimit:ip:x:1") <= 60
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_single_round_trip(two_tier_service):
+    """Test each rate limit check is one script call and rejects past the limit"""
+    l2 = two_tier_service._redis
+    now = 6000.0  # start of window 100
+    
+    results = [
+        await two_tier_service.sliding_window_hit("ratelimit:ip:x", 3, 60, now)
+        for _ in range(4)
+    ]
+    
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[2][1] == 3
+    assert l2.round_trips == 4
+    # Rejected hits aren't counted
+    assert await l2.get("ratelimit:ip:x:100") == "3"
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_weights_previous_window():
+    """Test the previous window counts in proportion to its overlap"""
+    service = CacheService()
+    service._use_fallback = True
+    
+    for _ in range(4):
+        await service.sliding_window_hit("ratelimit:ip:y", 4, 60, 6030.0)
+    
+    # 15s into the next window, 3/4 of the previous 4 hits still count
+    assert await service.sliding_window_hit("ratelimit:ip:y", 4, 60, 6075.0) == (True, 4.0)
+    assert await service.sliding_window_hit("ratelimit:ip:y", 4, 60, 6075.0) == (False, 4.0)
+    # 45s in, only one of them still counts
+    assert await service.sliding_window_hit("ratelimit:ip:y", 4, 60, 6105.0) == (True, 3.0)
+    assert 0 < await service.ttl("ratelimit:ip:y:101") <= 120
+
+
+@pytest.mark.asyncio
+async def test_revalidate_miss_loads_inline():
+    """Test a miss awaits the loader and caches the result"""
+    service = CacheService()
+    service._use_fallback = True
+    loader = AsyncMock(return_value=[{"round": 1}])
+    
+    assert await service.get_or_revalidate_json("pitlane:events:2024", loader) == [{"round": 1}]
+    assert await service.get_or_revalidate_json("pitlane:events:2024", loader) == [{"round": 1}]
+    assert loader.await_count == 1
+    
+    # Plain readers see the value, not the envelope
+    assert await service.get_json("pitlane:events:2024") == [{"round": 1}]
+
+
+@pytest.mark.asyncio
+async def test_revalidate_serves_stale_and_refreshes_once():
+    """Test stale entries are served immediately with one background refresh"""
+    import asyncio
+    
+    service = CacheService()
+    service._use_fallback = True
+    # Soft expiry already passed, hard expiry still ahead
+    await service._set_revalidating("pitlane:events:2024", ["old"], ttl=60, soft_ttl=-1)
+    
+    loader = AsyncMock(return_value=["new"])
+    results = await asyncio.gather(*[
+        service.get_or_revalidate_json("pitlane:events:2024", loader, ttl=60, soft_ttl=1)
+        for _ in range(5)
+    ])
+    assert results == [["old"]] * 5
+    
+    await asyncio.gather(*list(service._refreshing.values()))
+    assert loader.await_count == 1
+    assert await service.get_json("pitlane:events:2024") == ["new"]
+
+
+@pytest.mark.asyncio
+async def test_revalidate_refresh_skipped_when_locked():
+    """Test a refresh is skipped while another worker holds the lock"""
+    import asyncio
+    
+    service = CacheService()
+    service._use_fallback = True
+    await service._set_revalidating("pitlane:strategy:x", {"v": 1}, ttl=60, soft_ttl=-1)
+    assert await service.acquire_lock("lock:pitlane:strategy:x", 30)
+    
+    loader = AsyncMock(return_value={"v": 2})
+    assert await service.get_or_revalidate_json("pitlane:strategy:x", loader) == {"v": 1}
+    await asyncio.gather(*list(service._refreshing.values()))
+    
+    loader.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_lock_release_requires_token():
+    """Test a lock can only be released by its holder"""
+    service = CacheService()
+    service._use_fallback = True
+    
+    token = await service.acquire_lock("lock:x", 30)
+    assert token
+    assert await service.acquire_lock("lock:x", 30) is None
+    
+    await service.release_lock("lock:x", "not-the-token")
+    assert await service.acquire_lock("lock:x", 30) is None
+    
+    await service.release_lock("lock:x", token)
+    assert await service.acquire_lock("lock:x", 30)
@@ -0,0 +1,122 @@
+"""
+Tests for cache value compression
+"""
+
+import json
+
+import pytest
+
+from app.services.cache_compression import (
+    CacheCompressor,
+    CompressionError,
+    HEADER_ZSTD,
+    HEADER_ZSTD_DICT,
+)
+from app.services.cache_service import CacheService, InMemoryCache, key_namespace
+
+
+def _telemetry_payload(seed: int) -> str:
+    return json.dumps({
+        "driverA": {
+            "driver": "VER",
+            "lapNumber": seed,
+            "data": [
+                {"distance": i * 5.0 + seed, "speed": 200 + (i * seed) % 90, "throttle": 100, "brake": 0, "gear": 7}
+                for i in range(200)
+            ],
+        },
+    })
+
+
+def test_small_values_stored_plain():
+    """Test values below the threshold are stored without a header"""
+    compressor = CacheCompressor(threshold=1024)
+    encoded = compressor.encode("events", '[{"round": 1}]')
+    assert encoded == b'[{"round": 1}]'
+    assert compressor.decode("events", encoded) == '[{"round": 1}]'
+
+
+def test_large_values_round_trip():
+    """Test large values are compressed and decode back exactly"""
+    compressor = CacheCompressor(threshold=1024)
+    value = _telemetry_payload(1)
+    encoded = compressor.encode("telemetry", value)
+    
+    assert encoded[0] == HEADER_ZSTD
+    assert len(encoded) < len(value) / 3
+    assert compressor.decode("telemetry", encoded) == value
+
+
+def test_legacy_uncompressed_values_readable():
+    """Test values written before compression still read"""
+    compressor = CacheCompressor(threshold=10)
+    legacy = json.dumps({"stints": []}).encode("utf-8")
+    assert compressor.decode("strategy", legacy) == '{"stints": []}'
+    assert compressor.decode("ratelimit", b"42") == "42"
+
+
+def test_disabled_threshold_still_reads_compressed():
+    """Test disabling compression keeps compressed entries readable"""
+    value = _telemetry_payload(2)
+    encoded = CacheCompressor(threshold=1).encode("telemetry", value)
+    
+    disabled = CacheCompressor(threshold=None)
+    assert disabled.encode("telemetry", value) == value.encode("utf-8")
+    assert disabled.decode("telemetry", encoded) == value
+
+
+def test_trained_dictionary_round_trip():
+    """Test telemetry values use a trained dictionary when configured"""
+    samples = [_telemetry_payload(i) for i in range(1, 60)]
+    dictionary = CacheCompressor.train_dictionary(samples, dict_size=4096)
+    
+    compressor = CacheCompressor(threshold=1024, dictionary=dictionary)
+    value = _telemetry_payload(99)
+    encoded = compressor.encode("telemetry", value)
+    assert encoded[0] == HEADER_ZSTD_DICT
+    assert compressor.decode("telemetry", encoded) == value
+    
+    # Other namespaces don't use the dictionary
+    assert compressor.encode("strategy", value)[0] == HEADER_ZSTD
+    
+    # Readers without the dictionary can't decode it
+    with pytest.raises(CompressionError):
+        CacheCompressor().decode("telemetry", encoded)
+
+
+def test_compression_stats():
+    """Test per-namespace ratio and CPU cost are tracked"""
+    compressor = CacheCompressor(threshold=1024)
+    value = _telemetry_payload(3)
+    compressor.decode("telemetry", compressor.encode("telemetry", value))
+    
+    stats = compressor.stats()["telemetry"]
+    assert stats["writes"] == 1
+    assert stats["compressed_writes"] == 1
+    assert stats["compressed_reads"] == 1
+    assert stats["ratio"] > 3
+    assert stats["compress_seconds"] >= 0
+
+
+def test_key_namespace():
+    """Test namespaces are derived from cache keys"""
+    assert key_namespace("pitlane:telemetry:2024:Bahrain") == "telemetry"
+    assert key_namespace("ratelimit:ip:1.2.3.4:100") == "ratelimit"
+    assert key_namespace("race_pace:2024:Bahrain:R:HAM_VER") == "race_pace"
+
+
+@pytest.mark.asyncio
+async def test_cache_service_compresses_redis_values():
+    """Test the cache service compresses values written to Redis"""
+    service = CacheService()
+    service._redis = InMemoryCache()
+    service._l1 = None
+    
+    value = _telemetry_payload(4)
+    await service.set("pitlane:telemetry:x", value)
+    
+    stored = await service._redis.get("pitlane:telemetry:x")
+    assert isinstance(stored, bytes)
+    assert len(stored) < len(value)
+    assert await service.get("pitlane:telemetry:x") == value
+    assert "telemetry" in service.compression_stats()
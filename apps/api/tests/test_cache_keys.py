@@ -0,0 +1,93 @@
+"""
+Tests for canonical cache keys
+"""
+
+import pytest
+from unittest.mock import patch
+
+from app.services.cache_keys import (
+    CacheKeyResolver,
+    canonical_pair,
+    normalize_event_name,
+    normalize_session,
+    swap_comparison,
+)
+
+
+def test_normalize_event_name():
+    """Test event names normalize case, whitespace and suffix"""
+    assert normalize_event_name("Monaco") == "monaco"
+    assert normalize_event_name("  monaco  ") == "monaco"
+    assert normalize_event_name("Monaco Grand Prix") == "monaco"
+    assert normalize_event_name("Monaco GP") == "monaco"
+    assert normalize_event_name("Abu  Dhabi Grand Prix") == "abu dhabi"
+
+
+def test_normalize_session():
+    """Test session aliases map to FastF1 identifiers"""
+    assert normalize_session("Race") == "R"
+    assert normalize_session("r") == "R"
+    assert normalize_session("Qualifying") == "Q"
+    assert normalize_session("Practice 2") == "FP2"
+    assert normalize_session("Sprint Shootout") == "SQ"
+    assert normalize_session("fp1") == "FP1"
+
+
+def test_canonical_pair_orders_drivers():
+    """Test swapped pairs map to the same canonical order"""
+    assert canonical_pair("ver", "HAM") == ("HAM", "VER", None, None, True)
+    assert canonical_pair("HAM", "VER") == ("HAM", "VER", None, None, False)
+    assert canonical_pair("VER", "VER", 12, 5) == ("VER", "VER", 5, 12, True)
+    assert canonical_pair("HAM", "VER", 3, None) == ("HAM", "VER", 3, None, False)
+
+
+def test_swap_comparison(mock_telemetry_data):
+    """Test swapping exchanges sides and negates the delta"""
+    mock_telemetry_data["sectorsA"] = {"sector1": 1.0}
+    mock_telemetry_data["sectorsB"] = {"sector1": 2.0}
+    
+    swapped = swap_comparison(mock_telemetry_data)
+    
+    assert swapped["driverA"]["driver"] == "HAM"
+    assert swapped["driverB"]["driver"] == "VER"
+    assert swapped["sectorsA"] == {"sector1": 2.0}
+    assert [p["delta"] for p in swapped["delta"]] == [0, -0.05, -0.10]
+    assert swap_comparison(swapped) == mock_telemetry_data
+
+
+@pytest.mark.asyncio
+async def test_canonical_event_resolves_names_once():
+    """Test event spellings resolve to one round, looked up once"""
+    resolver = CacheKeyResolver()
+    
+    with patch.object(CacheKeyResolver, "_resolve_round", return_value=8) as resolve:
+        assert await resolver.canonical_event(2031, "Monaco") == "r8"
+        assert await resolver.canonical_event(2031, "monaco") == "r8"
+        assert await resolver.canonical_event(2031, "Monaco Grand Prix") == "r8"
+        assert await resolver.canonical_event(2031, "8") == "r8"
+    
+    assert resolve.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_canonical_event_unresolved_falls_back_to_name():
+    """Test events FastF1 can't resolve keep their normalized name"""
+    resolver = CacheKeyResolver()
+    
+    with patch.object(CacheKeyResolver, "_resolve_round", return_value=None):
+        assert await resolver.canonical_event(2031, "Nowhere Grand Prix") == "nowhere"
+
+
+@pytest.mark.asyncio
+async def test_failed_resolution_is_not_shared():
+    """Test a failed lookup isn't written to the shared cache, so other workers retry"""
+    from app.services import cache_service
+    
+    first, second = CacheKeyResolver(), CacheKeyResolver()
+    
+    with patch.object(CacheKeyResolver, "_resolve_round", return_value=None):
+        assert await first.canonical_event(2032, "Monaco") == "monaco"
+    assert await cache_service.get("pitlane:event_round:2032:monaco") is None
+    
+    with patch.object(CacheKeyResolver, "_resolve_round", return_value=8):
+        assert await second.canonical_event(2032, "Monaco") == "r8"
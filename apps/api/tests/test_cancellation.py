@@ -0,0 +1,149 @@
+"""
+Tests for request-scoped cancellation of computations
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.concurrency import run_in_threadpool
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+
+from app.services.admission import AdmissionController
+from app.utils.cancellation import (
+    DISCONNECTED,
+    TIMED_OUT,
+    CancelToken,
+    OperationCancelled,
+    checkpoint,
+    current_token,
+    detached,
+    request_cancellation,
+)
+
+
+class FakeRequest:
+    """Reports a disconnect once `disconnect` is set"""
+
+    def __init__(self):
+        self.disconnect = threading.Event()
+
+    async def is_disconnected(self):
+        return self.disconnect.is_set()
+
+
+def staged_work(stages, log):
+    """Blocking work with a checkpoint between stages"""
+    for stage in range(stages):
+        checkpoint()
+        log.append(stage)
+        time.sleep(0.02)
+    return "done"
+
+
+def test_checkpoint_without_token_is_noop():
+    """Test code outside a cancellable request runs unaffected"""
+    assert current_token() is None
+    checkpoint()
+
+
+def test_token_cancel_and_deadline():
+    """Test a token raises once cancelled or past its deadline, keeping the first reason"""
+    token = CancelToken()
+    token.check()
+    token.cancel(DISCONNECTED)
+    token.cancel("later")
+    with pytest.raises(OperationCancelled) as exc:
+        token.check()
+    assert exc.value.reason == DISCONNECTED
+
+    token = CancelToken(timeout=0.01)
+    assert not token.cancelled
+    time.sleep(0.02)
+    assert token.cancelled
+    assert token.reason == TIMED_OUT
+
+
+@pytest.mark.asyncio
+async def test_disconnect_stops_threadpool_work_at_checkpoint():
+    """Test a disconnect propagates into the worker thread between stages"""
+    request = FakeRequest()
+    log = []
+
+    async def disconnect_soon():
+        await asyncio.sleep(0.03)
+        request.disconnect.set()
+
+    asyncio.create_task(disconnect_soon())
+    with pytest.raises(OperationCancelled) as exc:
+        async with request_cancellation(request, interval=0.01):
+            await run_in_threadpool(staged_work, 50, log)
+
+    assert exc.value.reason == DISCONNECTED
+    assert 0 < len(log) < 50
+    assert current_token() is None
+
+
+@pytest.mark.asyncio
+async def test_detached_work_survives_cancellation():
+    """Test shared work opted out of the request's token runs to completion"""
+    request = FakeRequest()
+    request.disconnect.set()
+    log = []
+
+    async with request_cancellation(request, interval=0.01):
+        await asyncio.sleep(0.02)
+        with detached():
+            result = await run_in_threadpool(staged_work, 3, log)
+
+    assert result == "done"
+    assert log == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_admission_skips_work_cancelled_while_queued():
+    """Test a computation cancelled while waiting for admission never starts"""
+    controller = AdmissionController(capacity=1, target_wait=1)
+    request = FakeRequest()
+    started = []
+
+    async def hold():
+        async with controller.admit(1):
+            await asyncio.sleep(0.05)
+
+    running = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    request.disconnect.set()
+    with pytest.raises(OperationCancelled):
+        async with request_cancellation(request, interval=0.01):
+            await controller.run_heavy(1, started.append, "ran")
+
+    await running
+    assert started == []
+    assert controller.stats()["in_use"] == 0
+
+
+def test_compute_timeout_returns_504(monkeypatch):
+    """Test a request computing past the timeout is stopped with a 504"""
+    from app.config import settings
+    from app.main import app
+    from app.services import fastf1_service
+
+    monkeypatch.setattr(settings, "compute_timeout", 0.05)
+    log = []
+
+    def slow_race_pace(*args):
+        staged_work(100, log)
+
+    with patch.object(fastf1_service, "get_race_pace", side_effect=slow_race_pace):
+        response = TestClient(app).post(
+            "/telemetry/race-pace",
+            json={"season": 2021, "event": "3", "session": "R", "drivers": ["VER"]},
+            headers={"X-Forwarded-For": "10.0.2.1"},
+        )
+
+    assert response.status_code == 504
+    assert response.json()["reason"] == TIMED_OUT
+    assert len(log) < 100
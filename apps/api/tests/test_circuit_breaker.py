@@ -0,0 +1,100 @@
+"""
+Tests for the Redis circuit breaker and cache failover
+"""
+
+import asyncio
+
+import pytest
+from unittest.mock import patch
+
+from app.services.cache_service import CacheService
+from app.services.circuit_breaker import CircuitBreaker
+
+
+class FlakyRedis:
+    """Redis stand-in that can be taken down and brought back"""
+    
+    def __init__(self):
+        self.down = True
+        self.calls = 0
+        self.data = {}
+    
+    async def _call(self):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("Redis unreachable")
+    
+    async def get(self, key):
+        await self._call()
+        return self.data.get(key)
+    
+    async def set(self, key, value, ex=None, nx=False):
+        await self._call()
+        self.data[key] = value
+        return True
+    
+    async def ping(self):
+        if self.down:
+            raise ConnectionError("Redis unreachable")
+        return True
+
+
+def test_breaker_opens_after_threshold():
+    """Test the breaker opens only after consecutive failures"""
+    breaker = CircuitBreaker(failure_threshold=3)
+    error = ConnectionError("down")
+    
+    assert breaker.record_failure(error) is False
+    breaker.record_success()
+    assert breaker.record_failure(error) is False
+    assert breaker.record_failure(error) is False
+    assert breaker.record_failure(error) is True
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow_request() is False
+    assert breaker.snapshot()["trips"] == 1
+    assert breaker.snapshot()["short_circuits"] == 1
+
+
+def test_breaker_probe_cycle():
+    """Test probing moves the breaker through half-open back to closed"""
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_failure(ConnectionError("down"))
+    
+    breaker.begin_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.probe_failed(ConnectionError("still down"))
+    assert breaker.state == CircuitBreaker.OPEN
+    
+    breaker.close()
+    assert breaker.allow_request() is True
+    assert breaker.consecutive_failures == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_fails_over_and_back():
+    """Test the cache stops calling Redis once tripped and fails back on recovery"""
+    service = CacheService()
+    service._l1 = None
+    flaky = FlakyRedis()
+    service._redis = flaky
+    
+    with patch("app.services.cache_service.settings.cache_breaker_probe_interval", 0.01):
+        for _ in range(3):
+            assert await service.get("pitlane:events:2024") is None
+        assert service.status()["breaker"]["state"] != CircuitBreaker.CLOSED
+        assert service.status()["backend"] == "memory (failover)"
+        
+        # Further calls are served by the in-memory tier without touching Redis
+        calls = flaky.calls
+        await service.set("pitlane:events:2024", "[]")
+        assert await service.get("pitlane:events:2024") == "[]"
+        assert flaky.calls == calls
+        
+        # Redis recovers; the background probe closes the breaker
+        flaky.down = False
+        await asyncio.wait_for(service._probe_task, timeout=1)
+    
+    assert service.status()["backend"] == "redis"
+    await service.set("pitlane:events:2025", "[1]")
+    assert flaky.data["pitlane:events:2025"] == b"[1]"
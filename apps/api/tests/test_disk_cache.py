@@ -0,0 +1,163 @@
+"""
+Tests for the SQLite disk cache tier
+"""
+
+import asyncio
+import json
+
+import pytest
+from unittest.mock import patch
+
+from app.services.cache_service import CacheService
+from app.services.disk_cache import DiskCache
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    """Create a disk cache in a temporary directory"""
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_set_get(disk_cache):
+    """Test disk cache set and get for text and binary values"""
+    await disk_cache.set("text", "value", ex=60)
+    await disk_cache.set("binary", b"\x01\x02", ex=60)
+
+    assert await disk_cache.get("text") == "value"
+    assert await disk_cache.get("binary") == b"\x01\x02"
+    assert await disk_cache.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_expiry_and_ttl(disk_cache):
+    """Test expired entries are not returned and TTLs are reported"""
+    await disk_cache.set("expired", "value", ex=0)
+    await disk_cache.set("live", "value", ex=120)
+
+    assert await disk_cache.get("expired") is None
+    assert 115 <= await disk_cache.ttl("live") <= 120
+    assert await disk_cache.ttl("missing") == -1
+
+    await disk_cache.expire("live", 5)
+    assert await disk_cache.ttl("live") <= 5
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_nx(disk_cache):
+    """Test set with nx only writes absent or expired keys"""
+    assert await disk_cache.set("lock", "a", ex=60, nx=True) is True
+    assert await disk_cache.set("lock", "b", ex=60, nx=True) is None
+    assert await disk_cache.get("lock") == "a"
+
+    await disk_cache.set("stale", "a", ex=0)
+    assert await disk_cache.set("stale", "b", ex=60, nx=True) is True
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_incr_keeps_ttl(disk_cache):
+    """Test counters increment and keep their expiry"""
+    assert await disk_cache.incr("counter") == 1
+    await disk_cache.expire("counter", 300)
+    assert await disk_cache.incr("counter") == 2
+    assert await disk_cache.ttl("counter") > 60
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_batch(disk_cache):
+    """Test mget/set_many"""
+    await disk_cache.set_many({"a": "1", "b": "2"}, ex=60)
+    assert await disk_cache.mget(["a", "missing", "b"]) == ["1", None, "2"]
+
+    await disk_cache.delete("a")
+    assert await disk_cache.exists("a") is False
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_lru_byte_budget(tmp_path):
+    """Test least recently accessed entries are evicted over the budget"""
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=1000)
+    with patch("app.services.disk_cache.time.time") as now:
+        for i in range(20):
+            now.return_value = 1000.0 + i * 100
+            await cache.set(f"key{i:02d}", "x" * 95, ex=86400)
+        # Touch the oldest key so it survives eviction
+        now.return_value = 5000.0
+        assert await cache.get("key00") is not None
+        cache.sweep_expired()
+
+        stats = cache.stats()
+        assert stats["bytes"] <= 1000
+        assert stats["evictions"] > 0
+        assert await cache.get("key00") is not None
+        assert await cache.get("key01") is None
+        assert await cache.get("key19") is not None
+    cache.close()
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_sweep_expired(disk_cache):
+    """Test the sweep removes expired entries"""
+    await disk_cache.set("expired", "value", ex=0)
+    await disk_cache.set("live", "value", ex=60)
+
+    assert disk_cache.sweep_expired() == 1
+    assert disk_cache.stats()["entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_stats_use_last_count(tmp_path):
+    """Test stats report the last counted size without querying SQLite"""
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a = DiskCache(path)
+    worker_b = DiskCache(path)
+    await worker_b.set("own", "value", ex=60)
+    await worker_a.set("other", "value", ex=60)
+
+    # Held by a slow query; stats must not wait on it (counted on open)
+    with worker_b._lock:
+        assert worker_b.stats()["entries"] == 0
+    worker_b.sweep_expired()
+    assert worker_b.stats()["entries"] == 2
+    assert worker_b.stats()["bytes"] == 2 * len("value") + len("own") + len("other")
+    worker_a.close()
+    worker_b.close()
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_shared_between_instances(tmp_path):
+    """Test two connections (e.g. two workers) see each other's writes"""
+    path = str(tmp_path / "cache.sqlite3")
+    worker_a = DiskCache(path)
+    worker_b = DiskCache(path)
+
+    await asyncio.gather(*(worker_a.incr("counter") for _ in range(10)))
+    await asyncio.gather(*(worker_b.incr("counter") for _ in range(10)))
+    await worker_a.set("artifact", "data", ex=60)
+
+    assert await worker_b.get("counter") == "20"
+    assert await worker_b.get("artifact") == "data"
+    worker_a.close()
+    worker_b.close()
+
+
+@pytest.mark.asyncio
+async def test_cache_service_disk_tier_survives_restart(tmp_path):
+    """Test a service restarted on the same directory keeps its artifacts"""
+    large = {"points": [{"distance": i, "speed": 300.0} for i in range(200)]}
+    with patch("app.services.cache_service.settings.disk_cache_dir", str(tmp_path)):
+        service = CacheService()
+        service._use_fallback = True
+        await service.set_json("pitlane:telemetry:2024:r8:Q:HAM:VER", large)
+        await service.disconnect()
+
+        restarted = CacheService()
+        restarted._use_fallback = True
+
+        assert restarted.status()["backend"] == "disk"
+        assert await restarted.get_json("pitlane:telemetry:2024:r8:Q:HAM:VER") == large
+        # Stored compressed, like in Redis
+        assert restarted._fallback.stats()["bytes"] < len(json.dumps(large))
+        await restarted.disconnect()
@@ -131,3 +131,156 @@ def test_rate_limit_headers(client):
     assert "X-RateLimit-Limit" in response.headers
     assert "X-RateLimit-Remaining" in response.headers
     assert "X-RateLimit-Reset" in response.headers
+
+
+def test_session_overview_requires_params(client):
+    """Test session overview endpoint requires parameters"""
+    response = client.get("/sessions/overview?season=2024&event=Bahrain")
+    assert response.status_code == 422
+
+
+def test_session_overview_served_from_cache(client, mock_strategy_data, monkeypatch):
+    """Test session overview assembles cached artifacts"""
+    import asyncio
+    from app.services import cache_service
+    
+    monkeypatch.setattr(cache_service, "_use_fallback", True)
+    # Round numbers resolve without a schedule lookup
+    artifacts = {
+        cache_service.drivers_key(2024, "r8", "R"): [
+            {"code": "VER", "name": "Max Verstappen", "team": "Red Bull", "teamColor": "#3671C6", "number": 1}
+        ],
+        cache_service.strategy_key(2024, "r8", "R"): mock_strategy_data,
+        cache_service.positions_key(2024, "r8", "R"): [
+            {"driver": "VER", "positions": [{"lap": 1, "position": 1}]}
+        ],
+        cache_service.track_evolution_key(2024, "r8", "R"): {
+            "points": [], "improvementRate": 0.0
+        },
+    }
+    asyncio.run(cache_service.set_many_json(artifacts))
+    
+    response = client.get("/sessions/overview?season=2024&event=8&session=Race")
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert data["drivers"][0]["code"] == "VER"
+    assert data["strategy"]["totalLaps"] == 50
+    assert data["positions"][0]["driver"] == "VER"
+    assert data["trackEvolution"]["improvementRate"] == 0.0
+
+
+def test_telemetry_compare_reuses_swapped_pair(client, mock_telemetry_data, monkeypatch):
+    """Test a swapped driver pair is served from the canonical artifact"""
+    import asyncio
+    from app.services import cache_service
+    
+    monkeypatch.setattr(cache_service, "_use_fallback", True)
+    # Canonical order is alphabetical: HAM before VER
+    canonical = dict(mock_telemetry_data)
+    canonical["driverA"], canonical["driverB"] = (
+        mock_telemetry_data["driverB"], mock_telemetry_data["driverA"]
+    )
+    cache_key = cache_service.telemetry_key(2024, "r1", "R", "HAM", "VER")
+    asyncio.run(cache_service.set_json(cache_key, canonical))
+    
+    response = client.post(
+        "/telemetry/compare",
+        json={"season": 2024, "event": "1", "session": "Race", "driverA": "VER", "driverB": "HAM"},
+    )
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert data["driverA"]["driver"] == "VER"
+    assert data["driverB"]["driver"] == "HAM"
+    assert [p["delta"] for p in data["delta"]] == [0, -0.05, -0.10]
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    """Route the storage service to a local filesystem backend"""
+    from app.config import settings
+    from app.services.storage_backends import LocalStorageBackend
+    from app.services.storage_service import storage_service
+    from app.services.cache_keys import CacheKeyResolver
+    
+    monkeypatch.setattr(storage_service, "backend", LocalStorageBackend(str(tmp_path)))
+    # Session start lookups for TTLs would hit the FastF1 schedule
+    monkeypatch.setattr(CacheKeyResolver, "_resolve_session_start", staticmethod(lambda *a: None))
+    # Exercise the per-pair artifacts; bundles are covered separately
+    monkeypatch.setattr(settings, "telemetry_bundles_enabled", False)
+    return storage_service
+
+
+def test_telemetry_compare_served_from_storage(client, local_storage, mock_telemetry_data):
+    """Test a comparison missing from the cache is loaded from storage"""
+    import asyncio
+    from unittest.mock import patch
+    from app.services import fastf1_service
+    
+    storage_key = local_storage.telemetry_key(2024, "r2", "R", "HAM", "VER")
+    canonical = dict(mock_telemetry_data)
+    canonical["driverA"], canonical["driverB"] = (
+        mock_telemetry_data["driverB"], mock_telemetry_data["driverA"]
+    )
+    asyncio.run(local_storage.upload_json(storage_key, canonical))
+    
+    with patch.object(fastf1_service, "get_telemetry_comparison") as compute:
+        response = client.post(
+            "/telemetry/compare",
+            json={"season": 2024, "event": "2", "session": "R", "driverA": "HAM", "driverB": "VER"},
+        )
+    
+    assert response.status_code == 200
+    assert response.json()["driverA"]["driver"] == "HAM"
+    compute.assert_not_called()
+
+
+def test_telemetry_compare_persists_to_storage(local_storage, mock_telemetry_data):
+    """Test a computed comparison is written to storage in the background"""
+    import asyncio
+    from unittest.mock import patch
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.models import TelemetryComparison
+    from app.services import fastf1_service
+    
+    with patch.object(
+        fastf1_service,
+        "get_telemetry_comparison",
+        return_value=TelemetryComparison(**mock_telemetry_data),
+    ):
+        # Lifespan shutdown flushes the write-behind queue
+        with TestClient(app) as client:
+            response = client.post(
+                "/telemetry/compare",
+                json={"season": 2024, "event": "3", "session": "R", "driverA": "HAM", "driverB": "VER"},
+            )
+            assert response.status_code == 200
+    
+    storage_key = local_storage.telemetry_key(2024, "r3", "R", "HAM", "VER")
+    stored = asyncio.run(local_storage.download_json(storage_key))
+    assert stored["driverA"]["driver"] == "VER"
+
+
+def test_telemetry_compare_derived_from_bundle(client, local_storage, telemetry_bundle, monkeypatch):
+    """Test a fastest-lap comparison is derived from the session bundle"""
+    from unittest.mock import patch
+    from app.config import settings
+    from app.services import fastf1_service
+    
+    monkeypatch.setattr(settings, "telemetry_bundles_enabled", True)
+    
+    with patch.object(fastf1_service, "get_session_bundle", return_value=telemetry_bundle) as build, \
+            patch.object(fastf1_service, "get_telemetry_comparison") as compute:
+        for driver_a, driver_b in (("VER", "HAM"), ("LEC", "VER")):
+            response = client.post(
+                "/telemetry/compare",
+                json={"season": 2024, "event": "4", "session": "R", "driverA": driver_a, "driverB": driver_b},
+            )
+            assert response.status_code == 200
+            assert response.json()["driverA"]["driver"] == driver_a
+    
+    # One bundle serves every pairing
+    build.assert_called_once()
+    compute.assert_not_called()
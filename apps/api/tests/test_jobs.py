@@ -0,0 +1,459 @@
+"""
+Tests for background jobs
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.concurrency import run_in_threadpool
+from unittest.mock import patch
+
+from app.services.admission import Overloaded
+from app.services.jobs import (
+    FAILED,
+    RUNNING,
+    SUCCEEDED,
+    InMemoryJobStore,
+    Job,
+    JobManager,
+    SharedJobStore,
+    job_id,
+)
+from app.utils.progress import report_progress, reporting
+
+
+def manager_with(handler, **kwargs):
+    """A manager whose "pace" handler caches results in `manager.results`"""
+    manager = JobManager(InMemoryJobStore(), **kwargs)
+    manager.results = {}
+
+    async def run(params, progress):
+        result = await handler(params, progress)
+        key = f"result:{len(manager.results)}"
+        manager.results[key] = result
+        return key
+
+    async def read(key, params):
+        return manager.results.get(key)
+
+    manager.register("pace", run, read)
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_job_runs_and_reports_result():
+    """Test a submitted job runs in the background and stores its result"""
+    seen = []
+
+    async def handler(params, progress):
+        await progress(0.5)
+        seen.append((await manager.get(job.id)).progress)
+        return {"drivers": params["drivers"]}
+
+    manager = manager_with(handler)
+    job = await manager.submit("pace", {"drivers": ["VER"]}, "2024:r1:R:VER")
+    assert job.status == "queued"
+    await manager.join()
+
+    done = await manager.get(job.id)
+    assert done.status == SUCCEEDED
+    assert done.progress == 1.0
+    assert done.result_key == "result:0"
+    assert await manager.result(done) == {"drivers": ["VER"]}
+    assert seen == [0.5]
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_progress_reported_from_worker_thread():
+    """Test blocking stages report job progress, which never moves backwards"""
+    seen = []
+    late = []
+
+    def compute():
+        report_progress(0.3)
+        report_progress(0.6)
+        report_progress(0.4)
+        return "done"
+
+    async def handler(params, progress):
+        late.append(progress)
+        with reporting(progress):
+            result = await run_in_threadpool(compute)
+        await asyncio.sleep(0.05)
+        seen.append((await manager.get(job.id)).progress)
+        return result
+
+    manager = manager_with(handler)
+    job = await manager.submit("pace", {}, "stages")
+    await manager.join()
+    # A report landing after the job finished leaves it alone
+    await late[0](0.2)
+
+    done = await manager.get(job.id)
+    assert seen == [0.6]
+    assert done.status == SUCCEEDED
+    assert done.progress == 1.0
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_identical_submissions_share_a_job():
+    """Test duplicate submissions return the same job and compute once"""
+    calls = []
+
+    async def handler(params, progress):
+        calls.append(params)
+        await asyncio.sleep(0.01)
+        return 1
+
+    manager = manager_with(handler)
+    jobs = await asyncio.gather(
+        *(manager.submit("pace", {"n": 1}, "same") for _ in range(3))
+    )
+    await manager.join()
+    again = await manager.submit("pace", {"n": 1}, "same")
+
+    assert len({job.id for job in jobs} | {again.id}) == 1
+    assert again.status == SUCCEEDED
+    assert len(calls) == 1
+    assert manager.stats()["deduplicated"] == 3
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_job_can_be_resubmitted():
+    """Test a failure is reported and a later submission runs again"""
+    attempts = []
+
+    async def handler(params, progress):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("session not available")
+        return "ok"
+
+    manager = manager_with(handler)
+    job = await manager.submit("pace", {}, "flaky")
+    await manager.join()
+    failed = await manager.get(job.id)
+    assert failed.status == FAILED
+    assert failed.error == "session not available"
+
+    await manager.submit("pace", {}, "flaky")
+    await manager.join()
+    assert await manager.result(await manager.get(job.id)) == "ok"
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_runs_again_once_its_result_expires():
+    """Test a succeeded job whose cached result has gone is computed again"""
+    calls = []
+
+    async def handler(params, progress):
+        calls.append(1)
+        return len(calls)
+
+    manager = manager_with(handler)
+    job = await manager.submit("pace", {}, "expiring")
+    await manager.join()
+    manager.results.clear()
+
+    rerun = await manager.submit("pace", {}, "expiring")
+    await manager.join()
+
+    assert rerun.id == job.id
+    assert len(calls) == 2
+    assert await manager.result(await manager.get(job.id)) == 2
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_lost_claim_returns_the_stored_job(monkeypatch):
+    """Test a submission that loses the claim waits for the winner's record"""
+    monkeypatch.setattr("app.services.jobs.CLAIM_WAIT_INTERVAL", 0.01)
+
+    async def handler(params, progress):
+        return 1
+
+    manager = manager_with(handler)
+    id_ = "pace-claimed"
+    monkeypatch.setattr("app.services.jobs.job_id", lambda kind, key: id_)
+    # Claimed by a concurrent submission that hasn't saved its record yet
+    await manager.store.claim(id_, 60)
+
+    async def save_later():
+        await asyncio.sleep(0.03)
+        await manager.store.save(Job(id_, "pace", {"n": 1}, progress=0.5), 60)
+
+    saver = asyncio.create_task(save_later())
+    job = await manager.submit("pace", {"n": 1}, "claimed")
+    await saver
+
+    assert job.progress == 0.5
+    assert await manager.store.get(id_) is not None
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_lost_claim_without_record_is_shed(monkeypatch):
+    """Test a claim whose record never appears is reported as busy"""
+    monkeypatch.setattr("app.services.jobs.CLAIM_WAIT_INTERVAL", 0)
+
+    async def handler(params, progress):
+        return 1
+
+    manager = manager_with(handler)
+    monkeypatch.setattr("app.services.jobs.job_id", lambda kind, key: "pace-orphan")
+    await manager.store.claim("pace-orphan", 60)
+
+    with pytest.raises(Overloaded):
+        await manager.submit("pace", {}, "orphan")
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_retries_when_shed():
+    """Test computations shed by admission control are retried, not failed"""
+    attempts = []
+
+    async def handler(params, progress):
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Overloaded("admission queue full", retry_after=0)
+        return "done"
+
+    manager = manager_with(handler)
+    job = await manager.submit("pace", {}, "busy")
+    await manager.join()
+
+    assert (await manager.get(job.id)).status == SUCCEEDED
+    assert manager.stats()["retried"] == 2
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_queue_bounded():
+    """Test submissions beyond the queue bound are shed"""
+    release = asyncio.Event()
+
+    async def handler(params, progress):
+        await release.wait()
+
+    manager = manager_with(handler, workers=1, max_queued=1)
+    await manager.submit("pace", {}, "a")
+    await asyncio.sleep(0)  # taken by the worker
+    await manager.submit("pace", {}, "b")
+    with pytest.raises(Overloaded):
+        await manager.submit("pace", {}, "c")
+
+    release.set()
+    await manager.join()
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_abandoned_job_can_be_resubmitted():
+    """Test a running job whose worker stopped refreshing it is reported failed and rerun"""
+    calls = []
+
+    async def handler(params, progress):
+        calls.append(1)
+        return "ok"
+
+    manager = manager_with(handler, lease=30)
+    id_ = job_id("pace", "orphaned")
+    # Left behind by a worker that exited mid-job; its lease has run out
+    await manager.store.save(Job(id_, "pace", {}, status=RUNNING, updated_at=time.time() - 60), 3600)
+
+    abandoned = await manager.get(id_)
+    assert abandoned.status == FAILED
+    assert "abandoned" in abandoned.error
+
+    job = await manager.submit("pace", {}, "orphaned")
+    await manager.join()
+    assert job.id == id_
+    assert calls == [1]
+    assert (await manager.get(id_)).status == SUCCEEDED
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_running_job_lease_is_renewed():
+    """Test a long job keeps its lease and fresh record while it runs"""
+    release = asyncio.Event()
+
+    async def handler(params, progress):
+        await release.wait()
+        return "ok"
+
+    manager = manager_with(handler, lease=1)
+    job = await manager.submit("pace", {}, "long")
+    await asyncio.sleep(1.5)
+
+    assert (await manager.get(job.id)).status == RUNNING
+    assert await manager.store.claim(job.id, 1) is False
+    again = await manager.submit("pace", {}, "long")
+    assert again.status == RUNNING
+    release.set()
+    await manager.join()
+    await manager.stop()
+
+
+class SlowClaimStore(InMemoryJobStore):
+    """A store whose claims take a round trip, like Redis"""
+
+    async def claim(self, job_id, ttl):
+        await asyncio.sleep(0.01)
+        return await super().claim(job_id, ttl)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_submissions_respect_queue_bound():
+    """Test submissions racing past the bound check are shed, not failed, and leave no claim"""
+    release = asyncio.Event()
+
+    async def handler(params, progress):
+        await release.wait()
+        return 1
+
+    manager = JobManager(SlowClaimStore(), workers=1, max_queued=2)
+    manager.register("pace", handler)
+    outcomes = await asyncio.gather(
+        *(manager.submit("pace", {}, f"job{n}") for n in range(6)),
+        return_exceptions=True,
+    )
+
+    shed = [n for n, outcome in enumerate(outcomes) if isinstance(outcome, Overloaded)]
+    assert len(shed) == 4
+    assert not [o for o in outcomes if isinstance(o, Exception) and not isinstance(o, Overloaded)]
+    release.set()
+    await manager.join()
+    # A shed submission holds no claim and runs when made again
+    retried = await manager.submit("pace", {}, f"job{shed[0]}")
+    await manager.join()
+    assert (await manager.get(retried.id)).status == SUCCEEDED
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_shared_job_store_shared_state():
+    """Test the cache-backed store round trips jobs and claims exclusively"""
+    store = SharedJobStore()
+    other_worker = SharedJobStore()
+
+    assert await store.claim("job-x", 60) is True
+    assert await other_worker.claim("job-x", 60) is False
+    assert await store.renew("job-x", 60) is True
+    assert await other_worker.renew("job-x", 60) is False
+    await store.save(Job("job-x", "pace", {"n": 1}, progress=0.25), 60)
+    assert (await other_worker.get("job-x")).progress == 0.25
+
+    await store.release("job-x")
+    assert await other_worker.claim("job-x", 60) is True
+    await other_worker.release("job-x")
+
+
+def test_race_pace_job_endpoint():
+    """Test a race pace job is accepted, then polled to its result"""
+    from app.main import app
+    from app.services import fastf1_service
+
+    pace = {"drivers": [], "totalLaps": 57, "safetyCarLaps": [], "vscLaps": []}
+    with patch.object(fastf1_service, "get_race_pace", return_value=pace) as compute, \
+            TestClient(app) as client:
+        body = {"season": 2023, "event": "1", "session": "R", "drivers": ["ver", "HAM"]}
+        response = client.post("/jobs/race-pace", json=body)
+        assert response.status_code == 202
+        job = response.json()
+        assert response.headers["Location"] == f"/jobs/{job['id']}"
+        # Same drivers in another order and case are the same job
+        duplicate = client.post("/jobs/race-pace", json={**body, "drivers": ["ham", "VER"]})
+        assert duplicate.json()["id"] == job["id"]
+
+        deadline = time.time() + 5
+        while job["status"] not in ("succeeded", "failed") and time.time() < deadline:
+            time.sleep(0.01)
+            job = client.get(f"/jobs/{job['id']}").json()
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["totalLaps"] == 57
+    compute.assert_called_once()
+
+
+def test_race_pace_job_reports_progress_while_running():
+    """Test progress reported by the FastF1 computation shows up in polls"""
+    from app.main import app
+    from app.services import fastf1_service
+
+    reported = threading.Event()
+    release = threading.Event()
+
+    def compute(*args):
+        report_progress(0.5)
+        reported.set()
+        release.wait(5)
+        return {"drivers": [], "totalLaps": 44, "safetyCarLaps": [], "vscLaps": []}
+
+    with patch.object(fastf1_service, "get_race_pace", side_effect=compute), \
+            TestClient(app) as client:
+        body = {"season": 2022, "event": "3", "session": "R", "drivers": ["LEC"]}
+        job = client.post("/jobs/race-pace", json=body).json()
+        assert reported.wait(5)
+        deadline = time.time() + 5
+        while job["progress"] < 0.5 and time.time() < deadline:
+            time.sleep(0.01)
+            job = client.get(f"/jobs/{job['id']}").json()
+        assert job["status"] == "running"
+        assert job["progress"] == 0.5
+        release.set()
+
+        while job["status"] not in ("succeeded", "failed") and time.time() < deadline:
+            time.sleep(0.01)
+            job = client.get(f"/jobs/{job['id']}").json()
+
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+
+
+def test_unknown_job_is_404(client):
+    """Test polling an unknown job id"""
+    response = client.get("/jobs/race-pace-missing")
+    assert response.status_code == 404
+
+
+def test_memory_store_404_explains_worker_scope(client, monkeypatch):
+    """Test a miss on the per-worker store says jobs need a shared cache"""
+    from app.services.jobs import job_manager
+
+    monkeypatch.setattr(job_manager, "store", InMemoryJobStore())
+    response = client.get("/jobs/race-pace-missing")
+
+    assert response.status_code == 404
+    assert "DISK_CACHE_DIR" in response.json()["detail"]
+
+
+def test_telemetry_job_reads_result_in_request_order(client, mock_telemetry_data, monkeypatch):
+    """Test a telemetry job's result is read from the canonical cached comparison"""
+    from app.services import cache_service
+
+    monkeypatch.setattr(cache_service, "_use_fallback", True)
+    canonical = dict(mock_telemetry_data)
+    canonical["driverA"], canonical["driverB"] = (
+        mock_telemetry_data["driverB"], mock_telemetry_data["driverA"]
+    )
+    asyncio.run(cache_service.set_json(cache_service.telemetry_key(2024, "r1", "R", "HAM", "VER"), canonical))
+
+    body = {"season": 2024, "event": "1", "session": "Race", "driverA": "VER", "driverB": "HAM"}
+    job = client.post("/jobs/telemetry", json=body).json()
+    deadline = time.time() + 5
+    while job["status"] not in ("succeeded", "failed") and time.time() < deadline:
+        time.sleep(0.01)
+        job = client.get(f"/jobs/{job['id']}").json()
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["driverA"]["driver"] == "VER"
+    assert job["result"]["driverB"]["driver"] == "HAM"
@@ -0,0 +1,108 @@
+"""
+Tests for cache metrics
+"""
+
+import pytest
+from unittest.mock import patch
+
+from app.services.cache_service import CacheService
+from app.services.metrics import CacheMetrics, Histogram, StageTimings
+
+
+def test_histogram_buckets():
+    """Test observations land in the first bucket that fits"""
+    histogram = Histogram((1, 10, 100))
+    for value in (0.5, 1, 5, 50, 500):
+        histogram.observe(value)
+    
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["buckets"] == {"1": 2, "10": 1, "100": 1, "+Inf": 1}
+
+
+def test_cache_metrics_hit_rate():
+    """Test hit rate is computed per namespace"""
+    metrics = CacheMetrics()
+    metrics.record_get("telemetry", True, 0.001, 5000)
+    metrics.record_get("telemetry", False, 0.002)
+    metrics.record_get("events", True, 0.0001, 100, l1=True)
+    
+    snapshot = metrics.snapshot()
+    assert snapshot["telemetry"]["hit_rate"] == 0.5
+    assert snapshot["events"]["l1_hits"] == 1
+    assert snapshot["telemetry"]["get_latency_seconds"]["count"] == 2
+
+
+def test_stage_timings():
+    """Test stage durations are recorded per stage"""
+    timings = StageTimings((0.5, 1.0))
+    timings.observe("load", 0.75)
+    with timings.time("delta"):
+        pass
+    
+    snapshot = timings.snapshot()
+    assert snapshot["load"]["buckets"] == {"0.5": 0, "1.0": 1, "+Inf": 0}
+    assert snapshot["delta"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_service_records_namespaces():
+    """Test the cache service records gets and sets by namespace"""
+    service = CacheService()
+    service._use_fallback = True
+    
+    await service.set_json(service.strategy_key(2024, "r1", "R"), {"stints": []})
+    await service.get_json(service.strategy_key(2024, "r1", "R"))
+    await service.get_json(service.positions_key(2024, "r1", "R"))
+    await service.incr_with_expiry("ratelimit:ip:x:1", 60)
+    
+    namespaces = service.metrics_snapshot()["namespaces"]
+    assert namespaces["strategy"]["hits"] == 1
+    assert namespaces["strategy"]["sets"] == 1
+    assert namespaces["positions"]["misses"] == 1
+    assert namespaces["ratelimit"]["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_counters_record_hits_and_latency():
+    """Test rate limit counters are timed and count existing windows as hits"""
+    service = CacheService()
+    service._use_fallback = True
+    
+    await service.incr_with_expiry("ratelimit:ip:x:1", 60)
+    await service.incr_with_expiry("ratelimit:ip:x:1", 60)
+    await service.sliding_window_hit("ratelimit:ip:y", 10, 60, now=120.0)
+    await service.sliding_window_hit("ratelimit:ip:y", 10, 60, now=121.0)
+    
+    ratelimit = service.metrics_snapshot()["namespaces"]["ratelimit"]
+    assert ratelimit["hits"] == 2
+    assert ratelimit["misses"] == 2
+    assert ratelimit["get_latency_seconds"]["count"] == 4
+
+
+def test_metrics_endpoint(client):
+    """Test the internal metrics endpoint exposes cache metrics"""
+    with patch("app.routers.metrics.settings.metrics_token", "secret"):
+        response = client.get("/internal/metrics", headers={"X-Metrics-Token": "secret"})
+    assert response.status_code == 200
+    
+    cache = response.json()["cache"]
+    assert "backend" in cache
+    assert "breaker" in cache
+    assert "namespaces" in cache
+
+
+def test_metrics_endpoint_token(client):
+    """Test the metrics endpoint enforces the configured token"""
+    with patch("app.routers.metrics.settings.metrics_token", "secret"):
+        assert client.get("/internal/metrics").status_code == 403
+        response = client.get("/internal/metrics", headers={"X-Metrics-Token": "secret"})
+        assert response.status_code == 200
+
+
+def test_metrics_endpoint_disabled_without_token(client):
+    """Test the metrics endpoint is closed when no token is configured"""
+    with patch("app.routers.metrics.settings.metrics_token", None):
+        assert client.get("/internal/metrics").status_code == 403
+        response = client.get("/internal/metrics", headers={"X-Metrics-Token": ""})
+        assert response.status_code == 403
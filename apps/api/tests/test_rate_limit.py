@@ -0,0 +1,79 @@
+"""
+Tests for rate limiting: local token buckets and the middleware
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from app.services.token_bucket import TokenBucketLimiter
+
+
+def test_token_bucket_allows_burst_then_rejects():
+    """Test a client gets `limit` requests at once, then must wait for a refill"""
+    buckets = TokenBucketLimiter()
+
+    assert [buckets.acquire("ip:1", 3, 60, now=0.0) for _ in range(3)] == [0.0] * 3
+    assert buckets.acquire("ip:1", 3, 60, now=0.0) == pytest.approx(20.0)
+    assert buckets.rejected == 1
+    # One token refills every 20s
+    assert buckets.acquire("ip:1", 3, 60, now=20.0) == 0.0
+    # Other clients have their own bucket
+    assert buckets.acquire("ip:2", 3, 60, now=0.0) == 0.0
+
+
+def test_token_bucket_bounded():
+    """Test the least recently seen clients are dropped past max_clients"""
+    buckets = TokenBucketLimiter(max_clients=2)
+    for client in ("a", "b", "a", "c"):
+        buckets.acquire(client, 10, 60, now=0.0)
+
+    assert len(buckets) == 2
+    assert "b" not in buckets._buckets
+
+
+def test_middleware_rejects_flood_without_redis():
+    """Test requests over the local bucket are rejected before the shared check"""
+    from app.main import app
+
+    hit = AsyncMock(return_value=(True, 1.0))
+    with patch("app.middleware.rate_limit.settings.rate_limit_requests", 2), \
+            patch("app.middleware.rate_limit.cache_service.sliding_window_hit", hit):
+        client = TestClient(app)
+        statuses = [
+            client.get("/seasons", headers={"X-Forwarded-For": "10.0.0.1"}).status_code
+            for _ in range(3)
+        ]
+
+    assert statuses == [200, 200, 429]
+    assert hit.await_count == 2
+
+
+def test_middleware_applies_shared_limit():
+    """Test the shared sliding-window result decides and sets headers"""
+    from app.main import app
+
+    hit = AsyncMock(return_value=(False, 100.0))
+    with patch("app.middleware.rate_limit.cache_service.sliding_window_hit", hit):
+        response = TestClient(app).get("/seasons", headers={"X-Forwarded-For": "10.0.0.2"})
+
+    assert response.status_code == 429
+    assert response.headers["X-RateLimit-Remaining"] == "0"
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_middleware_sets_headers_and_skips_exempt_paths():
+    """Test allowed responses carry the limit headers and health checks skip them"""
+    from app.main import app
+
+    hit = AsyncMock(return_value=(True, 5.0))
+    with patch("app.middleware.rate_limit.cache_service.sliding_window_hit", hit):
+        client = TestClient(app)
+        response = client.get("/seasons", headers={"X-Forwarded-For": "10.0.0.3"})
+        health = client.get("/health")
+
+    assert response.status_code == 200
+    assert response.headers["X-RateLimit-Limit"] == "100"
+    assert response.headers["X-RateLimit-Remaining"] == "95"
+    assert "X-RateLimit-Limit" not in health.headers
+    assert hit.await_count == 1
@@ -0,0 +1,161 @@
+"""
+Tests for telemetry bundles in shared memory
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from app.services.shared_bundles import SharedBundleRegistry
+
+
+@pytest.fixture
+def registries(tmp_path):
+    """Two registries over one directory, as two workers on a host"""
+    publisher = SharedBundleRegistry(str(tmp_path), max_segments=2)
+    reader = SharedBundleRegistry(str(tmp_path), max_segments=2)
+    yield publisher, reader
+    publisher.release()
+
+
+def registry_entries(path):
+    with open(os.path.join(str(path), "registry.json")) as f:
+        return json.load(f)
+
+
+def test_publish_and_attach_share_arrays(registries, telemetry_bundle):
+    """Test another worker maps the published arrays read-only with the same results"""
+    publisher, reader = registries
+    expected = telemetry_bundle.comparison("VER", "HAM", max_points=50)
+
+    shared = publisher.publish("2024:r1:R:fastest", telemetry_bundle, ttl=60)
+    mapped = reader.attach("2024:r1:R:fastest")
+
+    assert mapped.comparison("VER", "HAM", max_points=50) == expected
+    assert shared.comparison("VER", "HAM", max_points=50) == expected
+    assert mapped.fastest == telemetry_bundle.fastest
+    speed = mapped.lap("VER").channels["speed"]
+    assert not speed.flags.writeable
+    assert np.shares_memory(speed, mapped.lap("LEC").channels["speed"].base)
+    assert reader.attach("2024:r2:R:fastest") is None
+    assert publisher.stats()["published"] == 1
+    assert reader.stats()["attached"] == 1
+
+
+def test_expired_segments_are_unlinked(registries, telemetry_bundle, tmp_path):
+    """Test an expired bundle isn't attached and its segment is removed"""
+    publisher, reader = registries
+    publisher.publish("2024:r1:R:fastest", telemetry_bundle, ttl=-1)
+
+    assert reader.attach("2024:r1:R:fastest") is None
+    assert registry_entries(tmp_path) == {}
+    assert reader.stats()["unlinked"] == 1
+
+
+def test_eviction_keeps_existing_views_valid(registries, telemetry_bundle, tmp_path):
+    """Test evicting the oldest segment doesn't invalidate workers still mapping it"""
+    publisher, reader = registries
+    publisher.publish("2024:r1:R:fastest", telemetry_bundle, ttl=60)
+    mapped = reader.attach("2024:r1:R:fastest")
+    publisher.publish("2024:r2:R:fastest", telemetry_bundle, ttl=60)
+    publisher.publish("2024:r3:R:fastest", telemetry_bundle, ttl=60)
+
+    assert sorted(registry_entries(tmp_path)) == ["2024:r2:R:fastest", "2024:r3:R:fastest"]
+    assert reader.attach("2024:r1:R:fastest") is None
+    assert mapped.lap("VER").channels["speed"][0] == pytest.approx(200.0)
+
+
+def test_release_unlinks_unreferenced_segments(registries, telemetry_bundle, tmp_path):
+    """Test a segment is removed once no worker references it"""
+    publisher, _ = registries
+    publisher.publish("2024:r1:R:fastest", telemetry_bundle, ttl=60)
+
+    publisher.release()
+
+    assert registry_entries(tmp_path) == {}
+
+
+def test_segment_survives_another_process_exiting(registries, telemetry_bundle, tmp_path):
+    """Test a worker that maps a segment and exits doesn't unlink it for the others"""
+    publisher, reader = registries
+    publisher.publish("2024:r1:R:fastest", telemetry_bundle, ttl=60)
+    script = (
+        "from app.services.shared_bundles import SharedBundleRegistry\n"
+        f"bundle = SharedBundleRegistry({str(tmp_path)!r}).attach('2024:r1:R:fastest')\n"
+        "print(bundle.lap('HAM').lap_number)\n"
+    )
+
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, timeout=60
+    )
+
+    assert result.stdout.strip() == "11", result.stderr
+    assert "leaked" not in result.stderr
+    mapped = reader.attach("2024:r1:R:fastest")
+    assert mapped is not None
+    assert mapped.lap("HAM").channels["speed"][0] == pytest.approx(190.0)
+
+
+@pytest.mark.asyncio
+async def test_store_maps_bundle_built_by_another_worker(monkeypatch, tmp_path, telemetry_bundle):
+    """Test a worker's bundle store attaches a shared bundle instead of building it"""
+    from app.config import settings
+    from app.services import shared_bundles as shared_module
+    from app.services.telemetry_bundle import TelemetryBundleStore
+
+    monkeypatch.setattr(settings, "shared_bundles_enabled", True)
+    registry = SharedBundleRegistry(str(tmp_path))
+    monkeypatch.setattr(shared_module, "shared_bundles", registry)
+    builds = []
+
+    async def build():
+        builds.append(1)
+        return telemetry_bundle
+
+    first = await TelemetryBundleStore().get("2024:r1:R:fastest", "unused", build, 60)
+    second = await TelemetryBundleStore().get("2024:r1:R:fastest", "unused", build, 60)
+
+    assert builds == [1]
+    assert second.comparison("VER", "LEC") == first.comparison("VER", "LEC")
+    assert registry.stats() == {"published": 1, "attached": 1, "unlinked": 0}
+    registry.release()
+
+
+@pytest.mark.asyncio
+async def test_store_eviction_drops_shared_reference(monkeypatch, tmp_path, telemetry_bundle):
+    """Test a bundle evicted from the worker's LRU no longer holds its segment"""
+    from app.config import settings
+    from app.services import shared_bundles as shared_module
+    from app.services.telemetry_bundle import TelemetryBundleStore
+
+    monkeypatch.setattr(settings, "shared_bundles_enabled", True)
+    registry = SharedBundleRegistry(str(tmp_path))
+    monkeypatch.setattr(shared_module, "shared_bundles", registry)
+
+    async def build():
+        return telemetry_bundle
+
+    store = TelemetryBundleStore(max_entries=1)
+    first = await store.get("2024:r1:R:fastest", "unused", build, 60)
+    assert first.segment is not None
+    await store.get("2024:r2:R:fastest", "unused", build, 60)
+
+    assert sorted(registry_entries(tmp_path)) == ["2024:r2:R:fastest"]
+    assert registry.stats()["unlinked"] == 1
+    # Requests still holding the evicted bundle keep valid views
+    assert first.lap("VER").channels["speed"][0] == pytest.approx(200.0)
+    registry.release()
+
+
+def test_detach_ignores_republished_segment(registries, telemetry_bundle, tmp_path):
+    """Test detaching an old segment doesn't drop the reference to its replacement"""
+    publisher, _ = registries
+    publisher.publish("2024:r1:R:fastest", telemetry_bundle, ttl=60)
+
+    publisher.detach("2024:r1:R:fastest", "pitlane_stale")
+
+    assert registry_entries(tmp_path)["2024:r1:R:fastest"]["refs"] == [os.getpid()]
@@ -0,0 +1,208 @@
+"""
+Tests for artifact storage: the Supabase backend against a local Storage
+API stand-in, and the local filesystem backend
+"""
+
+import asyncio
+import mmap
+import os
+
+import httpx
+import pytest
+from unittest.mock import patch
+
+from app.services.storage_backends import LocalStorageBackend, StorageError, SupabaseStorageBackend
+from app.services.storage_service import StorageService
+
+
+class FakeStorageAPI:
+    """In-memory stand-in for the Supabase Storage object endpoints"""
+
+    def __init__(self, delay: float = 0.0):
+        self.objects = {}
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            return self._handle(request)
+        finally:
+            self.in_flight -= 1
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.removeprefix("/storage/v1/object/")
+        if request.headers.get("authorization") != "Bearer service-key":
+            return httpx.Response(401)
+        if request.method == "POST" and not path.startswith("list/"):
+            if path in self.objects and request.headers.get("x-upsert") != "true":
+                return httpx.Response(409, json={"error": "Duplicate"})
+            self.objects[path] = request.content
+            return httpx.Response(200, json={"Key": path})
+        if request.method == "GET":
+            if path not in self.objects:
+                return httpx.Response(400, json={"error": "not_found", "message": "Object not found"})
+            return httpx.Response(200, content=self.objects[path])
+        return httpx.Response(405)
+
+
+@pytest.fixture
+def storage_api():
+    return FakeStorageAPI()
+
+
+@pytest.fixture
+def storage(storage_api):
+    """Storage service wired to the stand-in"""
+    with patch("app.services.storage_backends.settings.supabase_url", "https://project.supabase.co"), \
+            patch("app.services.storage_backends.settings.supabase_service_key", "service-key"):
+        yield StorageService(SupabaseStorageBackend(transport=httpx.MockTransport(storage_api)))
+
+
+def objects(storage_api):
+    return {k: v for k, v in storage_api.objects.items() if k.startswith("telemetry/objects/")}
+
+
+@pytest.mark.asyncio
+async def test_storage_round_trip(storage, storage_api):
+    """Test gzipped JSON survives upload and download through the manifest"""
+    data = {"driverA": {"driver": "VER"}, "delta": [1, 2, 3]}
+
+    assert await storage.upload_json("2024/r8/Q/HAM_VER_rt.json.gz", data) is True
+    assert await storage.download_json("2024/r8/Q/HAM_VER_rt.json.gz") == data
+
+    (object_key, stored), = objects(storage_api).items()
+    assert stored[:2] == b"\x1f\x8b"
+    manifest = storage_api.objects["telemetry/manifests/2024/r8/Q/HAM_VER_rt.json.gz"]
+    assert "telemetry/" + manifest.decode() == object_key
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_storage_identical_payloads_stored_once(storage, storage_api):
+    """Test equal payloads share one immutable object and unchanged rewrites are free"""
+    await storage.upload_json("dedupe/a.json.gz", {"v": 1, "w": 2})
+    await storage.upload_json("dedupe/b.json.gz", {"w": 2, "v": 1})
+    assert len(objects(storage_api)) == 1
+
+    object_upload = next(
+        r for r in storage_api.requests if "/objects/" in r.url.path
+    )
+    assert "x-upsert" not in object_upload.headers
+    assert "immutable" in object_upload.headers["cache-control"]
+
+    requests_before = len(storage_api.requests)
+    assert await storage.upload_json("dedupe/a.json.gz", {"v": 1, "w": 2}) is True
+    assert len(storage_api.requests) == requests_before
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_storage_changed_payload_repoints_manifest(storage, storage_api):
+    """Test a new payload for a key is a new object and the key follows it"""
+    await storage.upload_json("changed.json.gz", {"v": 1})
+    await storage.upload_json("changed.json.gz", {"v": 2})
+
+    assert len(objects(storage_api)) == 2
+    assert await storage.download_json("changed.json.gz") == {"v": 2}
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_storage_reads_legacy_objects(storage, storage_api):
+    """Test artifacts stored at their logical key before content addressing still load"""
+    storage_api.objects["telemetry/legacy/VER_HAM.json.gz"] = StorageService._encode({"v": 0}, True)
+
+    assert await storage.download_json("legacy/VER_HAM.json.gz") == {"v": 0}
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_storage_missing_object(storage):
+    """Test a missing object downloads as None"""
+    assert await storage.download_json("missing.json.gz") is None
+    assert await storage.exists("missing.json.gz") is False
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_storage_limits_concurrency():
+    """Test requests beyond the concurrency limit wait for a slot"""
+    api = FakeStorageAPI(delay=0.01)
+    with patch("app.services.storage_backends.settings.supabase_url", "https://project.supabase.co"), \
+            patch("app.services.storage_backends.settings.supabase_service_key", "service-key"), \
+            patch("app.services.storage_backends.settings.storage_max_concurrency", 3):
+        storage = StorageService(SupabaseStorageBackend(transport=httpx.MockTransport(api)))
+        results = await asyncio.gather(
+            *(storage.upload_json(f"obj{i}.json.gz", {"i": i}) for i in range(10))
+        )
+
+    assert all(results)
+    assert api.max_in_flight == 3
+    await storage.close()
+
+
+@pytest.mark.asyncio
+async def test_storage_disabled_without_credentials():
+    """Test storage is a no-op when Supabase isn't configured"""
+    with patch("app.services.storage_backends.settings.supabase_url", None):
+        storage = StorageService(SupabaseStorageBackend())
+        assert storage.is_enabled is False
+        assert await storage.upload_json("key", {}) is False
+        assert await storage.download_json("key") is None
+
+
+@pytest.mark.asyncio
+async def test_local_backend_round_trip(tmp_path):
+    """Test the filesystem backend stores sharded objects and a manifest"""
+    storage = StorageService(LocalStorageBackend(str(tmp_path)))
+    data = {"driverA": {"driver": "LEC"}, "delta": [0.1, 0.2]}
+
+    assert await storage.upload_json("2024/r9/Q/LEC_SAI_local.json.gz", data) is True
+    assert await storage.download_json("2024/r9/Q/LEC_SAI_local.json.gz") == data
+
+    object_key = await storage.resolve("2024/r9/Q/LEC_SAI_local.json.gz")
+    digest = object_key.rsplit("/", 1)[1].split(".")[0]
+    assert os.path.isfile(tmp_path / "objects" / digest[:2] / f"{digest}.json.gz")
+    # No temporary files left behind
+    assert not [f for _, _, files in os.walk(tmp_path) for f in files if f.startswith(".tmp-")]
+
+
+@pytest.mark.asyncio
+async def test_local_backend_keeps_existing_objects(tmp_path):
+    """Test writes without overwrite leave an existing object untouched"""
+    backend = LocalStorageBackend(str(tmp_path))
+    await backend.put("objects/ab/abc.json", b"first", "application/json", overwrite=False)
+    await backend.put("objects/ab/abc.json", b"second", "application/json", overwrite=False)
+
+    assert await backend.get("objects/ab/abc.json") == b"first"
+    await backend.delete("objects/ab/abc.json")
+    assert await backend.get("objects/ab/abc.json") is None
+
+
+@pytest.mark.asyncio
+async def test_local_backend_mmap_reads(tmp_path):
+    """Test mmap mode stores artifacts uncompressed and maps them on read"""
+    backend = LocalStorageBackend(str(tmp_path), use_mmap=True)
+    storage = StorageService(backend)
+
+    await storage.upload_json("mmap/VER_PER.json.gz", {"v": [1, 2, 3]})
+    object_key = await storage.resolve("mmap/VER_PER.json.gz")
+
+    assert object_key.endswith(".json")
+    assert isinstance(await backend.get(object_key), mmap.mmap)
+    assert await storage.download_json("mmap/VER_PER.json.gz") == {"v": [1, 2, 3]}
+
+
+@pytest.mark.asyncio
+async def test_local_backend_rejects_escaping_paths(tmp_path):
+    """Test object paths can't escape the storage root"""
+    backend = LocalStorageBackend(str(tmp_path / "root"))
+    with pytest.raises(StorageError):
+        await backend.get("../outside.json")
@@ -0,0 +1,134 @@
+"""
+Tests for session telemetry bundles
+"""
+
+import numpy as np
+import pytest
+
+from app.models import TelemetryComparison
+from app.services.telemetry_bundle import TelemetryBundle, TelemetryBundleStore, resample_lap
+from tests.conftest import make_lap_telemetry
+
+
+def test_resample_lap_grid_and_hold_channels():
+    """Test channels land on the distance grid and discrete ones are held"""
+    channels = resample_lap(make_lap_telemetry(180.0, length=100.0, step=10.0), grid_step=5.0)
+
+    assert len(channels["speed"]) == 21
+    assert np.allclose(channels["time"][2], 10.0 / 50.0)
+    # Gear changes at 50 m: 45 m still holds the last reported gear
+    assert channels["gear"][9] == 7
+    assert channels["gear"][10] == 4
+    assert set(np.unique(channels["gear"])) == {4, 7}
+    assert set(np.unique(channels["brake"])) == {0.0, 1.0}
+
+
+def test_bundle_comparison_shape_and_delta(telemetry_bundle):
+    """Test a pair is derived with the TelemetryComparison shape"""
+    comparison = telemetry_bundle.comparison("VER", "HAM", max_points=50)
+
+    model = TelemetryComparison(**comparison)
+    assert model.driver_a.driver == "VER"
+    assert model.driver_a.lap_number == 10
+    assert len(model.driver_a.data) == 50
+    assert model.sectors_a.sector1 == 30.0
+    # VER is faster, so the delta grows more negative over the lap
+    assert comparison["delta"][0]["delta"] == pytest.approx(0.0)
+    assert comparison["delta"][-1]["delta"] < -0.5
+
+
+def test_bundle_missing_lap(telemetry_bundle):
+    """Test a driver or lap that isn't in the bundle yields None"""
+    assert telemetry_bundle.comparison("VER", "NOR") is None
+    assert telemetry_bundle.comparison("VER", "HAM", lap_b=3) is None
+    assert telemetry_bundle.comparison("VER", "HAM", lap_b=11) is not None
+
+
+def test_bundle_payload_round_trip(telemetry_bundle):
+    """Test a bundle survives serialization through the packed codec"""
+    restored = TelemetryBundle.from_payload(telemetry_bundle.to_payload())
+
+    assert restored.fastest == telemetry_bundle.fastest
+    original = telemetry_bundle.lap("LEC")
+    lap = restored.lap("LEC")
+    assert lap.lap_time == original.lap_time
+    assert np.allclose(lap.channels["speed"], original.channels["speed"])
+    assert np.array_equal(lap.channels["gear"], original.channels["gear"])
+    assert restored.comparison("HAM", "LEC")["driverB"]["driver"] == "LEC"
+
+
+def test_bundle_payload_rejects_unknown_encoding():
+    """Test payloads in another format are rejected"""
+    with pytest.raises(ValueError):
+        TelemetryBundle.from_payload({"encoding": "bundle-v0"})
+
+
+@pytest.mark.asyncio
+async def test_bundle_store_builds_once(telemetry_bundle):
+    """Test concurrent and repeat requests share one build"""
+    import asyncio
+
+    calls = []
+
+    async def build():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return telemetry_bundle
+
+    store = TelemetryBundleStore(max_entries=2)
+    bundles = await asyncio.gather(
+        *(store.get("2024:r1:R:fastest", "2024/r1/R/bundle.json.gz", build, 60) for _ in range(5))
+    )
+
+    assert all(b is telemetry_bundle for b in bundles)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_bundle_store_keeps_lock_while_awaited(telemetry_bundle):
+    """Test a request arriving after a failed build waits instead of building alongside"""
+    import asyncio
+
+    calls = []
+    running = []
+
+    async def build():
+        calls.append(1)
+        running.append(1)
+        assert len(running) == 1, "built concurrently"
+        await asyncio.sleep(0.01)
+        running.pop()
+        if len(calls) == 1:
+            raise RuntimeError("storage unavailable")
+        return telemetry_bundle
+
+    store = TelemetryBundleStore()
+    get = lambda: store.get("2024:r1:R:fastest", "2024/r1/R/bundle.json.gz", build, 60)
+    first = asyncio.create_task(get())
+    second = asyncio.create_task(get())
+    with pytest.raises(RuntimeError):
+        await first
+    third = asyncio.create_task(get())
+
+    assert await second is telemetry_bundle
+    assert await third is telemetry_bundle
+    assert len(calls) == 2
+    assert store._locks == {}
+
+
+@pytest.mark.asyncio
+async def test_bundle_store_bounds_bundle_count(telemetry_bundle):
+    """Test the least recently used bundle is dropped past max_entries"""
+    calls = []
+
+    async def build():
+        calls.append(1)
+        return telemetry_bundle
+
+    store = TelemetryBundleStore(max_entries=2)
+    for key in ("r1", "r2", "r1", "r3", "r1", "r2"):
+        await store.get(key, f"{key}/bundle.json.gz", build, 60)
+
+    # r2 was least recently used when r3 arrived
+    assert len(calls) == 4
+    assert list(store._bundles) == ["r1", "r2"]
@@ -0,0 +1,167 @@
+"""
+Tests for the compact telemetry encoding
+"""
+
+import json
+import math
+import random
+
+import pytest
+
+from app.models import TelemetryComparison
+from app.utils.telemetry_codec import (
+    COMPACT_FORMAT,
+    encode_comparison,
+    decode_comparison,
+    encode_points,
+    decode_points,
+    encode_delta,
+    decode_delta,
+    is_compact,
+)
+
+
+def _realistic_points(n=1000, seed=1):
+    """Generate telemetry points shaped like FastF1 lap data"""
+    rng = random.Random(seed)
+    points = []
+    distance = 0.0
+    for i in range(n):
+        distance += rng.uniform(3.0, 8.0)
+        points.append({
+            "distance": distance,
+            "speed": round(rng.uniform(80, 330), 1),
+            "throttle": float(rng.choice([0, 25, 60, 99, 100, 104])),
+            "brake": float(rng.random() < 0.2),
+            "gear": rng.randint(1, 8),
+            "rpm": float(rng.randint(9000, 12500)),
+            "drs": rng.choice([0, 1, 8, 10, 12, 14]),
+        })
+    return points
+
+
+def _comparison(n=1000):
+    data_a = _realistic_points(n, seed=1)
+    data_b = _realistic_points(n, seed=2)
+    return TelemetryComparison(
+        driverA={"driver": "VER", "lapNumber": 12, "lapTime": 90.123, "data": data_a},
+        driverB={"driver": "HAM", "lapNumber": 14, "lapTime": 90.456, "data": data_b},
+        delta=[{"distance": i * 5.321, "delta": math.sin(i / 50) * 0.4} for i in range(n)],
+        sectorsA={"sector1": 28.1, "sector2": 31.2, "sector3": 30.8},
+        sectorsB={"sector1": 28.3, "sector2": 31.0, "sector3": 31.1},
+    ).model_dump(by_alias=True)
+
+
+def _assert_points_equal(original, decoded):
+    assert len(original) == len(decoded)
+    for a, b in zip(original, decoded):
+        assert b["distance"] == pytest.approx(a["distance"], abs=1e-3)
+        assert b["speed"] == pytest.approx(a["speed"], abs=1e-3)
+        assert b["throttle"] == a["throttle"]
+        assert b["brake"] == a["brake"]
+        assert b["gear"] == a["gear"]
+        assert b["rpm"] == a["rpm"]
+        assert b["drs"] == a["drs"]
+
+
+def test_points_round_trip():
+    """Test points survive encode/decode to source precision"""
+    points = _realistic_points()
+    _assert_points_equal(points, decode_points(encode_points(points)))
+
+
+def test_delta_encoded_distance_does_not_drift():
+    """Test distances rebuilt from differences stay exact to the mm along a long lap"""
+    distances = [i * 3.3337 + 0.0004 * (i % 7) for i in range(20000)]
+    encoded = encode_delta([{"distance": d, "delta": 0.0} for d in distances])
+    decoded = [p["distance"] for p in decode_delta(encoded)]
+    
+    assert max(abs(a - b) for a, b in zip(distances, decoded)) <= 0.0005 + 1e-9
+
+
+def test_points_use_compact_dtypes():
+    """Test channels pick the narrowest lossless dtype"""
+    channels = encode_points(_realistic_points())["channels"]
+    assert channels["distance"]["dtype"] == "i4d"
+    assert channels["speed"]["dtype"] == "f4"
+    assert channels["throttle"]["dtype"] == "u1"
+    assert channels["brake"]["dtype"] == "bits"
+    assert channels["gear"]["dtype"] == "u1"
+    assert channels["drs"]["dtype"] == "u1"
+
+
+def test_points_optional_channels_null():
+    """Test missing rpm/drs decode back to None"""
+    points = [
+        {"distance": 0.0, "speed": 0.0, "throttle": 0.0, "brake": 0.0, "gear": 1, "rpm": None, "drs": None},
+        {"distance": 10.5, "speed": 50.0, "throttle": 100.0, "brake": 0.0, "gear": 2, "rpm": None, "drs": None},
+    ]
+    encoded = encode_points(points)
+    assert "rpm" not in encoded["channels"]
+    assert "drs" not in encoded["channels"]
+    _assert_points_equal(points, decode_points(encoded))
+
+
+def test_points_partial_nulls():
+    """Test channels with some missing values keep their nulls"""
+    points = _realistic_points(20)
+    points[3]["rpm"] = None
+    points[7]["drs"] = None
+    _assert_points_equal(points, decode_points(encode_points(points)))
+
+
+def test_points_fallback_for_non_integral_values():
+    """Test non-integral throttle/brake fall back to floats losslessly"""
+    points = _realistic_points(50)
+    points[5]["throttle"] = 42.5
+    points[6]["brake"] = 0.75
+    encoded = encode_points(points)
+    assert encoded["channels"]["throttle"]["dtype"] == "f4"
+    assert encoded["channels"]["brake"]["dtype"] == "f4"
+    _assert_points_equal(points, decode_points(encoded))
+
+
+def test_empty_points():
+    """Test an empty trace round-trips"""
+    assert decode_points(encode_points([])) == []
+
+
+def test_comparison_round_trip():
+    """Test a full comparison is equivalent after decoding"""
+    original = _comparison()
+    encoded = encode_comparison(original)
+    assert is_compact(encoded)
+    assert encoded["encoding"] == COMPACT_FORMAT
+
+    decoded = decode_comparison(encoded)
+    assert not is_compact(decoded)
+
+    for side in ("driverA", "driverB"):
+        assert decoded[side]["driver"] == original[side]["driver"]
+        assert decoded[side]["lapNumber"] == original[side]["lapNumber"]
+        assert decoded[side]["lapTime"] == original[side]["lapTime"]
+        _assert_points_equal(original[side]["data"], decoded[side]["data"])
+
+    for a, b in zip(original["delta"], decoded["delta"]):
+        assert b["distance"] == pytest.approx(a["distance"], abs=1e-3)
+        assert b["delta"] == pytest.approx(a["delta"], abs=1e-3)
+
+    assert decoded["sectorsA"] == original["sectorsA"]
+    assert decoded["sectorsB"] == original["sectorsB"]
+
+    # Decoded payload validates as a response model
+    TelemetryComparison(**decoded)
+
+
+def test_comparison_is_much_smaller():
+    """Test the compact encoding shrinks serialized size substantially"""
+    original = _comparison()
+    plain_size = len(json.dumps(original))
+    compact_size = len(json.dumps(encode_comparison(original)))
+    assert compact_size * 4 < plain_size
+
+
+def test_decode_passes_through_plain_payload():
+    """Test decoding a non-compact payload is a no-op"""
+    original = _comparison(10)
+    assert decode_comparison(original) is original
@@ -0,0 +1,172 @@
+"""
+Tests for direct FastF1 telemetry comparisons
+"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+
+from app.services.fastf1_service import FastF1Service, telemetry_stages
+from app.utils.cancellation import CancelToken, OperationCancelled, _current_token, current_token
+from tests.conftest import make_lap_telemetry
+
+
+class FakeLap(dict):
+    """A lap row that records which thread fetched its telemetry"""
+
+    def __init__(self, number, speed, threads):
+        super().__init__(
+            LapNumber=number,
+            LapTime=pd.Timedelta(seconds=90),
+            Sector1Time=pd.Timedelta(seconds=30),
+            Sector2Time=pd.Timedelta(seconds=31),
+            Sector3Time=pd.NaT,
+        )
+        self.speed = speed
+        self.threads = threads
+
+    def get_telemetry(self):
+        self.threads.append(threading.current_thread().name)
+        return make_lap_telemetry(self.speed, length=2000.0, step=1.0)
+
+
+class FakeLaps:
+    def __init__(self, lap):
+        self.lap = lap
+
+    def pick_fastest(self):
+        return self.lap
+
+
+class FakeSession:
+    def __init__(self):
+        self.threads = []
+        self.speeds = {"VER": 200.0, "HAM": 190.0}
+
+    def load(self, **kwargs):
+        pass
+
+    @property
+    def laps(self):
+        session = self
+
+        class Laps:
+            def pick_driver(self, driver):
+                return FakeLaps(FakeLap(10, session.speeds[driver], session.threads))
+
+        return Laps()
+
+
+def compare(service, session, **kwargs):
+    with patch("fastf1.get_session", return_value=session):
+        return service.get_telemetry_comparison(2024, "1", "R", "VER", "HAM", **kwargs)
+
+
+def test_comparison_runs_drivers_alongside_and_delta_once():
+    """Test driver B's half runs on the driver pool and the delta is computed once"""
+    service = FastF1Service()
+    session = FakeSession()
+
+    with patch.object(service, "_calculate_delta", wraps=service._calculate_delta) as delta:
+        comparison = compare(service, session, max_points=100)
+
+    delta.assert_called_once()
+    assert len(session.threads) == 2
+    assert any(name.startswith("telemetry-driver") for name in session.threads)
+    assert comparison.driver_a.driver == "VER"
+    assert len(comparison.driver_b.data) == 100
+    assert comparison.sectors_a.sector2 == 31.0
+    assert comparison.sectors_b.sector3 is None
+    assert len(comparison.delta) == 100
+    # VER is faster, so the delta grows more negative over the lap
+    assert comparison.delta[0].delta == pytest.approx(0.0)
+    assert comparison.delta[-1].delta < -0.5
+
+
+def test_comparison_records_stage_timings():
+    """Test each stage of a comparison is timed"""
+    before = {stage: data["count"] for stage, data in telemetry_stages.snapshot().items()}
+
+    compare(FastF1Service(), FakeSession())
+
+    after = telemetry_stages.snapshot()
+    counts = {stage: after[stage]["count"] - before.get(stage, 0) for stage in after}
+    assert counts == {"total": 1, "load": 1, "laps": 1, "telemetry": 2, "process": 2, "delta": 1}
+
+
+def test_cancellation_reaches_driver_threads():
+    """Test the pooled driver's pipeline runs under the request's cancellation token"""
+    service = FastF1Service()
+    session = FakeSession()
+    token = CancelToken()
+    seen = []
+    reset = _current_token.set(token)
+    try:
+        with patch.object(FakeLap, "get_telemetry", autospec=True,
+                          side_effect=lambda lap: seen.append(current_token()) or token.cancel()):
+            with pytest.raises(OperationCancelled):
+                compare(service, session)
+    finally:
+        _current_token.reset(reset)
+
+    assert seen == [token, token]
+
+
+def test_failed_driver_waits_for_other_driver():
+    """Test a failure in driver A's half doesn't leave driver B's running"""
+    service = FastF1Service()
+    session = FakeSession()
+    b_started = threading.Event()
+    b_finished = []
+
+    def get_telemetry(lap):
+        if lap.speed == session.speeds["VER"]:
+            assert b_started.wait(timeout=2)
+            raise OperationCancelled("client disconnected")
+        b_started.set()
+        time.sleep(0.05)
+        b_finished.append(threading.current_thread().name)
+        return make_lap_telemetry(lap.speed, length=2000.0, step=1.0)
+
+    with patch.object(FakeLap, "get_telemetry", autospec=True, side_effect=get_telemetry):
+        with pytest.raises(OperationCancelled):
+            compare(service, session)
+
+    assert len(b_finished) == 1
+    service.shutdown()
+
+
+def test_shutdown_stops_driver_pool():
+    """Test shutdown stops the driver threads and a later comparison starts a new pool"""
+    service = FastF1Service()
+    compare(service, FakeSession())
+    pool = service._driver_pool
+
+    service.shutdown()
+
+    assert pool._shutdown
+    assert service._driver_pool is None
+    assert compare(service, FakeSession()).driver_a.driver == "VER"
+    service.shutdown()
+
+
+def test_process_telemetry_missing_samples():
+    """Test NaN RPM and DRS samples become None and missing columns default"""
+    telemetry = make_lap_telemetry(200.0, length=40.0, step=10.0)
+    telemetry.loc[1, "RPM"] = np.nan
+    telemetry.loc[2, "DRS"] = np.nan
+    telemetry = telemetry.drop(columns=["Throttle"])
+
+    lap = FastF1Service()._process_telemetry(telemetry, "VER", 10, 90.0, 1000)
+
+    assert [point.distance for point in lap.data] == [0.0, 10.0, 20.0, 30.0, 40.0]
+    assert lap.data[1].rpm is None
+    assert lap.data[2].drs is None
+    assert lap.data[0].drs == 12
+    assert lap.data[0].throttle == 0.0
+    assert lap.data[4].brake == 1.0
+    assert lap.data[0].gear == 7
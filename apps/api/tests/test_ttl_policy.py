@@ -0,0 +1,89 @@
+"""
+Tests for the data-aware TTL policy
+"""
+
+import calendar
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.config import settings
+from app.services.cache_keys import CacheKeyResolver
+from app.services.ttl_policy import (
+    CURRENT_SEASON,
+    HISTORICAL,
+    LIVE,
+    RECENT,
+    UPCOMING,
+    TtlPolicy,
+    classify_session,
+    decision_for,
+)
+
+
+START = 1_700_000_000.0
+
+
+def test_classify_session_lifecycle():
+    """Test sessions move from upcoming to live to recent to historical"""
+    assert classify_session(START, "R", now=START - 60) == UPCOMING
+    assert classify_session(START, "R", now=START + 3600) == LIVE
+    assert classify_session(START, "Q", now=START + 2 * 3600) == RECENT
+    assert classify_session(START, "Race", now=START + 30 * 86400) == HISTORICAL
+
+
+def test_classify_session_unknown_start_is_recent():
+    """Test sessions without a known start are neither pinned nor live"""
+    assert classify_session(None, "R") == RECENT
+
+
+def test_decisions_by_lifecycle():
+    """Test historical data is pinned and live data expires quickly"""
+    historical = decision_for(HISTORICAL)
+    assert historical.ttl == historical.soft_ttl == settings.cache_ttl_historical_seconds
+
+    recent = decision_for(RECENT)
+    assert recent.ttl == settings.cache_ttl_recent_seconds
+    assert recent.soft_ttl < recent.ttl
+
+    live = decision_for(LIVE)
+    assert live.ttl == settings.cache_ttl_live_seconds
+    assert live.ttl < recent.ttl < historical.ttl
+
+
+def test_schedule_policy():
+    """Test past seasons are pinned and the current season refreshes daily"""
+    policy = TtlPolicy()
+    now = calendar.timegm((2026, 6, 1, 0, 0, 0))
+
+    assert policy.for_schedule(2019, now=now).lifecycle == HISTORICAL
+
+    current = policy.for_schedule(2026, now=now)
+    assert current.lifecycle == CURRENT_SEASON
+    assert current.soft_ttl == settings.cache_schedule_refresh_seconds
+
+
+@pytest.mark.asyncio
+async def test_for_session_uses_session_start():
+    """Test session TTLs follow the scheduled start"""
+    policy = TtlPolicy()
+    with patch(
+        "app.services.ttl_policy.cache_keys.session_start",
+        AsyncMock(return_value=START),
+    ):
+        decision = await policy.for_session(2023, "Abu Dhabi", "R")
+    assert decision.lifecycle == HISTORICAL
+
+
+@pytest.mark.asyncio
+async def test_session_start_looked_up_once():
+    """Test session starts are resolved through FastF1 once and cached"""
+    resolver = CacheKeyResolver()
+
+    with patch.object(
+        CacheKeyResolver, "_resolve_session_start", return_value=START
+    ) as resolve:
+        assert await resolver.session_start(2031, "7", "Race") == START
+        assert await resolver.session_start(2031, "7", "R") == START
+
+    resolve.assert_called_once_with(2031, "7", "R")
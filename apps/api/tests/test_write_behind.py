@@ -0,0 +1,125 @@
+"""
+Tests for the storage write-behind queue
+"""
+
+import asyncio
+
+import pytest
+
+from app.services.write_behind import WriteBehindQueue
+
+
+class RecordingWriter:
+    """Writer that records calls and can fail the first few attempts"""
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = []
+
+    async def __call__(self, key, data):
+        self.calls.append((key, data))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            return False
+        return True
+
+
+@pytest.mark.asyncio
+async def test_write_behind_writes_and_flushes():
+    """Test queued writes are performed and flush waits for them"""
+    writer = RecordingWriter(delay=0.01)
+    queue = WriteBehindQueue(writer, batch_size=2)
+
+    for i in range(5):
+        assert queue.enqueue(f"key{i}", {"i": i}) is True
+    assert await queue.flush(timeout=2) is True
+
+    assert sorted(key for key, _ in writer.calls) == [f"key{i}" for i in range(5)]
+    stats = queue.stats()
+    assert stats["depth"] == 0
+    assert stats["written"] == 5
+    assert stats["lag_seconds"]["count"] == 5
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_dedupes_pending_keys():
+    """Test a key enqueued twice before writing is written once, with the newest data"""
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer)
+
+    queue.enqueue("artifact", {"v": 1})
+    queue.enqueue("artifact", {"v": 2})
+    await queue.flush(timeout=2)
+
+    assert writer.calls == [("artifact", {"v": 2})]
+    assert queue.stats()["deduplicated"] == 1
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_retries_with_backoff():
+    """Test failed writes are retried until they succeed"""
+    writer = RecordingWriter(failures=2)
+    queue = WriteBehindQueue(writer, base_delay=0.01)
+
+    queue.enqueue("artifact", {"v": 1})
+    await queue.flush(timeout=2)
+    # Flushing skips backoff, retries land on the next loop iterations
+    for _ in range(50):
+        if queue.stats()["written"]:
+            break
+        await asyncio.sleep(0.01)
+
+    assert len(writer.calls) == 3
+    assert queue.stats()["retries"] == 2
+    assert queue.stats()["written"] == 1
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_flush_retries_writes_failing_during_the_flush():
+    """Test a write that fails while flushing is retried without waiting out its backoff"""
+    writer = RecordingWriter(failures=2)
+    queue = WriteBehindQueue(writer, base_delay=60)
+
+    queue.enqueue("artifact", {"v": 1})
+    assert await queue.flush(timeout=2) is True
+
+    assert len(writer.calls) == 3
+    assert queue.stats()["written"] == 1
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_gives_up_after_max_attempts():
+    """Test writes are dropped after max_attempts failures"""
+    writer = RecordingWriter(failures=10)
+    queue = WriteBehindQueue(writer, max_attempts=3, base_delay=0.001)
+
+    queue.enqueue("artifact", {"v": 1})
+    for _ in range(100):
+        if queue.stats()["failed"]:
+            break
+        await asyncio.sleep(0.01)
+
+    assert len(writer.calls) == 3
+    assert queue.stats()["depth"] == 0
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_write_behind_rejects_when_full():
+    """Test the queue bounds its pending writes"""
+    writer = RecordingWriter(delay=0.05)
+    queue = WriteBehindQueue(writer, batch_size=1, max_pending=2)
+
+    assert queue.enqueue("a", 1) is True
+    assert queue.enqueue("b", 2) is True
+    assert queue.enqueue("c", 3) is False
+    assert queue.stats()["rejected"] == 1
+    await queue.stop(timeout=2)
+    assert [key for key, _ in writer.calls] == ["a", "b"]